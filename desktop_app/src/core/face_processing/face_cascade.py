@@ -0,0 +1,104 @@
+import threading
+import numpy as np
+from typing import Any, Dict, Optional
+
+from core.face_processing.models.face_matcher_model import FaceMatcherModels, IdentificationResult
+from core.face_processing.face_gallery import FaceGallery, GallerySnapshot
+
+
+class CascadeIdentifier:
+    """Two-stage 1:N identification: a fast model over the whole gallery, a strong model only when unsure.
+
+    The fast model's best distance decides on its own when it is below ``accept_distance``
+    (confident match) or above ``reject_distance`` (confident stranger). Inside that uncertainty
+    band the probe is embedded once more with the strong model and only the fast candidates
+    inside the band are re-scored against the strong model's gallery.
+    """
+    def __init__(self, face_matcher: FaceMatcherModels, fast_gallery: FaceGallery, strong_gallery: FaceGallery,
+                 accept_distance: Optional[float] = None, reject_distance: Optional[float] = None, top_k: int = 5):
+        self.face_matcher = face_matcher
+        self.fast_gallery = fast_gallery
+        self.strong_gallery = strong_gallery
+
+        fast_threshold = face_matcher.thresholds[fast_gallery.model_name]
+        self.accept_distance = accept_distance if accept_distance is not None else 0.75 * fast_threshold
+        self.reject_distance = reject_distance if reject_distance is not None else 1.25 * fast_threshold
+        self.top_k = top_k
+
+        # user code -> row of the strong gallery, rebuilt when its snapshot changes
+        self._strong_rows: Dict[str, int] = {}
+        self._strong_version = -1
+
+        self._metrics_lock = threading.Lock()
+        self.decisions = 0
+        self.escalations = 0
+        self.accepted_fast = 0
+        self.rejected_fast = 0
+
+    def _strong_row_lookup(self, strong: GallerySnapshot) -> Dict[str, int]:
+        if strong.version != self._strong_version:
+            self._strong_rows = {name: row for row, name in enumerate(strong.names)}
+            self._strong_version = strong.version
+        return self._strong_rows
+
+    def _count(self, escalated: bool, fast_result: IdentificationResult):
+        with self._metrics_lock:
+            self.decisions += 1
+            if escalated:
+                self.escalations += 1
+            elif fast_result.matching:
+                self.accepted_fast += 1
+            else:
+                self.rejected_fast += 1
+
+    def identify(self, face_bgr: np.ndarray, gallery: GallerySnapshot, index: Any = None,
+                 probe: Optional[np.ndarray] = None) -> IdentificationResult:
+        """Identify a BGR face crop against the fast model gallery, escalating borderline decisions.
+
+        ``probe``, when the caller already has it, is the fast model embedding of ``face_bgr``.
+        """
+        fast_model = self.fast_gallery.model_name
+        if probe is None:
+            probe = self.face_matcher.face_embedding(face_bgr, model_name=fast_model)
+        if probe is None:
+            return self.face_matcher.rank_candidates(np.empty(0, dtype=np.int64), np.empty(0), [], fast_model)
+
+        fast_result = self.face_matcher.identify(probe, gallery.embeddings, gallery.names, top_k=self.top_k,
+                                                 model_name=fast_model, index=index)
+        if fast_result.distance <= self.accept_distance or fast_result.distance > self.reject_distance:
+            # the fast threshold sits inside the band, so the fast verdict is the final one here
+            self._count(False, fast_result)
+            return fast_result
+
+        # step 2: strong model, only for the candidates inside the uncertainty band
+        self._count(True, fast_result)
+        strong_model = self.strong_gallery.model_name
+        strong = self.strong_gallery.current()
+        strong_rows = self._strong_row_lookup(strong)
+        candidates = [name for name, distance in fast_result.candidates
+                      if distance <= self.reject_distance and name in strong_rows]
+        strong_probe = self.face_matcher.face_embedding(face_bgr, model_name=strong_model)
+        if strong_probe is None or not candidates:
+            print(f"[DEBUG] cascade: {strong_model} unavailable for {len(candidates)} candidates, keeping {fast_model} result")
+            return fast_result
+
+        rows = np.array([strong_rows[name] for name in candidates])
+        distances = self.face_matcher.embedding_distances(strong_probe, strong.embeddings[rows])
+        result = self.face_matcher.rank_candidates(rows, distances, strong.names, model_name=strong_model)
+        print(f"[DEBUG] cascade: escalated {len(candidates)} candidates to {strong_model}: {result.candidates}")
+        return result
+
+    def metrics(self) -> Dict[str, float]:
+        """Cascade thresholds and how decisions were split between the two stages."""
+        with self._metrics_lock:
+            return {
+                'fast_model': self.fast_gallery.model_name,
+                'strong_model': self.strong_gallery.model_name,
+                'accept_distance': self.accept_distance,
+                'reject_distance': self.reject_distance,
+                'decisions': self.decisions,
+                'accepted_fast': self.accepted_fast,
+                'rejected_fast': self.rejected_fast,
+                'escalations': self.escalations,
+                'escalation_rate': self.escalations / self.decisions if self.decisions else 0.0,
+            }
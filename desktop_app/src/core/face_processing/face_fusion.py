@@ -0,0 +1,86 @@
+import threading
+import numpy as np
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from core.face_processing.models.face_matcher_model import FaceMatcherModels, IdentificationResult
+from core.face_processing.face_gallery import GallerySnapshot
+
+
+FUSION_METHODS = ('mean', 'vote')
+
+
+def fuse_embeddings(probes: np.ndarray) -> Optional[np.ndarray]:
+    """L2-normalized mean of the valid rows of an (N, D) probe matrix; None when no row is valid."""
+    valid = probes[~np.isnan(probes).any(axis=1)]
+    if len(valid) == 0:
+        return None
+    fused = valid.mean(axis=0)
+    norm = np.linalg.norm(fused)
+    return fused / norm if norm > 0 else None
+
+
+class EmbeddingFusion:
+    """1:N identification of several crops of the same approach, fused into one decision.
+
+    ``mean`` averages the normalized embeddings into a single probe, which averages out the
+    noise of each capture, and identifies it once. ``vote`` identifies every probe: a probe votes
+    for its top-1 identity only when it matches and leads the runner-up by at least
+    ``vote_margin``, and an identity is accepted with the votes of more than half of the probes.
+    """
+    def __init__(self, face_matcher: FaceMatcherModels, method: str = 'mean', vote_margin: float = 0.05,
+                 top_k: int = 5):
+        if method not in FUSION_METHODS:
+            raise ValueError(f"Unsupported fusion method: {method}")
+        self.face_matcher = face_matcher
+        self.method = method
+        self.vote_margin = vote_margin
+        self.top_k = top_k
+
+        self._metrics_lock = threading.Lock()
+        self.decisions = 0
+        self.probes = 0
+        self.matches = 0
+
+    def _count(self, probes: int, result: IdentificationResult):
+        with self._metrics_lock:
+            self.decisions += 1
+            self.probes += probes
+            self.matches += result.matching
+
+    def identify(self, probes: np.ndarray, gallery: GallerySnapshot, model_name: str = "SFace",
+                 index: Any = None) -> IdentificationResult:
+        """Identify the (N, D) probe embeddings of one user; NaN rows (crops not embedded) are ignored."""
+        probes = probes[~np.isnan(probes).any(axis=1)]
+        if len(probes) == 0:
+            return self.face_matcher.rank_candidates(np.empty(0, dtype=np.int64), np.empty(0), [], model_name)
+
+        if self.method == 'mean':
+            result = self.face_matcher.identify(fuse_embeddings(probes), gallery.embeddings, gallery.names,
+                                                top_k=self.top_k, model_name=model_name, index=index)
+        else:
+            result = self._vote(probes, gallery, model_name, index)
+        self._count(len(probes), result)
+        return result
+
+    def _vote(self, probes: np.ndarray, gallery: GallerySnapshot, model_name: str, index: Any) -> IdentificationResult:
+        results = [self.face_matcher.identify(probe, gallery.embeddings, gallery.names, top_k=self.top_k,
+                                              model_name=model_name, index=index) for probe in probes]
+        votes = Counter(result.user_name for result in results
+                        if result.matching and result.margin >= self.vote_margin)
+        if votes:
+            user_name, count = votes.most_common(1)[0]
+            if 2 * count > len(results):
+                # report the closest of the probes that voted for the winner
+                return min((result for result in results if result.user_name == user_name),
+                           key=lambda result: result.distance)
+
+        # no majority: the closest probe, rejected
+        closest = min(results, key=lambda result: result.distance)
+        return IdentificationResult(False, 'Rostro no conocido', closest.distance, closest.margin, closest.candidates)
+
+    def metrics(self) -> Dict[str, float]:
+        with self._metrics_lock:
+            return {'method': self.method, 'decisions': self.decisions,
+                    'probes_per_decision': self.probes / self.decisions if self.decisions else 0.0,
+                    'match_rate': self.matches / self.decisions if self.decisions else 0.0}
@@ -0,0 +1,286 @@
+import os
+import json
+import threading
+import numpy as np
+import cv2
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Optional
+
+from core.face_processing.models.face_matcher_model import FaceMatcherModels
+from core.face_processing.face_gallery_file import FaceGalleryFile
+
+
+# From face_gallery.py: go up 4 levels to reach controlAccesoFacial root
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
+FACE_IMAGES_PATH = os.path.join(BASE_PATH, "data", "face_images")
+FACE_EMBEDDINGS_PATH = os.path.join(BASE_PATH, "data", "face_embeddings")
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+@dataclass(frozen=True)
+class GallerySnapshot:
+    """Immutable version of the gallery: a read-only (N, D) embedding matrix and its user codes."""
+    version: int
+    embeddings: np.ndarray
+    names: Tuple[str, ...]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class GalleryHolder:
+    """Read-copy-update holder of the current GallerySnapshot.
+
+    Readers call ``snapshot()``, a single reference read, and keep using that version for the
+    whole match without any lock. Writers build a complete new snapshot and swap the reference,
+    so a reader never sees a half-built gallery and is never blocked by an enrollment.
+    """
+    def __init__(self):
+        embeddings = np.empty((0, 0), dtype=np.float32)
+        embeddings.flags.writeable = False
+        self._snapshot = GallerySnapshot(0, embeddings, ())
+        self._swap_lock = threading.Lock()
+
+    def snapshot(self) -> GallerySnapshot:
+        return self._snapshot
+
+    def detach(self):
+        """Swap the current version for an in-memory copy of itself, so it no longer maps the gallery file."""
+        with self._swap_lock:
+            snapshot = self._snapshot
+            embeddings = np.array(snapshot.embeddings)
+            embeddings.flags.writeable = False
+            self._snapshot = GallerySnapshot(snapshot.version, embeddings, snapshot.names)
+
+    def publish(self, embeddings: np.ndarray, names: List[str]) -> GallerySnapshot:
+        """Swap in a new version; ``embeddings`` must not be modified afterwards."""
+        if embeddings.flags.writeable:
+            embeddings = embeddings.view()
+            embeddings.flags.writeable = False
+        with self._swap_lock:
+            self._snapshot = GallerySnapshot(self._snapshot.version + 1, embeddings, tuple(names))
+        return self._snapshot
+
+
+class FaceGallery:
+    """Persistent store of precomputed face embeddings of the enrolled users.
+
+    Embeddings are computed once at signup and appended to a packed, memory-mapped
+    ``<model_name>.gallery`` file, so a login only has to embed the probe face.
+
+    The gallery is also kept in memory. ``refresh`` compares the image directory with a
+    manifest of ``(mtime, size)`` per enrolled image and re-embeds only the images that were
+    added or changed, so the login path reads ``current()`` and never touches the filesystem.
+    A polling watcher thread can run ``refresh`` in the background.
+    """
+    def __init__(self, face_matcher: FaceMatcherModels, images_path: Optional[str] = None,
+                 embeddings_path: Optional[str] = None, model_name: str = "SFace"):
+        self.face_matcher = face_matcher
+        self.model_name = model_name
+        self.images_path = images_path if images_path else FACE_IMAGES_PATH
+        self.embeddings_path = embeddings_path if embeddings_path else FACE_EMBEDDINGS_PATH
+        self.gallery_path = os.path.join(self.embeddings_path, f"{model_name}.gallery")
+        self.manifest_path = os.path.join(self.embeddings_path, f"{model_name}.manifest.json")
+        self.gallery_file: Optional[FaceGalleryFile] = None
+        # images embedded per forward pass when a refresh finds many new enrollments
+        self.batch_size = 32
+
+        # image file name -> [mtime, size] of every embedded image
+        self.manifest: Dict[str, List[float]] = {}
+        # in-memory gallery, swapped as a whole so readers always see a consistent version
+        self.holder = GalleryHolder()
+        self._write_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watcher = threading.Event()
+
+    def _open(self, dim: Optional[int] = None) -> Optional[FaceGalleryFile]:
+        """Map the gallery file, creating it on the first enrollment once the embedding size is known."""
+        if self.gallery_file is None and (dim or os.path.exists(self.gallery_path)):
+            self.gallery_file = FaceGalleryFile.open(self.gallery_path, self.model_name, dim)
+        return self.gallery_file
+
+    def _upsert(self, user_code: str, embedding: np.ndarray):
+        gallery_file = self._open(dim=len(embedding))
+        if gallery_file.full:
+            # the file is replaced to grow: logins read an in-memory copy until the next publish
+            self.holder.detach()
+        gallery_file.upsert(user_code, embedding)
+
+    def _migrate_legacy(self):
+        """Move the per-user ``<model_name>/<user_code>.npy`` embeddings of older versions into the gallery file."""
+        legacy_path = os.path.join(self.embeddings_path, self.model_name)
+        if not os.path.isdir(legacy_path):
+            return
+        migrated = 0
+        for file in sorted(os.listdir(legacy_path)):
+            if not file.endswith('.npy'):
+                continue
+            npy_path = os.path.join(legacy_path, file)
+            try:
+                embedding = np.load(npy_path).astype(np.float32).ravel()
+            except (OSError, ValueError) as e:
+                print(f"Error reading legacy embedding {npy_path}: {e}")
+                continue
+            gallery_file = self._open()
+            user_code = os.path.splitext(file)[0]
+            # users re-embedded into the gallery file since, or of another embedding size, are only deleted
+            if gallery_file is None or (user_code not in gallery_file.timestamps() and len(embedding) == gallery_file.dim):
+                self._upsert(user_code, embedding)
+                migrated += 1
+            os.remove(npy_path)
+        if not os.listdir(legacy_path):
+            os.rmdir(legacy_path)
+        if migrated:
+            print(f"[DEBUG] Migrated {migrated} legacy embeddings into {self.gallery_path}")
+
+    def _publish(self):
+        gallery_file = self._open()
+        if gallery_file is not None:
+            self.holder.publish(*gallery_file.read())
+
+    def _read_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def _write_manifest(self):
+        os.makedirs(self.embeddings_path, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _embed(self, user_code: str, face_bgr: np.ndarray) -> bool:
+        embedding = self.face_matcher.face_embedding(face_bgr, model_name=self.model_name)
+        if embedding is None:
+            print(f"Failed to compute embedding for user: {user_code}")
+            return False
+
+        self._upsert(user_code, embedding)
+        print(f"[DEBUG] Saved {self.model_name} embedding for user: {user_code}")
+        return True
+
+    def add(self, user_code: str, face_bgr: np.ndarray) -> bool:
+        """Embed a BGR face crop, persist it for the given user and make it visible to logins."""
+        with self._write_lock:
+            if not self._embed(user_code, face_bgr):
+                return False
+            # record the saved image so the next refresh does not embed it again
+            for extension in IMAGE_EXTENSIONS:
+                img_path = os.path.join(self.images_path, f"{user_code}{extension}")
+                if os.path.exists(img_path):
+                    stat = os.stat(img_path)
+                    self.manifest[f"{user_code}{extension}"] = [stat.st_mtime, stat.st_size]
+            self._write_manifest()
+            self._publish()
+        return True
+
+    def remove(self, user_code: str) -> bool:
+        """Delete the stored embedding of a user, if any."""
+        with self._write_lock:
+            gallery_file = self._open()
+            removed = gallery_file.remove(user_code) if gallery_file else False
+            self._publish()
+        return removed
+
+    def load(self) -> GallerySnapshot:
+        """Map the stored gallery into memory without scanning the image directory."""
+        with self._write_lock:
+            self._read_manifest()
+            self._migrate_legacy()
+            self._publish()
+        return self.holder.snapshot()
+
+    def current(self) -> GallerySnapshot:
+        """The current in-memory gallery version; safe to use while enrollments are published."""
+        return self.holder.snapshot()
+
+    def refresh(self) -> Tuple[int, int, int]:
+        """Apply the difference between the image directory and the manifest.
+
+        Returns the number of added, removed and changed enrollments.
+        """
+        if not os.path.exists(self.images_path):
+            return 0, 0, 0
+
+        with self._write_lock:
+            gallery_file = self._open()
+            timestamps = gallery_file.timestamps() if gallery_file else {}
+
+            listing: Dict[str, List[float]] = {}
+            with os.scandir(self.images_path) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        stat = entry.stat()
+                        listing[entry.name] = [stat.st_mtime, stat.st_size]
+
+            added, removed, changed = 0, 0, 0
+            pending: List[Tuple[str, List[float]]] = []
+            for file, signature in listing.items():
+                user_code = os.path.splitext(file)[0]
+                if self.manifest.get(file) == signature:
+                    continue
+                if file not in self.manifest and timestamps.get(user_code, -1.0) >= signature[0]:
+                    # embedded before the manifest existed and unchanged since
+                    self.manifest[file] = signature
+                    continue
+                pending.append((file, signature))
+
+            # new and changed images are embedded in batches rather than one forward pass each
+            for start in range(0, len(pending), self.batch_size):
+                chunk = [(file, signature, cv2.imread(os.path.join(self.images_path, file)))
+                         for file, signature in pending[start:start + self.batch_size]]
+                chunk = [item for item in chunk if item[2] is not None]
+                if not chunk:
+                    continue
+                embeddings = self.face_matcher.face_embeddings([img for _, _, img in chunk], model_name=self.model_name)
+                for (file, signature, _), embedding in zip(chunk, embeddings):
+                    user_code = os.path.splitext(file)[0]
+                    if np.isnan(embedding).any():
+                        print(f"Failed to compute embedding for user: {user_code}")
+                        continue
+                    self._upsert(user_code, embedding)
+                    if file in self.manifest:
+                        changed += 1
+                    else:
+                        added += 1
+                    self.manifest[file] = signature
+                if start + self.batch_size < len(pending):
+                    # a long first refresh makes every batch visible to logins as soon as it is embedded
+                    self._publish()
+
+            for file in set(self.manifest) - set(listing):
+                if self.gallery_file is not None:
+                    self.gallery_file.remove(os.path.splitext(file)[0])
+                del self.manifest[file]
+                removed += 1
+
+            if added or removed or changed:
+                print(f"[DEBUG] Gallery refresh: {added} added, {removed} removed, {changed} changed")
+                self._write_manifest()
+                self._publish()
+        return added, removed, changed
+
+    # watcher
+    def _watch(self, interval: float):
+        while not self._stop_watcher.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing face gallery: {e}")
+            self._stop_watcher.wait(interval)
+
+    def start_watcher(self, interval: float = 2.0):
+        """Poll the image directory every ``interval`` seconds on a daemon thread."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_watcher.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop_watcher.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
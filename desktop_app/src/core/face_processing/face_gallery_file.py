@@ -0,0 +1,209 @@
+import gc
+import os
+import struct
+import time
+import zlib
+import numpy as np
+from typing import List, Optional, Tuple
+
+
+MAGIC = b'FGAL'
+VERSION = 1
+# magic, version, embedding dim, id width, count, capacity, checksum, model name
+HEADER_FORMAT = '<4sIIIQQI64s'
+# fixed header size keeps the embedding matrix aligned
+HEADER_SIZE = 128
+
+
+class FaceGalleryFile:
+    """Single-file packed gallery opened with ``np.memmap``.
+
+    Layout: a fixed header (model name, embedding dimension, version, record count, capacity and
+    a CRC32 checksum), then a contiguous ``capacity x dim`` float32 embedding matrix, then an ID
+    table of ``capacity`` records (user code and enrollment timestamp). Opening only reads the
+    header and maps the file, so startup does not depend on the number of enrolled users.
+
+    Rows are preallocated: an append writes one row and one record in place and updates the
+    header. When the capacity is exhausted a file of twice the capacity is written next to it
+    and atomically replaces it; a mapped file is never truncated, which Windows refuses.
+    Removed or re-enrolled users leave an empty ID on their old row.
+    """
+    def __init__(self, path: str, model_name: str, dim: int, capacity: int = 1024, id_width: int = 32):
+        self.path = path
+        self.model_name = model_name
+        self.dim = dim
+        self.capacity = capacity
+        self.id_width = id_width
+        self.count = 0
+        self.checksum = 0
+        self.embeddings: Optional[np.memmap] = None
+        self.records: Optional[np.memmap] = None
+
+    @property
+    def record_dtype(self) -> np.dtype:
+        return np.dtype([('id', f'S{self.id_width}'), ('timestamp', '<f8')])
+
+    def _records_offset(self, capacity: int) -> int:
+        return HEADER_SIZE + capacity * self.dim * 4
+
+    def _file_size(self, capacity: int) -> int:
+        return self._records_offset(capacity) + capacity * self.record_dtype.itemsize
+
+    # header
+    def _write_header(self):
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, self.dim, self.id_width, self.count, self.capacity,
+                             self.checksum, self.model_name.encode('utf-8')[:64])
+        with open(self.path, 'r+b') as f:
+            f.write(header.ljust(HEADER_SIZE, b'\0'))
+
+    def _read_header(self):
+        with open(self.path, 'rb') as f:
+            header = f.read(struct.calcsize(HEADER_FORMAT))
+        magic, version, dim, id_width, count, capacity, checksum, model_name = struct.unpack(HEADER_FORMAT, header)
+        if magic != MAGIC:
+            raise ValueError(f"Not a face gallery file: {self.path}")
+        if version != VERSION:
+            raise ValueError(f"Unsupported face gallery file version {version}: {self.path}")
+        self.dim, self.id_width, self.count, self.capacity, self.checksum = dim, id_width, count, capacity, checksum
+        self.model_name = model_name.rstrip(b'\0').decode('utf-8')
+
+    def _map(self):
+        self.embeddings = np.memmap(self.path, dtype=np.float32, mode='r+', offset=HEADER_SIZE,
+                                    shape=(self.capacity, self.dim))
+        self.records = np.memmap(self.path, dtype=self.record_dtype, mode='r+',
+                                 offset=self._records_offset(self.capacity), shape=(self.capacity,))
+
+    def _unmap(self):
+        self.embeddings = None
+        self.records = None
+
+    # open / create
+    @classmethod
+    def open(cls, path: str, model_name: str, dim: Optional[int] = None, capacity: int = 1024) -> 'FaceGalleryFile':
+        """Map an existing gallery file, or create an empty one when ``dim`` is known."""
+        gallery_file = cls(path, model_name, dim if dim else 0, capacity)
+        if os.path.exists(path):
+            gallery_file._read_header()
+            if gallery_file.model_name != model_name:
+                raise ValueError(f"Gallery file {path} holds {gallery_file.model_name} embeddings, not {model_name}")
+        else:
+            if not dim:
+                raise FileNotFoundError(f"Face gallery file not found: {path}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.truncate(gallery_file._file_size(capacity))
+            gallery_file._write_header()
+        gallery_file._map()
+        return gallery_file
+
+    def flush(self):
+        self.embeddings.flush()
+        self.records.flush()
+        self._write_header()
+
+    # checksum
+    def _record_checksum(self, row: int, checksum: int) -> int:
+        checksum = zlib.crc32(self.embeddings[row].tobytes(), checksum)
+        return zlib.crc32(self.records[row].tobytes(), checksum)
+
+    def compute_checksum(self) -> int:
+        checksum = 0
+        for row in range(self.count):
+            checksum = self._record_checksum(row, checksum)
+        return checksum
+
+    def verify(self) -> bool:
+        """Recompute the CRC32 of every written row; O(N), so it is not done on open."""
+        return self.compute_checksum() == self.checksum
+
+    # writes
+    @property
+    def full(self) -> bool:
+        """The next upsert rewrites the file with a larger capacity."""
+        return self.count == self.capacity
+
+    def _replace(self, tmp_path: str, attempts: int = 20, delay: float = 0.05):
+        """os.replace, retried while a reader still maps the old file (Windows refuses to replace it)."""
+        for attempt in range(attempts):
+            try:
+                os.replace(tmp_path, self.path)
+                return
+            except PermissionError:
+                if attempt == attempts - 1:
+                    os.remove(tmp_path)
+                    raise
+                # views of a dropped snapshot may only be waiting for the collector
+                gc.collect()
+                time.sleep(delay)
+
+    def _grow(self):
+        """Double the capacity: write the rows into a new file, then swap it in with an atomic replace."""
+        new_capacity = self.capacity * 2
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.truncate(self._file_size(new_capacity))
+            f.seek(HEADER_SIZE)
+            f.write(np.ascontiguousarray(self.embeddings[:self.count]).tobytes())
+            f.seek(self._records_offset(new_capacity))
+            f.write(np.array(self.records[:self.count]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self._unmap()
+        self._replace(tmp_path)
+        self.capacity = new_capacity
+        self._write_header()
+        self._map()
+        print(f"[DEBUG] Face gallery file grown to {new_capacity} rows: {self.path}")
+
+    def _find(self, user_code: str) -> Optional[int]:
+        rows = np.flatnonzero(self.records['id'][:self.count] == user_code.encode('utf-8'))
+        return int(rows[0]) if len(rows) else None
+
+    def upsert(self, user_code: str, embedding: np.ndarray):
+        """Write a user's embedding as a new row, blanking the previous row of that user if any.
+
+        Written rows are never modified afterwards, so views handed out by ``read`` stay valid.
+        """
+        previous = self._find(user_code)
+        if previous is not None:
+            self.records[previous] = (b'', 0.0)
+        if self.count == self.capacity:
+            self._grow()
+        row = self.count
+        self.count += 1
+        self.embeddings[row] = embedding
+        self.records[row] = (user_code.encode('utf-8'), time.time())
+        if previous is None:
+            # appends extend the running checksum, no need to read back the other rows
+            self.checksum = self._record_checksum(row, self.checksum)
+        else:
+            self.checksum = self.compute_checksum()
+        self.flush()
+
+    def remove(self, user_code: str) -> bool:
+        """Blank the ID of a user so readers skip the row."""
+        row = self._find(user_code)
+        if row is None:
+            return False
+        self.records[row] = (b'', 0.0)
+        self.checksum = self.compute_checksum()
+        self.flush()
+        return True
+
+    # reads
+    def timestamps(self) -> dict:
+        """Enrollment timestamp of every stored user code."""
+        records = self.records[:self.count]
+        return {r['id'].decode('utf-8'): float(r['timestamp']) for r in records if r['id']}
+
+    def read(self) -> Tuple[np.ndarray, List[str]]:
+        """Read-only (N, D) view of the live embeddings and their user codes, copied only when rows were blanked."""
+        ids = self.records['id'][:self.count]
+        live = ids != b''
+        names = [user_code.decode('utf-8') for user_code in ids[live]]
+        if live.all():
+            embeddings = self.embeddings[:self.count].view()
+        else:
+            embeddings = np.asarray(self.embeddings[:self.count][live])
+        embeddings.flags.writeable = False
+        return embeddings, names
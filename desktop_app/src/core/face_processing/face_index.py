@@ -0,0 +1,176 @@
+import os
+import time
+import zipfile
+import zlib
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from core.face_processing.face_quantization import QuantizedGallery
+
+
+# layout of the saved .npz, bumped when the saved arrays change
+INDEX_FORMAT = 1
+
+
+def gallery_checksum(gallery: np.ndarray, names: List[str]) -> int:
+    """CRC32 of the embeddings and user codes an index was built from."""
+    checksum = zlib.crc32(np.ascontiguousarray(gallery, dtype=np.float32).tobytes())
+    return zlib.crc32('\n'.join(names).encode('utf-8'), checksum)
+
+
+class FaceIndexIVF:
+    """Inverted-file (IVF) approximate nearest-neighbour index over normalized face embeddings.
+
+    The gallery is split into ``nlist`` cells with spherical k-means. A search only scans the
+    ``nprobe`` cells whose centroids are closest to the probe, so ``nprobe`` is the
+    recall/latency knob: ``nprobe == nlist`` is an exact brute-force search.
+
+    The inverted lists are a QuantizedGallery of ``dtype``, so with float16 or int8 the index does
+    not keep a float32 copy of the gallery next to the mapped one.
+    """
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, n_iter: int = 15, seed: int = 0,
+                 dtype: str = 'float32'):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.dtype = dtype
+
+        self.centroids: Optional[np.ndarray] = None
+        # gallery rows sorted by cell, and where each cell starts in that order
+        self.order: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.lists: Optional[QuantizedGallery] = None
+        self.names: List[str] = []
+        # gallery_checksum of the gallery the lists were filled from
+        self.checksum = 0
+
+    @staticmethod
+    def _assign(embeddings: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Closest centroid of every embedding, computed in chunks to bound the similarity matrix."""
+        assignments = np.empty(len(embeddings), dtype=np.int32)
+        for start in range(0, len(embeddings), chunk_size):
+            chunk = embeddings[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+        return assignments
+
+    def _train_centroids(self, embeddings: np.ndarray, nlist: int) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        # k-means converges fine on a sample, the full gallery is only needed for the assignment
+        sample_size = min(len(embeddings), nlist * 256)
+        sample = embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            assignments = self._assign(sample, centroids)
+            counts = np.bincount(assignments, minlength=nlist)
+            # per-cell sums over the sample sorted by cell
+            order = np.argsort(assignments, kind='stable')
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            empty = counts == 0
+            # re-seed empty cells with random points so every cell stays useful
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+
+        return centroids
+
+    def build(self, gallery: np.ndarray, names: List[str]) -> 'FaceIndexIVF':
+        """Train the coarse centroids and fill the inverted lists from an (N, D) gallery."""
+        nlist = self.nlist if self.nlist else int(np.clip(4 * np.sqrt(len(gallery)), 1, 65536))
+        nlist = min(nlist, len(gallery))
+
+        start = time.perf_counter()
+        self.centroids = self._train_centroids(gallery, nlist)
+        self._fill_lists(gallery, self._assign(gallery, self.centroids))
+        self.names = list(names)
+        self.checksum = gallery_checksum(gallery, self.names)
+        print(f"[DEBUG] FaceIndexIVF built: {len(gallery)} embeddings, {nlist} lists "
+              f"in {time.perf_counter() - start:.2f}s")
+        return self
+
+    def _fill_lists(self, gallery: np.ndarray, assignments: np.ndarray):
+        self.order = np.argsort(assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        # contiguous copy per cell so a probe scans memory sequentially
+        self.lists = QuantizedGallery(gallery, [], self.dtype, order=self.order)
+
+    def search(self, probe: np.ndarray, top_k: int = 5, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k gallery rows (original indices) and cosine distances for a normalized probe."""
+        nprobe = min(nprobe if nprobe else self.nprobe, len(self.centroids))
+        cell_scores = self.centroids @ probe
+        cells = np.argpartition(-cell_scores, nprobe - 1)[:nprobe]
+
+        rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells])
+        if len(rows) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        distances = 1.0 - self.lists.similarities(probe, rows)
+        k = min(top_k, len(rows))
+        best = np.argpartition(distances, k - 1)[:k]
+        return self.order[rows[best]], distances[best]
+
+    def memory_report(self) -> Dict[str, float]:
+        """Resident bytes of the inverted lists, centroids and row order."""
+        report = self.lists.memory_report()
+        report['total_bytes'] += self.centroids.nbytes + self.order.nbytes + self.offsets.nbytes
+        report['bytes_per_identity'] = report['total_bytes'] / max(report['identities'], 1)
+        return report
+
+    def save(self, path: str):
+        """Persist the trained index; the embeddings themselves stay in the gallery."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, format=INDEX_FORMAT, checksum=self.checksum, centroids=self.centroids, order=self.order,
+                 offsets=self.offsets, names=np.asarray(self.names), nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path: str, gallery: np.ndarray, names: List[str], dtype: str = 'float32') -> Optional['FaceIndexIVF']:
+        """Load a saved index for the gallery it was built from, or None if missing or out of date.
+
+        The embeddings and user codes must have the checksum stored with the index: a re-enrollment
+        that keeps the gallery size and order still invalidates it.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            data = np.load(path)
+            if 'format' not in data or int(data['format']) != INDEX_FORMAT:
+                return None
+            if int(data['checksum']) != gallery_checksum(gallery, names) or len(data['order']) != len(gallery):
+                return None
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"Error loading face index {path}: {e}")
+            return None
+
+        index = cls(nlist=len(data['centroids']), nprobe=int(data['nprobe']), dtype=dtype)
+        index.centroids = data['centroids']
+        index.order = data['order']
+        index.offsets = data['offsets']
+        index.lists = QuantizedGallery(gallery, [], dtype, order=index.order)
+        index.names = data['names'].tolist()
+        index.checksum = int(data['checksum'])
+        return index
+
+
+def benchmark_recall(index: FaceIndexIVF, gallery: np.ndarray, queries: np.ndarray,
+                     nprobe_values: List[int]) -> Dict[str, List[float]]:
+    """Recall@1 and mean per-query latency of the index at each nprobe, against brute force."""
+    start = time.perf_counter()
+    ground_truth = np.array([np.argmax(gallery @ query) for query in queries])
+    brute_force_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    summary = {'nprobe': [], 'recall@1': [], 'latency_ms': [], 'brute_force_ms': []}
+    for nprobe in nprobe_values:
+        start = time.perf_counter()
+        found = np.array([index.search(query, top_k=1, nprobe=nprobe)[0][0] for query in queries])
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        summary['nprobe'].append(nprobe)
+        summary['recall@1'].append(float(np.mean(found == ground_truth)))
+        summary['latency_ms'].append(latency_ms)
+        summary['brute_force_ms'].append(brute_force_ms)
+    return summary
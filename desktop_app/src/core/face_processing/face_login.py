@@ -1,102 +1,424 @@
+import threading
+import time
 import numpy as np
-from typing import Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
 
 from core.face_processing.face_utils import FaceUtils
+from core.face_processing.face_frame import Frame
+from core.face_processing.face_quality import BestCropBuffer, FaceQuality
+from core.face_processing.face_pipeline import FramePipeline
+
+
+@dataclass
+class LoginFrame:
+    """One frame travelling through the login steps, with what each step found in it."""
+    frame: Frame
+    face_detected: bool = False
+    face_info: Any = None
+    face_save: Optional[np.ndarray] = None
+    mesh_detected: bool = False
+    mesh_info: Any = None
+    # filled instead of face_info when detection runs in a worker process or is skipped for the mesh
+    face_bbox: Optional[List[int]] = None
+    face_points: Optional[List[List[int]]] = None
+    # (468, 2) landmark pixel coordinates
+    mesh_points: Optional[np.ndarray] = None
+    face_centered: bool = False
+    # FaceTracker track of the face, set by the decision step
+    track_id: Optional[int] = None
+    # outcome of the decision step
+    state: Optional[bool] = None
+    matcher: Optional[bool] = None
+    info: str = ''
+
+    @property
+    def image(self) -> np.ndarray:
+        """Read-only RGB view of the frame."""
+        return self.frame.rgb
+
+    @property
+    def frame_id(self) -> int:
+        return self.frame.frame_id
+
+
+@dataclass
+class DecisionPolicy:
+    """When FaceLogIn identifies the centered face.
+
+    Identification starts as soon as the face has been centered for ``min_frames`` frames, the
+    landmarks moved less than ``max_jitter`` (mean motion between the last ``stable_frames``
+    frames, relative to the face height) and the best crop scores at least ``min_quality``. An
+    early attempt is final only when it is a confident match; otherwise crops keep being collected
+    and the face is identified again at the fallback, ``max_frames`` centered frames or
+    ``max_wait_seconds`` after it was first centered, whichever comes first.
+    """
+    min_frames: int = 5
+    stable_frames: int = 5
+    max_jitter: float = 0.01
+    min_quality: float = 0.6
+    max_frames: int = 48
+    max_wait_seconds: float = 3.0
+    # a match is confident below this fraction of the model threshold
+    confident_distance_ratio: float = 0.8
 
 
 class FaceLogIn:
-    def __init__(self, face_utilities: Optional[FaceUtils] = None):
+    def __init__(self, face_utilities: Optional[FaceUtils] = None, policy: Optional[DecisionPolicy] = None):
         self.face_utilities = face_utilities if face_utilities else FaceUtils()
+        self.policy = policy if policy else DecisionPolicy()
+        # identification and check-in run here so the preview keeps animating while they block
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="face-login")
+        self.reset()
 
+    def reset(self):
+        """Forget the current login attempt; the models and the executor are kept."""
         self.matcher = None
+        self.user_name: Optional[str] = None
         self.comparison = False
         self.cont_frame = 0
         self.processing_state: Optional[bool] = None  # None = processing, True = approved, False = denied
+        # FaceMesh found the face on the last frame, see FaceUtils.mesh_localization; set by the
+        # mesh stage and read by the detect stage, which run on different pipeline threads
+        self.mesh_tracking = threading.Event()
+
+        # best scored crops while the user is centered, the identification uses the best one
+        # (the best fusion_frames ones when FaceUtils fuses several crops)
+        self.best_crops = BestCropBuffer(k=max(3, self.face_utilities.fusion_frames))
+        # landmarks of the last centered frames, for the stability criterion of the DecisionPolicy
+        self.landmark_history: deque = deque(maxlen=self.policy.stable_frames)
+        self.jitter: Optional[float] = None
+        self.centered_since = 0.0
+        # an early attempt was not confident, the next one is at the fallback
+        self.retrying = False
+        self.attempts = 0
+
+        self.pending: Optional[Future] = None
+        self.decision_started = 0.0
+        self.decision_trigger: Optional[str] = None
+        self.decision_crops = 0
+        self.decision_track: Optional[int] = None
+        self.decision_quality: Optional[FaceQuality] = None
+        self.last_decision: Optional[Dict[str, Any]] = None
+
+    def close(self):
+        """Stop accepting work; a check-in already submitted still completes."""
+        self.executor.shutdown(wait=False)
 
-    def process(self, face_image: np.ndarray):
-        # step 1: check face detection
-        check_face_detect, face_info, face_save = self.face_utilities.check_face(face_image)
-        if check_face_detect is False:
+    def process(self, face_image: np.ndarray, camera_frame: Optional[Frame] = None):
+        """Run every login step on the calling thread and draw the result on the RGB ``face_image``.
+
+        ``camera_frame``, when given, is the frame ``face_image`` was copied from; the steps then
+        read its cached views instead of converting ``face_image`` again.
+        """
+        frame = LoginFrame(camera_frame if camera_frame is not None else Frame(face_image, 'rgb'))
+        self.detect(frame)
+        self.mesh(frame)
+        self.decide(frame)
+        self.draw(face_image, frame)
+        return face_image, frame.matcher, frame.info
+
+    def pipeline(self, camera: Any, queue_size: int = 1) -> FramePipeline:
+        """Threaded capture -> detect -> mesh -> match pipeline over the camera frames; drawing is left to the UI.
+
+        With ``face_utilities.inference_workers`` set, detection and mesh run in a worker process instead.
+        """
+        def wrap_frame(frame_id: int, frame_bgr: np.ndarray) -> Frame:
+            # shared by the stages and the renderer, so the RGB conversion is done once for both
+            return Frame(frame_bgr, 'bgr', frame_id)
+
+        if self.face_utilities.inference_workers is not None:
+            stages = [('analyze', self.analyze), ('match', self.decide)]
+        else:
+            stages = [('detect', self.detect), ('mesh', self.mesh), ('match', self.decide)]
+        return FramePipeline(camera, lambda frame_id, frame: LoginFrame(frame), stages, queue_size=queue_size,
+                             wrap_frame=wrap_frame)
+
+    # step 1 - 4 in a worker process
+    def analyze(self, frame: LoginFrame) -> Optional[LoginFrame]:
+        inference_workers = self.face_utilities.inference_workers
+        try:
+            future = inference_workers.analyze(frame.image)
+            if future is None:
+                # every shared memory slot is busy, drop the frame
+                return None
+            result = inference_workers.result(future)
+        except (ValueError, TimeoutError, RuntimeError) as e:
+            # frame larger than the slots, worker restarted after a timeout or failed: run it here
+            print(f"[DEBUG] analyze in process: {e}")
+            return self.mesh(self.detect(frame))
+        frame.face_detected = result['face_detected']
+        frame.face_save = frame.image
+        frame.face_bbox = result.get('face_bbox')
+        frame.face_points = result.get('face_points')
+        frame.mesh_detected = result['mesh_detected']
+        frame.mesh_points = result.get('mesh_points')
+        frame.face_centered = result['face_centered']
+        return frame
+
+    # step 1: check face detection
+    def detect(self, frame: LoginFrame) -> LoginFrame:
+        if self.face_utilities.mesh_localization and self.mesh_tracking.is_set():
+            # FaceMesh is tracking the face, it localizes this frame on its own
+            frame.face_detected, frame.face_info, frame.face_save = True, None, frame.image
+            return frame
+        frame.face_detected, frame.face_info, frame.face_save = self.face_utilities.check_face_frame(frame.frame)
+        return frame
+
+    # step 2 - 4: face mesh, extract face mesh, check face center
+    def mesh(self, frame: LoginFrame) -> LoginFrame:
+        if frame.face_detected:
+            # landmarks are relative, extracting them against the full frame maps them back to it
+            frame.mesh_detected, frame.mesh_info = self.face_utilities.face_mesh_frame(frame.frame)
+            if frame.mesh_detected:
+                frame.mesh_points = self.face_utilities.extract_face_mesh(frame.image, frame.mesh_info, viz=False)
+                frame.face_centered = bool(self.face_utilities.check_face_center(frame.mesh_points))
+                if frame.face_info is None:
+                    # detection was skipped: bbox and key points come from the mesh
+                    frame.face_bbox = self.face_utilities.extract_face_bbox_mesh(frame.image, frame.mesh_points)
+                    frame.face_points = self.face_utilities.extract_face_points_mesh(frame.mesh_points)
+                elif self.face_utilities.mesh_localization:
+                    # both found the face: keep learning the detector bbox from the mesh
+                    face_bbox, _ = self._face_box(frame)
+                    self.face_utilities.calibrate_mesh_bbox(frame.image, face_bbox, frame.mesh_points)
+
+            if self.face_utilities.mesh_localization:
+                if frame.mesh_detected:
+                    self.mesh_tracking.set()
+                else:
+                    self.mesh_tracking.clear()
+                    if frame.face_info is None:
+                        # tracking lost on a frame the detector skipped: reported as no face, the
+                        # next frame goes through the detector on the detect stage
+                        frame.face_detected = False
+        return frame
+
+    def decide(self, frame: LoginFrame) -> LoginFrame:
+        if frame.face_detected and frame.mesh_detected:
+            face_bbox, _ = self._face_box(frame)
+            frame.track_id = self.face_utilities.face_tracker.update(face_bbox)
+        frame.state, frame.info = self._decide(frame)
+        frame.matcher = self.matcher
+        return frame
+
+    def _identify(self, face_crop: np.ndarray, gallery: Any, extra_faces: List[np.ndarray],
+                  track_id: Optional[int]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        match = self.face_utilities.face_matching(face_crop, gallery, extra_faces, track_id)
+        return {
+            'matcher': match.matching,
+            'user': match.user_name,
+            'distance': match.distance,
+            'source': match.source,
+            'probe': match.unknown_probe,
+            'unknown': match.unknown,
+            'seconds': time.perf_counter() - start,
+        }
+
+    def _is_confident(self, matcher: bool, distance: float, source: Optional[str]) -> bool:
+        if source == 'unknown':
+            # the gallery clearly rejected this face a moment ago, more frames would not change it
+            return True
+        if not matcher:
+            return False
+        if self.face_utilities.cascade is not None:
+            # borderline distances were already re-scored by the strong model
+            return True
+        threshold = self.face_utilities.face_matcher.thresholds[self.face_utilities.face_gallery.model_name]
+        return distance <= self.policy.confident_distance_ratio * threshold
+
+    def _apply_identification(self):
+        """Take over the result of the finished identification and log the check-in in the background."""
+        future, self.pending = self.pending, None
+        try:
+            identification = future.result()
+        except Exception as e:
+            print(f"[ERROR] Face identification failed: {e}")
+            # try again with fresh crops of the next centered frames
+            self.comparison = False
+            self.cont_frame = 0
+            self.best_crops.clear()
+            self.landmark_history.clear()
+            self.jitter = None
             self.processing_state = None
-            self.face_utilities.show_state_login(face_image, state=self.processing_state)
-            return face_image, self.matcher, '¡ninguna cara fue detectada!'
+            return self.processing_state, 'Error al comparar el rostro'
 
-        # step 2: face mesh
-        check_face_mesh, face_mesh_info = self.face_utilities.face_mesh(face_image)
-        if check_face_mesh is False:
+        self.matcher, user_name = identification['matcher'], identification['user']
+        distance, source = identification['distance'], identification['source']
+        now = time.perf_counter()
+        confident = self._is_confident(self.matcher, distance, source)
+        self.last_decision = {
+            'matcher': self.matcher,
+            'user': user_name,
+            'distance': distance,
+            'confident': confident,
+            'trigger': self.decision_trigger,
+            'attempt': self.attempts,
+            'crops': self.decision_crops,
+            'track': self.decision_track,
+            'source': source,
+            'frames': self.cont_frame,
+            'centered_ms': 1000 * (now - self.centered_since),
+            'time_to_decision_ms': 1000 * (now - self.decision_started),
+            'identify_ms': 1000 * identification['seconds'],
+            'jitter': self.jitter,
+            'quality': self.decision_quality,
+        }
+        print(f"[DEBUG] Face matching result: matcher={self.matcher}, user={user_name}, {self.last_decision}")
+
+        if not confident and self.decision_trigger != 'max_wait':
+            # an early attempt decides only on a confident match, otherwise try again at the fallback
+            self.matcher = None
+            self.comparison = False
+            self.retrying = True
             self.processing_state = None
-            self.face_utilities.show_state_login(face_image, state=self.processing_state)
-            return face_image, self.matcher, '¡Ninguna cara mesh detectada!'
+            return self.processing_state, 'Comparando rostro...'
+
+        if self.matcher:
+            # step 10: save data & time - call user_check_in with access granted
+            self.processing_state = True
+            self.user_name = user_name
+            self.executor.submit(self.face_utilities.user_check_in, user_name, access_granted=True)
+            return self.processing_state, user_name
+        else:
+            # access denied for unknown face, repeats of a recently denied face are logged once per window
+            self.processing_state = False
+            self.executor.submit(self.face_utilities.deny_check_in, identification['probe'],
+                                 identification['unknown'])
+            return self.processing_state, 'Rostro no conocido'
+
+    def _face_box(self, frame: LoginFrame):
+        """Bbox and key points of the frame, extracted from the detection once."""
+        if frame.face_bbox is None:
+            frame.face_bbox = self.face_utilities.extract_face_bbox(frame.image, frame.face_info)
+            frame.face_points = self.face_utilities.extract_face_points(frame.image, frame.face_info)
+        return frame.face_bbox, frame.face_points
+
+    def _collect_crop(self, frame: LoginFrame):
+        """Score the face crop of a centered frame and keep it if it is among the best ones."""
+        # step 6: extract face info
+        # bbox & key_points
+        face_bbox, face_points = self._face_box(frame)
 
-        # step 3: extract face mesh
-        face_mesh_points_list = self.face_utilities.extract_face_mesh(face_image, face_mesh_info)
+        # step 7: face crop, copied because the caller may draw on the frame it views
+        face_crop = self.face_utilities.face_crop(frame.face_save, face_bbox)
+        if face_crop.size == 0:
+            return
+        quality = self.face_utilities.face_quality(face_crop, frame.mesh_points)
+        if self.best_crops.add(face_crop.copy(), quality):
+            print(f"[DEBUG] Face crop kept, quality score: {quality.score:.3f}")
 
-        # step 4: check face center
-        check_face_center = self.face_utilities.check_face_center(face_mesh_points_list)
+    def _track_landmarks(self, frame: LoginFrame):
+        """Mean landmark motion over the last frames, relative to the face height."""
+        if frame.mesh_points is None:
+            return
+        self.landmark_history.append(frame.mesh_points.astype(np.float32))
+        if len(self.landmark_history) < self.policy.stable_frames:
+            self.jitter = None
+            return
+        history = np.stack(self.landmark_history)
+        motion = np.linalg.norm(np.diff(history, axis=0), axis=2).mean()
+        self.jitter = float(motion / max(np.ptp(history[-1, :, 1]), 1.0))
 
-        if check_face_center:
-            # step 6: extract face info
-            # bbox & key_points
+    def _trigger(self) -> Optional[str]:
+        """Why the face should be identified now, or None to keep collecting frames."""
+        if (self.cont_frame >= self.policy.max_frames or
+                time.perf_counter() - self.centered_since >= self.policy.max_wait_seconds):
+            return 'max_wait'
+        if self.retrying or self.cont_frame < self.policy.min_frames:
+            return None
+        best = self.best_crops.best()
+        if best is None or best[1].score < self.policy.min_quality:
+            return None
+        if self.jitter is None or self.jitter > self.policy.max_jitter:
+            return None
+        return 'stable'
+
+    def _decide(self, frame: LoginFrame):
+        # step 9 runs in the background: keep showing the comparing state until its result is in
+        if self.pending is not None:
+            if not self.pending.done():
+                self.processing_state = None
+                return self.processing_state, 'Comparando rostro...'
+            return self._apply_identification()
+
+        if frame.face_detected is False:
+            self.processing_state = None
+            return self.processing_state, '¡ninguna cara fue detectada!'
+
+        if frame.mesh_detected is False:
+            self.processing_state = None
+            return self.processing_state, '¡Ninguna cara mesh detectada!'
+
+        if frame.face_centered:
             self.cont_frame = self.cont_frame + 1
+            if self.cont_frame == 1:
+                self.centered_since = time.perf_counter()
             print(f"[DEBUG] Face centered, frame count: {self.cont_frame}")
-            
-            if self.cont_frame >= 48:
+            if not self.comparison and self.matcher is None:
+                self._collect_crop(frame)
+                self._track_landmarks(frame)
+                self.decision_trigger = self._trigger()
+
+            if self.comparison or self.matcher is not None or self.decision_trigger is not None:
                 if not self.comparison and self.matcher is None:
                     self.processing_state = None  # Still processing
-                    self.face_utilities.show_state_login(face_image, state=self.processing_state)
-                    
-                    face_bbox = self.face_utilities.extract_face_bbox(face_image, face_info)
-                    face_points = self.face_utilities.extract_face_points(face_image, face_info)
-
-                    # step 7: face crop
-                    face_crop = self.face_utilities.face_crop(face_save, face_bbox)
 
-                    # Add a sanity check to ensure the crop is not empty
-                    if face_crop.size == 0:
+                    # Add a sanity check to ensure a crop was kept
+                    best = self.best_crops.best()
+                    if best is None:
                         print("[WARNING] Face crop resulted in an empty image. Skipping frame.")
-                        return face_image, self.matcher, 'Error al recortar el rostro'
+                        return self.processing_state, 'Error al recortar el rostro'
+                    face_crop, self.decision_quality = best
+                    extra_faces = []
+                    if self.face_utilities.fusion is not None:
+                        extra_faces = [crop for crop, _ in self.best_crops.top()[1:self.face_utilities.fusion_frames]]
 
-                    # step 8: read database - use default path (centralized face_images directory)
-                    faces_database, names_database, info = self.face_utilities.read_face_database()
-                    print(f"[DEBUG] Database loaded: {len(faces_database)} faces")
+                    # step 8: read gallery - snapshot of the precomputed embeddings of the enrolled faces
+                    gallery, info = self.face_utilities.read_face_gallery()
 
-                    if len(faces_database) != 0:
+                    if len(gallery) != 0:
                         self.comparison = True
-                        # step 9: compare faces
-                        self.matcher, user_name = self.face_utilities.face_matching(face_crop, faces_database, names_database)
-                        print(f"[DEBUG] Face matching result: matcher={self.matcher}, user={user_name}")
-
-                        if self.matcher:
-                            # step 10: save data & time - call user_check_in with access granted
-                            self.processing_state = True
-                            self.face_utilities.show_state_login(face_image, state=self.processing_state)
-                            self.face_utilities.user_check_in(user_name, access_granted=True)
-                            return face_image, self.matcher, user_name
-                        else:
-                            # Call user_check_in with access denied for unknown face
-                            self.processing_state = False
-                            self.face_utilities.show_state_login(face_image, state=self.processing_state)
-                            self.face_utilities.user_check_in('Rostro no conocido', access_granted=False)
-                            return face_image, self.matcher, 'Rostro no conocido'
+                        self.attempts += 1
+                        self.decision_crops = 1 + len(extra_faces)
+                        self.decision_track = frame.track_id
+                        # step 9: compare faces, off the calling thread
+                        self.decision_started = time.perf_counter()
+                        self.pending = self.executor.submit(self._identify, face_crop, gallery, extra_faces,
+                                                            frame.track_id)
+                        return self.processing_state, 'Comparando rostro...'
                     else:
                         self.processing_state = False
-                        self.face_utilities.show_state_login(face_image, state=self.processing_state)
-                        return face_image, self.matcher, 'Database vacia'
+                        return self.processing_state, 'Database vacia'
                 else:
-                    # Show the current state based on previous matching result
-                    self.face_utilities.show_state_login(face_image, state=self.processing_state)
+                    # Show the current state based on previous matching result; the user code is repeated
+                    # because a renderer sampling the pipeline may not have seen the deciding frame
                     if self.matcher:
-                        return face_image, self.matcher, 'Aprobado'
+                        return self.processing_state, self.user_name
                     else:
-                        return face_image, self.matcher, 'Rostro no conocido'
+                        return self.processing_state, 'Rostro no conocido'
             else:
                 self.processing_state = None
-                self.face_utilities.show_state_login(face_image, state=self.processing_state)
-                return face_image, self.matcher, f'Esperando frame de la cara ({self.cont_frame}/48)'
+                return self.processing_state, f'Esperando frame de la cara ({self.cont_frame}/{self.policy.max_frames})'
         else:
             # Reset frame counter if face is not centered
             self.cont_frame = 0
+            self.best_crops.clear()
+            self.landmark_history.clear()
+            self.jitter = None
+            self.retrying = False
             self.processing_state = None
-            self.face_utilities.show_state_login(face_image, state=self.processing_state)
-            return face_image, self.matcher, 'Cara no está centrada'
+            return self.processing_state, 'Cara no está centrada'
 
+    def draw(self, face_image: np.ndarray, frame: Optional[LoginFrame]):
+        """Draw the mesh and the login state of ``frame`` on ``face_image``, which may be a newer frame."""
+        if frame is None:
+            self.face_utilities.show_state_login(face_image, state=None)
+            return
+        if frame.mesh_info is not None and frame.mesh_detected:
+            self.face_utilities.draw_face_mesh(face_image, frame.mesh_info)
+        elif frame.mesh_points is not None:
+            self.face_utilities.draw_face_mesh_points(face_image, frame.mesh_points)
+        self.face_utilities.show_state_login(face_image, state=frame.state)
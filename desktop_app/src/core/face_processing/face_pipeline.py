@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class DropOldestQueue:
+    """Bounded queue between two pipeline stages; a put on a full queue drops the oldest item."""
+    def __init__(self, maxsize: int = 1):
+        self._items: deque = deque(maxlen=maxsize)
+        self._condition = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item: Any):
+        with self._condition:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self, timeout: float = 0.1) -> Optional[Any]:
+        with self._condition:
+            if not self._items:
+                self._condition.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class PipelineStage:
+    """Worker thread applying ``function`` to every item of its input queue.
+
+    ``function`` returns the item for the next stage, or None to stop the item here.
+    """
+    def __init__(self, name: str, function: Callable[[Any], Any], input_queue: DropOldestQueue,
+                 output_queue: Optional[DropOldestQueue]):
+        self.name = name
+        self.function = function
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self._timestamps: deque = deque(maxlen=60)
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"pipeline-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            item = self.input_queue.get()
+            if item is None:
+                continue
+            start = time.perf_counter()
+            try:
+                item = self.function(item)
+            except Exception as e:
+                print(f"[ERROR] pipeline stage {self.name}: {e}")
+                item = None
+            end = time.perf_counter()
+            self.processed += 1
+            self.busy_seconds += end - start
+            self._timestamps.append(end)
+            if item is not None and self.output_queue is not None:
+                self.output_queue.put(item)
+
+    def request_stop(self):
+        """Let the thread exit once it is done with its current item."""
+        self._running = False
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """Stop the thread and wait up to ``timeout`` seconds for it, forever if None; True once it exited."""
+        self.request_stop()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return False
+            self._thread = None
+        return True
+
+    def stats(self) -> Dict[str, float]:
+        timestamps = list(self._timestamps)
+        throughput = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0]) if len(timestamps) > 1 else 0.0
+        return {
+            'queue_depth': len(self.input_queue),
+            'dropped': self.input_queue.dropped,
+            'processed': self.processed,
+            'throughput_fps': throughput,
+            'mean_ms': 1000 * self.busy_seconds / self.processed if self.processed else 0.0,
+        }
+
+
+class FramePipeline:
+    """Capture -> stage 1 -> ... -> stage N, each on its own thread, joined by drop-oldest queues.
+
+    A capture thread pulls frames from ``camera`` (anything with ``read(timeout)`` returning
+    ``(ret, frame)``), keeps the newest one for display and feeds ``make_item(frame_id, frame)``
+    to the first stage. The newest item that leaves the last stage is kept as the latest result,
+    so the UI can render every captured frame at display rate with the latest inference overlaid,
+    however slow the inference stages are.
+    """
+    def __init__(self, camera: Any, make_item: Callable[[int, Any], Any],
+                 stages: List[Tuple[str, Callable[[Any], Any]]], queue_size: int = 1,
+                 wrap_frame: Optional[Callable[[int, Any], Any]] = None):
+        self.camera = camera
+        self.make_item = make_item
+        # applied to every captured frame before it is both displayed and fed to the stages
+        self.wrap_frame = wrap_frame
+        self.queues = [DropOldestQueue(queue_size) for _ in stages] + [DropOldestQueue(queue_size)]
+        self.stages = [PipelineStage(name, function, self.queues[i], self.queues[i + 1])
+                       for i, (name, function) in enumerate(stages)]
+
+        self._latest_frame: Tuple[int, Any] = (0, None)
+        self._latest_result: Any = None
+        self._frame_id = 0
+        self._running = False
+        self._capture_thread: Optional[threading.Thread] = None
+        self._collect_thread: Optional[threading.Thread] = None
+        self._capture_timestamps: deque = deque(maxlen=60)
+
+    def start(self):
+        self._running = True
+        for stage in self.stages:
+            stage.start()
+        self._capture_thread = threading.Thread(target=self._capture, name="pipeline-capture", daemon=True)
+        self._collect_thread = threading.Thread(target=self._collect, name="pipeline-collect", daemon=True)
+        self._capture_thread.start()
+        self._collect_thread.start()
+
+    def _capture(self):
+        while self._running:
+            ret, frame = self.camera.read(timeout=0.1)
+            if not ret:
+                continue
+            self._frame_id += 1
+            if self.wrap_frame is not None:
+                frame = self.wrap_frame(self._frame_id, frame)
+            self._latest_frame = (self._frame_id, frame)
+            self._capture_timestamps.append(time.perf_counter())
+            self.queues[0].put(self.make_item(self._frame_id, frame))
+
+    def _collect(self):
+        while self._running:
+            item = self.queues[-1].get()
+            if item is not None:
+                self._latest_result = item
+
+    def latest_frame(self) -> Tuple[int, Any]:
+        """(frame id, frame) of the newest captured frame, for display."""
+        return self._latest_frame
+
+    def latest_result(self) -> Any:
+        """Newest item that went through every stage, or None before the first one."""
+        return self._latest_result
+
+    def stop(self, timeout: Optional[float] = None) -> List[str]:
+        """Stop every thread and wait up to ``timeout`` seconds for them, forever if None.
+
+        A stage finishes the item it is processing first. Returns the names of the threads still
+        running when the time is up, whose stage functions may still be using their state.
+        """
+        self._running = False
+        for stage in self.stages:
+            stage.request_stop()
+        deadline = None if timeout is None else time.perf_counter() + timeout
+
+        def remaining() -> Optional[float]:
+            return None if deadline is None else max(0.0, deadline - time.perf_counter())
+
+        running = []
+        for name, thread in (('capture', self._capture_thread), ('collect', self._collect_thread)):
+            if thread is not None:
+                thread.join(remaining())
+                if thread.is_alive():
+                    running.append(name)
+        for stage in self.stages:
+            if not stage.stop(remaining()):
+                running.append(stage.name)
+        if running:
+            print(f"[WARNING] pipeline threads still running after stop: {running}")
+        return running
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-stage queue depth, drops, throughput and mean processing time, plus the capture rate."""
+        timestamps = list(self._capture_timestamps)
+        capture_fps = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0]) if len(timestamps) > 1 else 0.0
+        stats = {'capture': {'throughput_fps': capture_fps, 'frames': self._frame_id}}
+        for stage in self.stages:
+            stats[stage.name] = stage.stats()
+        return stats
@@ -0,0 +1,95 @@
+import heapq
+import itertools
+import numpy as np
+import cv2
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class FaceQuality:
+    """Quality of one face crop; ``score`` in [0, 1] combines the other measurements."""
+    score: float
+    sharpness: float
+    face_size: int
+    brightness: float
+    yaw: float
+    pitch: float
+
+
+class FaceQualityScorer:
+    """Scores a face crop by sharpness, size, exposure and head pose.
+
+    Sharpness is the variance of the Laplacian of the grey crop, face size its height in pixels
+    and brightness its mean grey level. Yaw and pitch are 2D estimates from the mesh: where the
+    nose tip falls between the cheeks (yaw) and between forehead and chin (pitch); 0 is frontal.
+    Each term is mapped to [0, 1] against a reference value and the score is their weighted sum.
+    """
+    def __init__(self, sharpness_reference: float = 100.0, size_reference: int = 200, max_angle: float = 45.0,
+                 pitch_reference: float = 0.5, weights: Optional[Dict[str, float]] = None):
+        self.sharpness_reference = sharpness_reference
+        self.size_reference = size_reference
+        self.max_angle = max_angle
+        # nose height between forehead (0) and chin (1) on a frontal face
+        self.pitch_reference = pitch_reference
+        self.weights = weights if weights else {'sharpness': 0.4, 'size': 0.2, 'brightness': 0.15, 'pose': 0.25}
+
+    def head_pose(self, mesh_points: np.ndarray) -> Tuple[float, float]:
+        """Approximate (yaw, pitch) in degrees from the (468, 2) mesh landmarks."""
+        right_cheek, left_cheek, nose = mesh_points[[234, 454, 1]].astype(np.float64)
+        forehead, chin = mesh_points[[10, 152]].astype(np.float64)
+        yaw_ratio = (nose[0] - right_cheek[0]) / max(left_cheek[0] - right_cheek[0], 1.0)
+        pitch_ratio = (nose[1] - forehead[1]) / max(chin[1] - forehead[1], 1.0)
+        angles = np.degrees(np.arcsin(np.clip([2 * (yaw_ratio - 0.5), 2 * (pitch_ratio - self.pitch_reference)],
+                                              -1.0, 1.0)))
+        return float(angles[0]), float(angles[1])
+
+    def score(self, face_crop: np.ndarray, mesh_points: Optional[np.ndarray] = None) -> FaceQuality:
+        grey = cv2.cvtColor(face_crop, cv2.COLOR_RGB2GRAY)
+        sharpness = float(cv2.Laplacian(grey, cv2.CV_64F).var())
+        brightness = float(grey.mean())
+        face_size = int(face_crop.shape[0])
+        yaw, pitch = self.head_pose(mesh_points) if mesh_points is not None else (0.0, 0.0)
+
+        terms = {
+            'sharpness': min(1.0, sharpness / self.sharpness_reference),
+            'size': min(1.0, face_size / self.size_reference),
+            'brightness': 1.0 - abs(brightness - 128.0) / 128.0,
+            'pose': max(0.0, 1.0 - max(abs(yaw), abs(pitch)) / self.max_angle),
+        }
+        score = sum(self.weights[name] * value for name, value in terms.items()) / sum(self.weights.values())
+        return FaceQuality(score, sharpness, face_size, brightness, yaw, pitch)
+
+
+class BestCropBuffer:
+    """Keeps the ``k`` best scored face crops of the current attempt."""
+    def __init__(self, k: int = 3):
+        self.k = k
+        # min-heap on the score, so the worst kept crop is replaced first
+        self._heap: List[Tuple[float, int, np.ndarray, FaceQuality]] = []
+        self._counter = itertools.count()
+
+    def add(self, face_crop: np.ndarray, quality: FaceQuality) -> bool:
+        """Keep the crop if it is among the k best so far."""
+        entry = (quality.score, next(self._counter), face_crop, quality)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if quality.score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def top(self) -> List[Tuple[np.ndarray, FaceQuality]]:
+        """Kept crops, best first."""
+        return [(face_crop, quality) for _, _, face_crop, quality in sorted(self._heap, reverse=True)]
+
+    def best(self) -> Optional[Tuple[np.ndarray, FaceQuality]]:
+        top = self.top()
+        return top[0] if top else None
+
+    def clear(self):
+        self._heap = []
+
+    def __len__(self) -> int:
+        return len(self._heap)
@@ -0,0 +1,113 @@
+import mmap
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+GALLERY_DTYPES = ('float32', 'float16', 'int8')
+
+
+def release_pages(array: np.ndarray) -> bool:
+    """Drop the resident pages of a memory-mapped array, e.g. the float32 gallery once a quantized copy is searched.
+
+    The mapping stays valid and pages are read back from the file on the next access. Returns False
+    when ``array`` is not backed by a mapping or the platform has no madvise (Windows).
+    """
+    base = array
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    mapping = getattr(base, '_mmap', None)
+    if mapping is None or not hasattr(mapping, 'madvise') or not hasattr(mmap, 'MADV_DONTNEED'):
+        return False
+    mapping.madvise(mmap.MADV_DONTNEED)
+    return True
+
+
+class QuantizedGallery:
+    """Compact in-memory gallery of normalized embeddings stored as float32, float16 or int8.
+
+    int8 uses one scale per dimension, so ``x[:, d] ~= q[:, d] * scale[d]`` and a similarity is
+    ``q @ (scale * probe)``: the probe absorbs the scales and the int8 matrix is never expanded
+    as a whole, only one chunk at a time.
+
+    The gallery is read one chunk at a time too, in the row ``order`` given if any, so building
+    it from a memory-mapped gallery never holds a second float32 copy.
+    """
+    def __init__(self, gallery: np.ndarray, names: List[str], dtype: str = 'int8', chunk_size: int = 16384,
+                 order: Optional[np.ndarray] = None):
+        if dtype not in GALLERY_DTYPES:
+            raise ValueError(f"Unsupported gallery dtype: {dtype}")
+        self.dtype = dtype
+        self.names = list(names)
+        self.chunk_size = chunk_size
+        self.scale = np.ones(gallery.shape[1] if gallery.ndim == 2 else 0, dtype=np.float32)
+
+        if dtype == 'int8' and len(gallery):
+            max_abs = np.zeros_like(self.scale)
+            for start in range(0, len(gallery), chunk_size):
+                max_abs = np.maximum(max_abs, np.abs(gallery[start:start + chunk_size]).max(axis=0))
+            self.scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        self.embeddings = np.empty((len(gallery), len(self.scale)), dtype=dtype)
+        for start in range(0, len(gallery), chunk_size):
+            chunk = gallery[start:start + chunk_size] if order is None else gallery[order[start:start + chunk_size]]
+            if dtype == 'int8':
+                chunk = np.clip(np.rint(chunk / self.scale), -127, 127)
+            self.embeddings[start:start + chunk_size] = chunk
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def similarities(self, probe: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dot products of the probe with every stored embedding, or only ``rows``, on the quantized matrix."""
+        scaled_probe = (probe * self.scale).astype(np.float32)
+        embeddings = self.embeddings if rows is None else self.embeddings[rows]
+        if self.dtype == 'float32':
+            return embeddings @ scaled_probe
+
+        similarities = np.empty(len(embeddings), dtype=np.float32)
+        for start in range(0, len(embeddings), self.chunk_size):
+            chunk = embeddings[start:start + self.chunk_size]
+            similarities[start:start + self.chunk_size] = chunk.astype(np.float32) @ scaled_probe
+        return similarities
+
+    def search(self, probe: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k gallery rows and cosine distances, usable as the index of FaceMatcherModels.identify."""
+        distances = 1.0 - self.similarities(probe)
+        k = min(top_k, len(distances))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), distances
+        best = np.argpartition(distances, k - 1)[:k]
+        return best, distances[best]
+
+    def memory_report(self) -> Dict[str, float]:
+        """Resident bytes of the embedding matrix plus scales, in total and per identity."""
+        total_bytes = self.embeddings.nbytes + self.scale.nbytes
+        return {
+            'dtype': self.dtype,
+            'identities': len(self.embeddings),
+            'total_bytes': total_bytes,
+            'bytes_per_identity': total_bytes / max(len(self.embeddings), 1),
+        }
+
+
+def quantization_report(gallery: np.ndarray, names: List[str], queries: np.ndarray) -> List[Dict[str, float]]:
+    """Memory per identity and accuracy delta of every gallery dtype versus float32.
+
+    The accuracy delta is the fraction of queries whose top-1 identity differs from float32 and
+    the worst absolute distance error over all query/gallery pairs.
+    """
+    reference = QuantizedGallery(gallery, names, 'float32')
+    reference_distances = [1.0 - reference.similarities(query) for query in queries]
+    reference_top1 = np.array([np.argmin(d) for d in reference_distances])
+
+    report = []
+    for dtype in GALLERY_DTYPES:
+        quantized = QuantizedGallery(gallery, names, dtype)
+        distances = [1.0 - quantized.similarities(query) for query in queries]
+        top1 = np.array([np.argmin(d) for d in distances])
+        max_error = max(float(np.max(np.abs(d - r))) for d, r in zip(distances, reference_distances))
+
+        row = quantized.memory_report()
+        row['top1_agreement'] = float(np.mean(top1 == reference_top1))
+        row['max_distance_error'] = max_error
+        report.append(row)
+    return report
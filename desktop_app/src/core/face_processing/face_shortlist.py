@@ -0,0 +1,105 @@
+import itertools
+import threading
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional
+
+from core.face_processing.models.face_matcher_model import FaceMatcherModels, IdentificationResult
+from core.face_processing.face_gallery import GallerySnapshot
+
+
+class IdentityShortlist:
+    """The few hundred identities granted most often and most recently, searched before the gallery.
+
+    Every granted access counts for its identity. When the shortlist is full, the identity
+    with the fewest grants leaves it, the least recently granted one on a tie (LFU with LRU
+    tie-break). A probe is compared with the shortlisted rows of the gallery snapshot and the
+    shortlist decides only on a match within ``max_distance``; anything else goes on to the full
+    gallery search. The rows are gathered once per snapshot and shortlist change.
+    """
+    def __init__(self, face_matcher: FaceMatcherModels, capacity: int = 300):
+        self.face_matcher = face_matcher
+        self.capacity = capacity
+        # user name -> [grants, last grant]
+        self._entries: Dict[str, List[int]] = {}
+        self._clock = itertools.count()
+        self._lock = threading.Lock()
+
+        # shortlisted rows of the last snapshot, rebuilt when either changes
+        self._rows = np.empty(0, dtype=np.int64)
+        self._rows_key = None
+        self._changes = 0
+
+        self.lookups = 0
+        self.hits = 0
+        # mean milliseconds of a shortlist lookup and of a full gallery search
+        self.shortlist_ms = 0.0
+        self.gallery_ms = 0.0
+        self.gallery_searches = 0
+
+    def record(self, user_name: str):
+        """Count a granted access of ``user_name``."""
+        with self._lock:
+            entry = self._entries.get(user_name)
+            if entry is not None:
+                entry[0] += 1
+                entry[1] = next(self._clock)
+                return
+            if len(self._entries) >= self.capacity:
+                evicted = min(self._entries, key=lambda name: tuple(self._entries[name]))
+                del self._entries[evicted]
+            self._entries[user_name] = [1, next(self._clock)]
+            self._changes += 1
+
+    def seed(self, logs: Iterable[Dict[str, Any]]):
+        """Count the granted accesses of backend log entries, given newest first like ``/logs/``."""
+        granted = [str(log['user_id']) for log in logs
+                   if log.get('event_type') == 'login_success' and log.get('user_id') is not None]
+        for user_name in reversed(granted):
+            self.record(user_name)
+
+    def _shortlisted_rows(self, gallery: GallerySnapshot) -> np.ndarray:
+        with self._lock:
+            key = (gallery.version, self._changes)
+            if key != self._rows_key:
+                names = set(self._entries)
+                self._rows = np.array([row for row, name in enumerate(gallery.names) if name in names],
+                                      dtype=np.int64)
+                self._rows_key = key
+            return self._rows
+
+    def identify(self, probe: np.ndarray, gallery: GallerySnapshot, max_distance: float,
+                 model_name: str = "SFace") -> Optional[IdentificationResult]:
+        """Confident match of ``probe`` among the shortlisted identities, or None to search the gallery."""
+        rows = self._shortlisted_rows(gallery)
+        self.lookups += 1
+        if len(rows) == 0:
+            return None
+        distances = self.face_matcher.embedding_distances(probe, gallery.embeddings[rows])
+        result = self.face_matcher.rank_candidates(rows, distances, gallery.names, model_name=model_name)
+        result.candidates = result.candidates[:5]
+        if not result.matching or result.distance > max_distance:
+            return None
+        self.hits += 1
+        return result
+
+    def record_timing(self, shortlist_seconds: float, gallery_seconds: Optional[float] = None):
+        """Running means of the lookup and, when one ran, of the full gallery search."""
+        self.shortlist_ms += (1000 * shortlist_seconds - self.shortlist_ms) / max(self.lookups, 1)
+        if gallery_seconds is not None:
+            self.gallery_searches += 1
+            self.gallery_ms += (1000 * gallery_seconds - self.gallery_ms) / self.gallery_searches
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            'identities': len(self._entries),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'shortlist_ms': self.shortlist_ms,
+            'gallery_ms': self.gallery_ms,
+            # each hit skipped a gallery search and paid only the lookup
+            'saved_ms': self.hits * max(self.gallery_ms - self.shortlist_ms, 0.0),
+        }
@@ -0,0 +1,206 @@
+import itertools
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+def bbox_iou(bbox_1: List[int], bbox_2: List[int]) -> float:
+    """Intersection over union of two [xi, yi, xf, yf] boxes."""
+    xi, yi = max(bbox_1[0], bbox_2[0]), max(bbox_1[1], bbox_2[1])
+    xf, yf = min(bbox_1[2], bbox_2[2]), min(bbox_1[3], bbox_2[3])
+    intersection = max(0, xf - xi) * max(0, yf - yi)
+    area_1 = (bbox_1[2] - bbox_1[0]) * (bbox_1[3] - bbox_1[1])
+    area_2 = (bbox_2[2] - bbox_2[0]) * (bbox_2[3] - bbox_2[1])
+    union = area_1 + area_2 - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+class FaceTracker:
+    """Track IDs for the faces of consecutive frames by bbox overlap.
+
+    A face continues the track whose last bbox overlaps it the most, with an IoU of at least
+    ``iou_threshold``; otherwise it starts a new track. Tracks not seen for ``max_missed_seconds``
+    are dropped, so a face that left the camera gets a new ID when it comes back.
+    """
+    def __init__(self, iou_threshold: float = 0.3, max_missed_seconds: float = 3.0):
+        self.iou_threshold = iou_threshold
+        self.max_missed_seconds = max_missed_seconds
+        # track id -> (last bbox, last seen)
+        self.tracks: Dict[int, Tuple[List[int], float]] = {}
+        self._ids = itertools.count(1)
+
+    def update(self, face_bbox: List[int], now: Optional[float] = None) -> Optional[int]:
+        """Track ID of the face in ``face_bbox``; None when there is no bbox."""
+        if not face_bbox:
+            return None
+        now = time.monotonic() if now is None else now
+        self.tracks = {track_id: (bbox, seen) for track_id, (bbox, seen) in self.tracks.items()
+                       if now - seen <= self.max_missed_seconds}
+
+        best_id, best_iou = None, self.iou_threshold
+        for track_id, (bbox, _) in self.tracks.items():
+            iou = bbox_iou(face_bbox, bbox)
+            if iou >= best_iou:
+                best_id, best_iou = track_id, iou
+        if best_id is None:
+            best_id = next(self._ids)
+        self.tracks[best_id] = (list(face_bbox), now)
+        return best_id
+
+
+class RecentIdentities:
+    """Identities granted in the last ``ttl_seconds``, checked before the full gallery search.
+
+    Each entry keeps the probe embedding that was identified and the track it came from. A new
+    probe is compared with every entry in one matmul and resolves to the closest identity, only
+    within ``max_distance`` of its probe. The track only breaks ties: somebody else stepping into
+    the same track is still resolved by distance, never by the track.
+    At most ``capacity`` identities are kept, the least recently granted one is replaced first.
+    """
+    def __init__(self, ttl_seconds: float = 10.0, capacity: int = 8):
+        self.ttl_seconds = ttl_seconds
+        self.capacity = capacity
+        # user name -> (probe embedding, track id, expiry)
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, Optional[int], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.track_hits = 0
+
+    def _prune(self, now: float):
+        for user_name in [name for name, (_, _, expiry) in self._entries.items() if expiry < now]:
+            del self._entries[user_name]
+
+    def add(self, user_name: str, embedding: np.ndarray, track_id: Optional[int] = None,
+            now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries.pop(user_name, None)
+            self._entries[user_name] = (embedding, track_id, now + self.ttl_seconds)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def match(self, probe: np.ndarray, max_distance: float, track_id: Optional[int] = None,
+              now: Optional[float] = None) -> Optional[Tuple[str, float]]:
+        """(user name, cosine distance) of the recent identity closest to ``probe``, or None."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._prune(now)
+            self.lookups += 1
+            if not self._entries:
+                return None
+            names = list(self._entries)
+            distances = 1.0 - np.stack([self._entries[name][0] for name in names]) @ probe
+            other_track = np.array([track_id is None or self._entries[name][1] != track_id for name in names])
+            # closest first, the entry of the probe's own track first on equal distances
+            best = int(np.lexsort((other_track, distances))[0])
+            if distances[best] > max_distance:
+                return None
+            self.hits += 1
+            self.track_hits += not other_track[best]
+            return names[best], float(distances[best])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            return {'identities': len(self._entries), 'lookups': self.lookups, 'hits': self.hits,
+                    'track_hits': self.track_hits,
+                    'hit_rate': self.hits / self.lookups if self.lookups else 0.0}
+
+
+class RecentUnknowns:
+    """Probes of faces denied in the last ``ttl_seconds``, so a visitor who keeps trying is denied at once.
+
+    A probe within ``max_distance`` of a denied one is the same unknown face: it counts as a
+    repeat of that entry instead of going through the gallery. The entries are forgotten when a
+    new gallery version is searched, since the face may have been enrolled meanwhile. A denial is logged the first time
+    and then at most once per ``log_window_seconds``, carrying the repeats since the last log.
+    At most ``capacity`` faces are kept, the least recently seen one is replaced first.
+    """
+    def __init__(self, ttl_seconds: float = 30.0, log_window_seconds: float = 60.0, capacity: int = 16):
+        self.ttl_seconds = ttl_seconds
+        self.log_window_seconds = log_window_seconds
+        self.capacity = capacity
+        # entry id -> [probe embedding, expiry, repeats since the last log, last log]
+        self._entries: "OrderedDict[int, list]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # gallery version the entries were denied against
+        self._version: Optional[int] = None
+        self.lookups = 0
+        self.hits = 0
+        self.logged = 0
+        self.suppressed_logs = 0
+
+    def add(self, embedding: np.ndarray, now: Optional[float] = None) -> int:
+        """Remember a denied probe; returns its entry id."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = [embedding, now + self.ttl_seconds, 1, float('-inf')]
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            return entry_id
+
+    def match(self, probe: np.ndarray, max_distance: float, version: Optional[int] = None,
+              now: Optional[float] = None) -> Optional[Tuple[int, float]]:
+        """(entry id, cosine distance) of the denied face closest to ``probe``, counted as a repeat; or None.
+
+        ``version`` is the gallery version being searched; a different one than before drops every entry.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            for entry_id in [key for key, entry in self._entries.items() if entry[1] < now]:
+                del self._entries[entry_id]
+            self.lookups += 1
+            if not self._entries:
+                return None
+            ids = list(self._entries)
+            distances = 1.0 - np.stack([self._entries[key][0] for key in ids]) @ probe
+            best = int(np.argmin(distances))
+            if distances[best] > max_distance:
+                return None
+            entry = self._entries[ids[best]]
+            entry[2] += 1
+            self._entries.move_to_end(ids[best])
+            self.hits += 1
+            return ids[best], float(distances[best])
+
+    def take_log(self, entry_id: int, now: Optional[float] = None) -> Optional[int]:
+        """Repeats to log for this denial, or None when it was already logged in the current window."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                # expired or replaced meanwhile: an ordinary denial
+                self.logged += 1
+                return 1
+            if now - entry[3] < self.log_window_seconds:
+                self.suppressed_logs += 1
+                return None
+            repeats, entry[2], entry[3] = entry[2], 0, now
+            self.logged += 1
+            return repeats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, float]:
+        with self._lock:
+            return {'faces': len(self._entries), 'lookups': self.lookups, 'hits': self.hits,
+                    'logged': self.logged, 'suppressed_logs': self.suppressed_logs}
@@ -2,13 +2,40 @@ import os
 import numpy as np
 import cv2
 import datetime
+import time
+from concurrent.futures import TimeoutError
+from dataclasses import dataclass
 from typing import List, Tuple, Any, Optional, Dict
 from core.face_processing.models.face_detect_model import FaceDetectMediapipe
-from core.face_processing.models.face_mesh_model import FaceMeshMediapipe
-from core.face_processing.models.face_matcher_model import FaceMatcherModels
+from core.face_processing.models.face_mesh_model import FaceMeshMediapipe, MeshBoxCalibration
+from core.face_processing.models.face_matcher_model import FaceMatcherModels, IdentificationResult
+from core.face_processing.face_gallery import FaceGallery, GallerySnapshot, FACE_IMAGES_PATH, FACE_EMBEDDINGS_PATH
+from core.face_processing.face_index import FaceIndexIVF
+from core.face_processing.face_quantization import QuantizedGallery, release_pages
+from core.face_processing.face_cascade import CascadeIdentifier
+from core.face_processing.face_fusion import EmbeddingFusion, fuse_embeddings
+from core.face_processing.face_tracking import FaceTracker, RecentIdentities, RecentUnknowns
+from core.face_processing.face_shortlist import IdentityShortlist
+from core.face_processing.face_workers import InferenceWorkerPool
+from core.face_processing.face_frame import Frame, resize_for_inference
+from core.face_processing.face_quality import FaceQuality, FaceQualityScorer
 from api.api_client import ApiClient
 
 
+@dataclass
+class FaceMatch:
+    """Outcome of FaceUtils.face_matching."""
+    matching: bool
+    user_name: str
+    distance: float
+    # how it was resolved: 'recent', 'shortlist', 'unknown', 'gallery', or None when the face was not embedded
+    source: Optional[str]
+    # probe of a face the gallery clearly rejected, to remember it as a recent unknown
+    unknown_probe: Optional[np.ndarray] = None
+    # RecentUnknowns entry when it was a recently denied face
+    unknown: Optional[int] = None
+
+
 class FaceUtils:
     def __init__(self, api_client: ApiClient):
         # face detect
@@ -17,6 +44,55 @@ class FaceUtils:
         self.mesh_detector = FaceMeshMediapipe()
         # face matcher
         self.face_matcher = FaceMatcherModels()
+        # face gallery: precomputed embeddings of enrolled users
+        self.face_gallery = FaceGallery(self.face_matcher)
+        self.face_gallery.load()
+        # build the gallery model now so the first login does not pay for it
+        self.face_matcher.warm_up([self.face_gallery.model_name], background=True)
+        # approximate index, only used once the gallery is too large for brute force
+        self.face_index: Optional[FaceIndexIVF] = None
+        # gallery versions the index and the quantized copy were built from
+        self.face_index_version = -1
+        self.ann_min_gallery_size = 20000
+        self.ann_nprobe = 8
+        # compact copy of the gallery for brute-force search: 'float32', 'float16' or 'int8'
+        self.gallery_dtype = 'float32'
+        self.quantized_gallery: Optional[QuantizedGallery] = None
+        self.quantized_gallery_version = -1
+        # optional cascade: strong model re-scores only borderline decisions, see enable_cascade
+        self.cascade: Optional[CascadeIdentifier] = None
+        # optional multi-frame identification: several crops of one approach fused, see enable_fusion
+        self.fusion: Optional[EmbeddingFusion] = None
+        self.fusion_frames = 3
+        # track IDs of login faces and identities granted in the last seconds: a user who presents
+        # again is checked against those few probes before the full gallery search. They outlive
+        # the login window, so a re-presentation right after a decision is resolved here
+        self.face_tracker = FaceTracker()
+        self.recent_identities = RecentIdentities(ttl_seconds=10.0)
+        # recent identities resolve a probe below this fraction of the model threshold
+        self.recent_distance_ratio = 0.8
+        # identities granted most often and most recently, searched before the whole gallery and
+        # deciding below the same fraction of the threshold; seeded from the backend logs
+        self.shortlist = IdentityShortlist(self.face_matcher)
+        # faces the gallery clearly rejected in the last seconds, beyond this fraction of the
+        # threshold: denied again without a gallery search, and logged once per window with a
+        # repeat count, see deny_check_in. Borderline rejections, maybe an enrolled user in bad
+        # light, are never cached
+        self.recent_unknowns = RecentUnknowns()
+        self.unknown_distance_ratio = 1.25
+        # detection and mesh run on frames downscaled to this width, None = full resolution. MediaPipe
+        # returns coordinates relative to its input, so bboxes and landmarks are scaled by the full
+        # frame size and crops still come from the full resolution frame. Off by default: 480 or 640
+        # gain ~25% fps but miss some small faces, see tests/face_inference_scale
+        self.inference_width: Optional[int] = None
+        # localize with FaceMesh alone while it tracks a face, FaceDetection only when tracking is lost
+        self.mesh_localization = False
+        # detector bbox relative to the mesh hull, so mesh-localized crops match the detector's
+        self.mesh_box_calibration = MeshBoxCalibration()
+        # sharpness, size, exposure and pose score of face crops
+        self.quality_scorer = FaceQualityScorer()
+        # optional worker processes for detection, mesh and probe embedding, see InferenceWorkerPool
+        self.inference_workers: Optional[InferenceWorkerPool] = None
 
         # variables
         self.angle = None
@@ -30,11 +106,21 @@ class FaceUtils:
         self.api_client = api_client
 
     # detect
+    def inference_image(self, face_image: np.ndarray) -> np.ndarray:
+        return resize_for_inference(face_image, self.inference_width)
+
     def check_face(self, face_image: np.ndarray) -> Tuple[bool, Any, np.ndarray]:
         face_save = face_image.copy()
-        check_face, face_info = self.face_detector.face_detect_mediapipe(face_image)
+        check_face, face_info = self.face_detector.face_detect_mediapipe(self.inference_image(face_image))
         return check_face, face_info, face_save
 
+    def check_face_frame(self, frame: Frame) -> Tuple[bool, Any, np.ndarray]:
+        """check_face on a Frame: no copies, the detector reads a cached view and face_save is the RGB view."""
+        # face_detect_mediapipe swaps the RGB login frames back to the camera's BGR order before
+        # detecting, so the BGR view is handed over as is
+        check_face, face_info = self.face_detector.face_detect_mediapipe_input(frame.view('bgr', self.inference_width))
+        return check_face, face_info, frame.rgb
+
     def extract_face_bbox(self, face_image: np.ndarray, face_info: Any):
         h_img, w_img, _ = face_image.shape
         bbox = self.face_detector.extract_face_bbox_mediapipe(w_img, h_img, face_info)
@@ -42,19 +128,42 @@ class FaceUtils:
 
     def extract_face_points(self, face_image: np.ndarray, face_info: Any):
         h_img, w_img, _ = face_image.shape
-        face_points = self.face_detector.extract_face_points_mediapipe(h_img, w_img, face_info)
+        face_points = self.face_detector.extract_face_points_mediapipe(w_img, h_img, face_info)
         return face_points
 
     # face mesh
     def face_mesh(self, face_image: np.ndarray) -> Tuple[bool, Any]:
-        check_face_mesh, face_mesh_info = self.mesh_detector.face_mesh_mediapipe(face_image)
+        check_face_mesh, face_mesh_info = self.mesh_detector.face_mesh_mediapipe(self.inference_image(face_image))
         return check_face_mesh, face_mesh_info
 
-    def extract_face_mesh(self, face_image: np.ndarray, face_mesh_info: Any) -> List[List[int]]:
-        face_mesh_points_list = self.mesh_detector.extract_face_mesh_points(face_image, face_mesh_info, viz=True)
+    def face_mesh_frame(self, frame: Frame) -> Tuple[bool, Any]:
+        """face_mesh on a Frame, reading the same cached view as check_face_frame."""
+        return self.mesh_detector.face_mesh_mediapipe_input(frame.view('bgr', self.inference_width))
+
+    def extract_face_mesh(self, face_image: np.ndarray, face_mesh_info: Any, viz: bool = True) -> np.ndarray:
+        face_mesh_points_list = self.mesh_detector.extract_face_mesh_points(face_image, face_mesh_info, viz=viz)
         return face_mesh_points_list
 
-    def check_face_center(self, face_points: List[List[int]]) -> bool:
+    def draw_face_mesh(self, face_image: np.ndarray, face_mesh_info: Any):
+        self.mesh_detector.draw_face_mesh(face_image, face_mesh_info)
+
+    def draw_face_mesh_points(self, face_image: np.ndarray, face_points: np.ndarray):
+        self.mesh_detector.draw_face_mesh_points(face_image, face_points)
+
+    def extract_face_bbox_mesh(self, face_image: np.ndarray, face_points: np.ndarray) -> List[int]:
+        """Detector-like bbox from the mesh, see calibrate_mesh_bbox."""
+        h_img, w_img, _ = face_image.shape
+        return self.mesh_detector.extract_face_bbox_mesh(w_img, h_img, face_points, self.mesh_box_calibration)
+
+    def calibrate_mesh_bbox(self, face_image: np.ndarray, face_bbox: List[int], face_points: np.ndarray):
+        """Learn the detector bbox from a frame where both the detector and the mesh found the face."""
+        h_img, w_img, _ = face_image.shape
+        self.mesh_box_calibration.update(self.mesh_detector.mesh_hull(face_points), face_bbox, w_img, h_img)
+
+    def extract_face_points_mesh(self, face_points: np.ndarray) -> List[List[int]]:
+        return self.mesh_detector.extract_face_points_mesh(face_points)
+
+    def check_face_center(self, face_points: np.ndarray) -> bool:
         check_face_center = self.mesh_detector.check_face_center(face_points)
         return check_face_center
 
@@ -66,16 +175,80 @@ class FaceUtils:
         xi, yi, xf, yf = xi - offset_x, yi - (offset_y*4), xf + offset_x, yf
         return face_image[yi:yf, xi:xf]
 
+    def face_quality(self, face_crop: np.ndarray, mesh_points: Optional[np.ndarray] = None) -> FaceQuality:
+        return self.quality_scorer.score(face_crop, mesh_points)
+
     # save
     def save_face(self, face_crop: np.ndarray, user_code: str, path: str):
         if len(face_crop) != 0:
             face_crop = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
+            os.makedirs(path, exist_ok=True)
             cv2.imwrite(f"{path}/{user_code}.png", face_crop)
             return True
 
         else:
             return False
 
+    def save_face_embedding(self, face_crop: np.ndarray, user_code: str) -> bool:
+        """Compute and persist the gallery embedding of a freshly captured RGB face crop."""
+        if len(face_crop) == 0:
+            return False
+        face_crop = cv2.cvtColor(face_crop, cv2.COLOR_RGB2BGR)
+        saved = self.face_gallery.add(user_code, face_crop)
+        if self.cascade is not None:
+            saved = self.cascade.strong_gallery.add(user_code, face_crop) and saved
+        return saved
+
+    # gallery
+    def enable_cascade(self, strong_model: str = "ArcFace", accept_distance: Optional[float] = None,
+                       reject_distance: Optional[float] = None):
+        """Re-score borderline matches of the gallery model with a stronger model, keeping its own gallery."""
+        strong_gallery = FaceGallery(self.face_matcher, model_name=strong_model)
+        strong_gallery.load()
+        self.face_matcher.warm_up([strong_model], background=True)
+        self.cascade = CascadeIdentifier(self.face_matcher, self.face_gallery, strong_gallery,
+                                         accept_distance=accept_distance, reject_distance=reject_distance)
+
+    def enable_fusion(self, method: str = 'mean', frames: int = 3, vote_margin: float = 0.05):
+        """Identify the ``frames`` best crops of an approach together, fused by ``mean`` embedding or ``vote``."""
+        self.fusion = EmbeddingFusion(self.face_matcher, method=method, vote_margin=vote_margin)
+        self.fusion_frames = frames
+
+    def seed_shortlist(self, limit: int = 1000):
+        """Seed the identity shortlist with the granted accesses among the latest backend logs."""
+        logs = self.api_client.get_logs(limit=limit)
+        if not logs:
+            print("[DEBUG] seed_shortlist: no logs to seed the shortlist")
+            return
+        self.shortlist.seed(logs)
+        print(f"[DEBUG] seed_shortlist: {len(self.shortlist)} identities from {len(logs)} logs")
+
+    def enable_inference_workers(self, frame_shape: Tuple[int, int, int], workers: int = 2):
+        """Run login detection, mesh and probe embedding in worker processes fed through shared memory."""
+        self.inference_workers = InferenceWorkerPool(frame_shape, workers=workers,
+                                                     model_name=self.face_gallery.model_name)
+
+    def stop_inference_workers(self):
+        if self.inference_workers is not None:
+            self.inference_workers.close()
+            self.inference_workers = None
+
+    def refresh_galleries(self):
+        """Embed the enrolled images the galleries do not hold yet, e.g. every image after an upgrade."""
+        self.face_gallery.refresh()
+        if self.cascade is not None:
+            self.cascade.strong_gallery.refresh()
+
+    def start_gallery_watchers(self):
+        self.face_gallery.start_watcher()
+        if self.cascade is not None:
+            self.cascade.strong_gallery.start_watcher()
+
+    def stop_gallery_watchers(self):
+        self.face_gallery.stop_watcher()
+        if self.cascade is not None:
+            self.cascade.strong_gallery.stop_watcher()
+
     # draw
     def show_state_signup(self, face_image: np.ndarray, state: bool, saved: bool = False):
         if saved:
@@ -144,9 +317,7 @@ class FaceUtils:
         """Read face database from the centralized face_images directory."""
         if database_path is None:
             # Default path to the centralized face_images directory
-            # From face_utils.py: go up 4 levels to reach controlAccesoFacial root
-            base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", ".."))
-            database_path = os.path.join(base_path, "data", "face_images")
+            database_path = FACE_IMAGES_PATH
             
         print(f"[DEBUG] Looking for face database at: {database_path}")
         
@@ -174,25 +345,170 @@ class FaceUtils:
         print(f"[DEBUG] Loaded {len(self.face_db)} faces from database")
         return self.face_db, self.face_names, f'Comparando {len(self.face_db)} rostros!'
 
-    def face_matching(self, current_face: np.ndarray, face_db: List[np.ndarray], name_db: List[str]) -> Tuple[bool, str]:
-        user_name: str = ''
-        print(f"[DEBUG] face_matching: Starting comparison with {len(face_db)} faces in database")
-        print(f"Initial current_face - Shape: {current_face.shape}, Dtype: {current_face.dtype}, Min: {np.min(current_face)}, Max: {np.max(current_face)}")
+    def read_face_gallery(self) -> Tuple[GallerySnapshot, str]:
+        """Take the current gallery snapshot, kept up to date by the gallery watcher."""
+        gallery = self.face_gallery.current()
+        print(f"[DEBUG] Gallery version {gallery.version}: {len(gallery)} embeddings")
+        return gallery, f'Comparando {len(gallery)} rostros!'
+
+    def gallery_index(self, gallery: GallerySnapshot) -> Optional[Any]:
+        """Search structure for the gallery: an IVF index for large galleries, a quantized copy when
+        gallery_dtype asks for one, or None for plain float32 brute force.
+
+        With a quantized gallery_dtype the IVF lists are quantized too, and once either is built the
+        pages of the mapped float32 gallery are released: searches never read it again, only the
+        few rows the shortlist and the cascade re-score.
+        """
+        # both are rebuilt on a new gallery version: a re-enrollment can change an embedding and keep the names
+        name_db = list(gallery.names)
+        if len(name_db) < self.ann_min_gallery_size:
+            if self.gallery_dtype == 'float32':
+                return None
+            if (self.quantized_gallery is None or self.quantized_gallery.dtype != self.gallery_dtype
+                    or self.quantized_gallery_version != gallery.version):
+                self.quantized_gallery = QuantizedGallery(gallery.embeddings, name_db, self.gallery_dtype)
+                self.quantized_gallery_version = gallery.version
+                release_pages(gallery.embeddings)
+                print(f"[DEBUG] Quantized gallery: {self.quantized_gallery.memory_report()}")
+            return self.quantized_gallery
+        if (self.face_index is not None and self.face_index.dtype == self.gallery_dtype
+                and self.face_index_version == gallery.version):
+            return self.face_index
+
+        index_path = os.path.join(FACE_EMBEDDINGS_PATH, f"{self.face_gallery.model_name}_ivf.npz")
+        index = FaceIndexIVF.load(index_path, gallery.embeddings, name_db, self.gallery_dtype)
+        if index is None:
+            index = FaceIndexIVF(nprobe=self.ann_nprobe, dtype=self.gallery_dtype).build(gallery.embeddings, name_db)
+            index.save(index_path)
+        if self.gallery_dtype != 'float32':
+            release_pages(gallery.embeddings)
+        index.nprobe = self.ann_nprobe
+        self.face_index, self.face_index_version = index, gallery.version
+        print(f"[DEBUG] Face index: {index.memory_report()}")
+        return self.face_index
+
+    def probe_embeddings(self, faces_bgr: List[np.ndarray]) -> np.ndarray:
+        """(N, D) embeddings of BGR probe crops in one batch, NaN rows for crops that could not be embedded."""
+        if self.inference_workers is not None:
+            try:
+                futures = [self.inference_workers.embed(face) for face in faces_bgr]
+                if all(future is not None for future in futures):
+                    embeddings = [self.inference_workers.result(future) for future in futures]
+                    dim = next((len(embedding) for embedding in embeddings if embedding is not None), 1)
+                    return np.stack([embedding if embedding is not None else np.full(dim, np.nan, dtype=np.float32)
+                                     for embedding in embeddings])
+            except (ValueError, TimeoutError, RuntimeError) as e:
+                print(f"[DEBUG] probe_embeddings in process: {e}")
+            # no free slot in time, a crop larger than the slots or a worker that failed or timed out
+        return self.face_matcher.face_embeddings(faces_bgr, model_name=self.face_gallery.model_name)
+
+    def face_matching(self, current_face: np.ndarray, gallery: GallerySnapshot,
+                      extra_faces: Optional[List[np.ndarray]] = None, track_id: Optional[int] = None) -> FaceMatch:
+        """Identify an RGB face crop; with fusion enabled ``extra_faces``, more crops of the same approach, join it.
+
+        ``track_id`` is the FaceTracker track of the face, breaks ties between recent identities.
+        Everything about the decision is in the returned FaceMatch: FaceUtils is shared by every login
+        window, so two identifications may run at once.
+        """
+        print(f"[DEBUG] face_matching: Starting comparison with {len(gallery)} faces in gallery")
         current_face = cv2.cvtColor(current_face, cv2.COLOR_RGB2BGR)
-        print(f"Converted current_face (to BGR) - Shape: {current_face.shape}, Dtype: {current_face.dtype}, Min: {np.min(current_face)}, Max: {np.max(current_face)}")
-
-        for idx, face_img in enumerate(face_db):
-            print(f"Database face_img ({name_db[idx]}) - Shape: {face_img.shape}, Dtype: {face_img.dtype}, Min: {np.min(face_img)}, Max: {np.max(face_img)}")
-            self.matching, self.distance = self.face_matcher.face_matching_sface_model(current_face, face_img)
-            print(f'validating face with: {name_db[idx]}')
-            print(f'matching: {self.matching} distance: {self.distance}')
-            if self.matching:
-                user_name = name_db[idx]
-                print(f"[DEBUG] face_matching: Found match! User: {user_name}")
-                return self.matching, user_name
-                
-        print(f"[DEBUG] face_matching: No matches found, returning 'Rostro no conocido'")
-        return False, 'Rostro no conocido'
+
+        # only the probe faces go through the model, the gallery is already embedded; every crop
+        # goes through it in the same batch
+        faces = [current_face]
+        if self.fusion is not None and self.cascade is None:
+            faces += [cv2.cvtColor(face, cv2.COLOR_RGB2BGR) for face in (extra_faces or [])]
+        probes = self.probe_embeddings(faces)
+        probe_embedding = fuse_embeddings(probes)
+        if probe_embedding is None:
+            print(f"[DEBUG] face_matching: Could not embed current face, returning 'Rostro no conocido'")
+            return FaceMatch(False, 'Rostro no conocido', float('inf'), None)
+
+        # a user identified a moment ago: a distance check against a few recent probes
+        model_name = self.face_gallery.model_name
+        confident_distance = self.recent_distance_ratio * self.face_matcher.thresholds[model_name]
+        # with the cascade on every grant goes through it, so borderline ones are verified by the strong model
+        recent = None
+        if self.cascade is None:
+            recent = self.recent_identities.match(probe_embedding, confident_distance, track_id)
+        if recent is not None:
+            self.shortlist.record(recent[0])
+            print(f"[DEBUG] face_matching: Recently identified user {recent[0]}, distance {recent[1]}, "
+                  f"track {track_id}, {self.recent_identities.metrics()}")
+            return FaceMatch(True, recent[0], recent[1], 'recent')
+
+        # the whole match uses this one snapshot, whatever enrollments are published meanwhile
+        start = time.perf_counter()
+        # with the cascade on, the shortlist decides only where the cascade would not escalate either
+        shortlist_distance = confident_distance
+        if self.cascade is not None:
+            shortlist_distance = min(confident_distance, self.cascade.accept_distance)
+        result = self.shortlist.identify(probe_embedding, gallery, shortlist_distance, model_name=model_name)
+        shortlist_seconds = time.perf_counter() - start
+        source, unknown, unknown_probe = None, None, None
+        if result is None:
+            # a face denied a moment ago, not one of the regulars: denied again without the 1:N search
+            unknown = self.recent_unknowns.match(probe_embedding, confident_distance, version=gallery.version)
+        if result is not None:
+            source = 'shortlist'
+            self.shortlist.record_timing(shortlist_seconds)
+            print(f"[DEBUG] face_matching: shortlist metrics {self.shortlist.metrics()}")
+        elif unknown is not None:
+            source = 'unknown'
+            result = IdentificationResult(False, 'Rostro no conocido', unknown[1], float('inf'))
+            print(f"[DEBUG] face_matching: Recently denied face, distance {unknown[1]}, "
+                  f"{self.recent_unknowns.metrics()}")
+        elif self.cascade is not None:
+            probe = probes[0] if not np.isnan(probes[0]).any() else None
+            result = self.cascade.identify(current_face, gallery, index=self.gallery_index(gallery), probe=probe)
+            print(f"[DEBUG] face_matching: cascade metrics {self.cascade.metrics()}")
+        elif self.fusion is not None:
+            result = self.fusion.identify(probes, gallery, model_name=model_name, index=self.gallery_index(gallery))
+            print(f"[DEBUG] face_matching: fusion metrics {self.fusion.metrics()}")
+        else:
+            result = self.face_matcher.identify(probe_embedding, gallery.embeddings, gallery.names,
+                                                model_name=model_name, index=self.gallery_index(gallery))
+        if source is None:
+            source = 'gallery'
+            self.shortlist.record_timing(shortlist_seconds, time.perf_counter() - start - shortlist_seconds)
+            if not result.matching and result.distance > self.unknown_distance_ratio * self.unknown_threshold():
+                unknown_probe = probe_embedding
+        if result.matching:
+            self.recent_identities.add(result.user_name, probe_embedding, track_id)
+            self.shortlist.record(result.user_name)
+        print(f'candidates: {result.candidates}')
+        print(f'matching: {result.matching} distance: {result.distance} margin: {result.margin}')
+        if result.matching:
+            print(f"[DEBUG] face_matching: Found match! User: {result.user_name}")
+        else:
+            print(f"[DEBUG] face_matching: No matches found, returning 'Rostro no conocido'")
+        return FaceMatch(result.matching, result.user_name, result.distance, source, unknown_probe,
+                         unknown[0] if unknown is not None else None)
+
+    def unknown_threshold(self) -> float:
+        """Largest threshold of the models that may have decided, the cascade's strong one included."""
+        threshold = self.face_matcher.thresholds[self.face_gallery.model_name]
+        if self.cascade is not None:
+            threshold = max(threshold, self.face_matcher.thresholds[self.cascade.strong_gallery.model_name])
+        return threshold
+
+    def deny_check_in(self, probe_embedding: Optional[np.ndarray], unknown: Optional[int] = None):
+        """Log a denial; a recently denied face is logged once per window, with its repeats since the last log.
+
+        ``probe_embedding`` is the probe of a face the gallery clearly rejected, None for any other
+        denial, which is logged as usual and not cached. ``unknown`` is the RecentUnknowns entry the
+        probe matched, None for a face denied for the first time.
+        """
+        if unknown is not None:
+            repeats = self.recent_unknowns.take_log(unknown)
+            if repeats is None:
+                print(f"[DEBUG] deny_check_in: denial already logged in this window, {self.recent_unknowns.metrics()}")
+                return False
+            details = 'Rostro no conocido' if repeats <= 1 else f'Rostro no conocido (repetido {repeats} veces)'
+            return self.user_check_in(details, access_granted=False)
+        if probe_embedding is not None:
+            self.recent_unknowns.take_log(self.recent_unknowns.add(probe_embedding))
+        return self.user_check_in('Rostro no conocido', access_granted=False)
 
     def user_check_in(self, user_info, access_granted: bool):
         """Create an access log entry for user check-in."""
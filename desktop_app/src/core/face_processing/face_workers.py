@@ -0,0 +1,248 @@
+import itertools
+import queue
+import threading
+import multiprocessing as mp
+import numpy as np
+from concurrent.futures import Future, TimeoutError
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class SharedFrameRing:
+    """Fixed ring of frame-sized slots in one ``multiprocessing.shared_memory`` block.
+
+    A frame is copied once into a slot and the workers read it in place, so only the slot number
+    crosses the process boundary instead of a pickled array.
+    """
+    def __init__(self, slots: int, frame_shape: Tuple[int, ...], name: Optional[str] = None):
+        self.slots = slots
+        self.frame_shape = tuple(frame_shape)
+        self.slot_size = int(np.prod(self.frame_shape))
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((slots,) + self.frame_shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def fits(self, image: np.ndarray) -> bool:
+        """Whether ``image`` is a uint8 image with the slots' channels and at most their height and width."""
+        return (image.dtype == np.uint8 and image.shape[2:] == self.frame_shape[2:]
+                and image.shape[0] <= self.frame_shape[0] and image.shape[1] <= self.frame_shape[1])
+
+    def write(self, slot: int, image: np.ndarray) -> Tuple[int, ...]:
+        """Copy ``image`` (at most frame sized) into the top-left corner of a slot and return its shape."""
+        if not self.fits(image):
+            raise ValueError(f"Image {image.shape} {image.dtype} does not fit a {self.frame_shape} uint8 slot")
+        h, w = image.shape[:2]
+        self.frames[slot, :h, :w] = image
+        return image.shape
+
+    def read(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        """View of the image written into ``slot``; valid until the slot is written again."""
+        return self.frames[slot, :shape[0], :shape[1]]
+
+    def close(self):
+        del self.frames
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _inference_worker(ring_name: str, slots: int, frame_shape: Tuple[int, ...], model_name: str,
+                      tasks: Any, results: Any):
+    """Worker process: owns its own MediaPipe graphs and embedding model and answers with small results."""
+    from core.face_processing.models.face_detect_model import FaceDetectMediapipe
+    from core.face_processing.models.face_mesh_model import FaceMeshMediapipe
+    from core.face_processing.models.face_matcher_model import FaceMatcherModels
+
+    ring = SharedFrameRing(slots, frame_shape, name=ring_name)
+    face_detector = FaceDetectMediapipe()
+    mesh_detector = FaceMeshMediapipe()
+    face_matcher = FaceMatcherModels()
+    face_matcher.get_model(model_name)
+    results.put(('ready', None, None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, kind, slot, shape = task
+        try:
+            image = ring.read(slot, shape)
+            if kind == 'analyze':
+                result = analyze_frame(face_detector, mesh_detector, image)
+            else:
+                result = face_matcher.face_embedding(image, model_name=model_name)
+            results.put((task_id, result, None))
+        except Exception as e:
+            results.put((task_id, None, str(e)))
+    ring.close()
+
+
+def analyze_frame(face_detector: Any, mesh_detector: Any, face_image: np.ndarray) -> Dict[str, Any]:
+    """Detection and mesh of one RGB frame reduced to plain lists: bbox, key points, mesh points, centering."""
+    h_img, w_img, _ = face_image.shape
+    result: Dict[str, Any] = {'face_detected': False, 'mesh_detected': False, 'face_centered': False}
+    result['face_detected'], face_info = face_detector.face_detect_mediapipe(face_image)
+    if not result['face_detected']:
+        return result
+    result['face_bbox'] = face_detector.extract_face_bbox_mediapipe(w_img, h_img, face_info)
+    result['face_points'] = face_detector.extract_face_points_mediapipe(w_img, h_img, face_info)
+
+    result['mesh_detected'], mesh_info = mesh_detector.face_mesh_mediapipe(face_image)
+    if result['mesh_detected']:
+        mesh_points = mesh_detector.extract_face_mesh_points(face_image, mesh_info, viz=False)
+        result['mesh_points'] = mesh_points
+        result['face_centered'] = bool(mesh_detector.check_face_center(mesh_points))
+    return result
+
+
+class InferenceWorkerPool:
+    """Detection, mesh and embedding inference in separate processes, fed through a SharedFrameRing.
+
+    Each worker process loads its own models, so inference runs on other cores and outside the
+    GIL of the Tk process. ``analyze`` and ``embed`` copy the image into a free ring slot, send the
+    slot number and return a Future; the slot is reused once the worker has answered. When every
+    slot is busy ``analyze`` returns None and the frame is dropped, like the pipeline queues do.
+    Images that do not fit a slot raise ValueError, so the caller can run them in process.
+
+    ``result`` waits at most ``timeout`` seconds for a future. A worker that does not answer in
+    time is taken as hung or dead: every worker is restarted, the pending futures fail with
+    TimeoutError and their slots are freed.
+    """
+    def __init__(self, frame_shape: Tuple[int, int, int] = (720, 1280, 3), workers: int = 2,
+                 slots: Optional[int] = None, model_name: str = "SFace", timeout: float = 5.0):
+        self.frame_shape = tuple(frame_shape)
+        self.workers = workers
+        self.model_name = model_name
+        self.timeout = timeout
+        self.ring = SharedFrameRing(slots if slots else 2 * workers, self.frame_shape)
+
+        self._free_slots: queue.Queue = queue.Queue()
+        for slot in range(self.ring.slots):
+            self._free_slots.put(slot)
+        self._pending: Dict[int, Tuple[Future, int]] = {}
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self.ready_workers = 0
+        self.restarts = 0
+        self._start_workers()
+        self._running = True
+        self._collector = threading.Thread(target=self._collect, name="inference-results", daemon=True)
+        self._collector.start()
+
+    def _start_workers(self):
+        # spawn: TensorFlow and MediaPipe are not fork safe once initialised in the parent
+        context = mp.get_context('spawn')
+        # new queues on every start: a worker killed while writing can leave a queue unusable
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes: List[Any] = []
+        for _ in range(self.workers):
+            process = context.Process(target=_inference_worker, daemon=True,
+                                      args=(self.ring.name, self.ring.slots, self.frame_shape, self.model_name,
+                                            self._tasks, self._results))
+            process.start()
+            self._processes.append(process)
+
+    def _stop_workers(self):
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join(timeout=2.0)
+
+    def restart(self):
+        """Replace every worker process; the pending futures fail with TimeoutError."""
+        with self._lock:
+            self._stop_workers()
+            pending, self._pending = self._pending, {}
+            self.ready_workers = 0
+            self.restarts += 1
+            self._start_workers()
+        # the workers that could still read these slots are gone
+        for future, slot in pending.values():
+            self._free_slots.put(slot)
+            if not future.done():
+                future.set_exception(TimeoutError("inference worker restarted"))
+        print(f"[DEBUG] Inference workers restarted, {len(pending)} pending tasks failed")
+
+    def result(self, future: Future, timeout: Optional[float] = None) -> Any:
+        """``future.result`` bounded by ``timeout`` (the pool timeout by default); restarts the workers on expiry."""
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            if not future.done():
+                self.restart()
+            raise
+
+    def _collect(self):
+        while self._running:
+            try:
+                task_id, result, error = self._results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError, ValueError):
+                # the queue of workers replaced by restart
+                continue
+            if task_id == 'ready':
+                self.ready_workers += 1
+                continue
+            with self._lock:
+                future, slot = self._pending.pop(task_id, (None, None))
+            if future is None:
+                # answered by a worker already restarted, the future has failed
+                continue
+            self._free_slots.put(slot)
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(error))
+
+    def _submit(self, kind: str, image: np.ndarray, block: bool) -> Optional[Future]:
+        if not self.ring.fits(image):
+            raise ValueError(f"Image {image.shape} {image.dtype} does not fit the {self.ring.frame_shape} slots")
+        try:
+            slot = self._free_slots.get(block=block, timeout=self.timeout if block else None)
+        except queue.Empty:
+            return None
+        shape = self.ring.write(slot, image)
+        future: Future = Future()
+        with self._lock:
+            task_id = next(self._task_ids)
+            self._pending[task_id] = (future, slot)
+        self._tasks.put((task_id, kind, slot, shape))
+        return future
+
+    def analyze(self, face_image: np.ndarray) -> Optional[Future]:
+        """Detection and mesh of an RGB frame; None when every slot is busy."""
+        return self._submit('analyze', face_image, block=False)
+
+    def embed(self, face_bgr: np.ndarray) -> Optional[Future]:
+        """Normalized embedding of a BGR face crop; the result is None when no face is found.
+
+        Waits up to ``timeout`` for a free slot, None when none was freed.
+        """
+        return self._submit('embed', face_bgr, block=True)
+
+    def is_ready(self) -> bool:
+        return self.ready_workers == self.workers
+
+    def stats(self) -> Dict[str, int]:
+        return {'workers': self.workers, 'ready_workers': self.ready_workers, 'restarts': self.restarts,
+                'busy_slots': self.ring.slots - self._free_slots.qsize(), 'slots': self.ring.slots}
+
+    def close(self):
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self._running = False
+        self._collector.join(timeout=1.0)
+        self.ring.close()
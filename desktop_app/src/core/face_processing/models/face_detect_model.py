@@ -1,22 +1,29 @@
 import numpy as np
-import mediapipe as mp
 import cv2
 from typing import Tuple, Any
 
+from core.startup import startup_timer
+
 
 class FaceDetectMediapipe:
     def __init__(self):
-        # mediapipe
+        # mediapipe is imported here so importing this module stays cheap
+        with startup_timer.measure("import mediapipe"):
+            import mediapipe as mp
         self.object_face_mp = mp.solutions.face_detection
-        self.face_detector_mp = self.object_face_mp.FaceDetection(min_detection_confidence=0.7, model_selection=0)
+        with startup_timer.measure("load mediapipe FaceDetection"):
+            self.face_detector_mp = self.object_face_mp.FaceDetection(min_detection_confidence=0.7, model_selection=0)
         self.bbox = []
         self.face_points = []
 
     def face_detect_mediapipe(self, face_image: np.ndarray) -> Tuple[bool, Any]:
         rgb_image = face_image.copy()
         rgb_image = cv2.cvtColor(rgb_image, cv2.COLOR_BGR2RGB)
+        return self.face_detect_mediapipe_input(rgb_image)
 
-        faces = self.face_detector_mp.process(rgb_image)
+    def face_detect_mediapipe_input(self, input_image: np.ndarray) -> Tuple[bool, Any]:
+        """Detect on an image already in the channel order fed to the graph; it is read, never copied."""
+        faces = self.face_detector_mp.process(input_image)
         if faces.detections is None:
             return False, faces
         else:
@@ -1,9 +1,32 @@
-import face_recognition as fr
-from deepface import DeepFace
-from typing import Tuple
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
+import time
 import cv2
 import numpy as np
 
+from core.startup import LazyModule, startup_timer
+
+# deepface pulls in TensorFlow, so both backends are only imported when a model is first used
+fr = LazyModule("face_recognition")
+# deepface/__init__.py does not import its DeepFace submodule, so the submodule itself is imported
+DeepFace = LazyModule("deepface.DeepFace")
+
+# weights DeepFace downloads for SFace, read again by cv2.dnn for batched forward passes
+SFACE_WEIGHTS = "face_recognition_sface_2021dec.onnx"
+
+
+@dataclass
+class IdentificationResult:
+    """Outcome of a 1:N search: best identity, its distance and the ranked candidates."""
+    matching: bool
+    user_name: str
+    distance: float
+    # distance gap between the best candidate and the runner-up (inf with a single candidate)
+    margin: float
+    candidates: List[Tuple[str, float]] = field(default_factory=list)
+
 
 class FaceMatcherModels:
     def __init__(self):
@@ -19,8 +42,236 @@ class FaceMatcherModels:
             "SFace",
             "GhostFaceNet",
         ]
+        # cosine distance thresholds used by DeepFace.verify for each model
+        self.thresholds = {
+            "VGG-Face": 0.68,
+            "Facenet": 0.40,
+            "Facenet512": 0.30,
+            "OpenFace": 0.10,
+            "DeepFace": 0.23,
+            "DeepID": 0.015,
+            "ArcFace": 0.68,
+            "Dlib": 0.07,
+            "SFace": 0.593,
+            "GhostFaceNet": 0.65,
+        }
+        # model registry: every model is built and warmed up once, then shared by all callers
+        self.registry: Dict[str, Any] = {}
+        self._registry_lock = threading.Lock()
+        # SFace as a cv2.dnn network, which takes an NCHW batch; FaceRecognizerSF only takes one face
+        self._sface_net: Optional[Any] = None
+        self._sface_net_lock = threading.Lock()
+        # models whose batched forward failed once, embedded row by row from then on
+        self._row_by_row: set = set()
         print("FaceMatcherModels initialized.")
 
+    def get_model(self, model_name: str = "SFace") -> Any:
+        """Return the ready-to-use model, building and warming it up on first use."""
+        model = self.registry.get(model_name)
+        if model is not None:
+            return model
+
+        with self._registry_lock:
+            # another thread may have finished loading it while this one waited
+            if model_name not in self.registry:
+                start = time.perf_counter()
+                model = DeepFace.build_model(model_name)
+                build_time = time.perf_counter() - start
+                startup_timer.record(f"build {model_name} model", build_time)
+
+                # warm-up: the first inference pays for graph tracing and memory allocation
+                start = time.perf_counter()
+                width, height = model.input_shape
+                dummy = np.zeros((1, height, width, 3), dtype=np.float32)
+                if hasattr(model.model, 'layers'):
+                    model.model(dummy, training=False)
+                else:
+                    model.forward(dummy)
+                DeepFace.extract_faces(np.zeros((height, width, 3), dtype=np.uint8), detector_backend="opencv",
+                                       enforce_detection=False, align=True)
+                warm_up_time = time.perf_counter() - start
+                startup_timer.record(f"warm up {model_name} model", warm_up_time)
+                print(f"{model_name} model loaded in {build_time:.2f}s, warmed up in {warm_up_time:.2f}s")
+                self.registry[model_name] = model
+        return self.registry[model_name]
+
+    def is_ready(self, model_name: str = "SFace") -> bool:
+        return model_name in self.registry
+
+    def warm_up(self, model_names: List[str], background: bool = True) -> Optional[threading.Thread]:
+        """Load and warm up the given models, on a daemon thread when ``background`` is set."""
+        def load_models():
+            for model_name in model_names:
+                try:
+                    self.get_model(model_name)
+                except Exception as e:
+                    print(f"Error loading {model_name} model: {e}")
+
+        if not background:
+            load_models()
+            return None
+        thread = threading.Thread(target=load_models, daemon=True)
+        thread.start()
+        return thread
+
+    def face_embedding(self, face: np.ndarray, model_name: str = "SFace") -> Optional[np.ndarray]:
+        """Compute the L2-normalized embedding of a BGR face crop, or None on failure."""
+        embedding = self.face_embeddings([face], model_name=model_name)[0]
+        return None if np.isnan(embedding).any() else embedding
+
+    @staticmethod
+    def _preprocess_face(face: np.ndarray, target_size: Tuple[int, int]) -> np.ndarray:
+        """Detect and align a BGR crop like DeepFace.represent, then letterbox it to (height, width) in [0, 1]."""
+        # extract_faces returns the aligned face as RGB in [0, 1], the models take BGR
+        img = DeepFace.extract_faces(face, detector_backend="opencv", enforce_detection=False, align=True)[0]['face']
+        img = np.ascontiguousarray(img[:, :, ::-1], dtype=np.float32)
+
+        height, width = target_size
+        factor = min(height / img.shape[0], width / img.shape[1])
+        resized = cv2.resize(img, (max(1, int(img.shape[1] * factor)), max(1, int(img.shape[0] * factor))))
+        diff_h, diff_w = height - resized.shape[0], width - resized.shape[1]
+        return np.pad(resized, ((diff_h // 2, diff_h - diff_h // 2), (diff_w // 2, diff_w - diff_w // 2), (0, 0)))
+
+    def _sface_batch_net(self) -> Any:
+        """The SFace ONNX weights DeepFace downloaded, loaded as a cv2.dnn network."""
+        with self._sface_net_lock:
+            if self._sface_net is None:
+                home = os.getenv("DEEPFACE_HOME", default=os.path.expanduser("~"))
+                self._sface_net = cv2.dnn.readNetFromONNX(os.path.join(home, ".deepface", "weights", SFACE_WEIGHTS))
+            return self._sface_net
+
+    def _forward_batch(self, model: Any, model_name: str, batch: np.ndarray) -> np.ndarray:
+        """(N, D) raw embeddings of a preprocessed (N, H, W, 3) BGR batch in [0, 1], one forward pass."""
+        if hasattr(model.model, 'layers'):
+            return np.asarray(model.model(batch, training=False))
+        if model_name == "SFace":
+            # the blob FaceRecognizerSF.feature builds for one face: uint8 BGR swapped to RGB, NCHW
+            faces = [np.clip(face * 255, 0, 255).astype(np.uint8) for face in batch]
+            blob = cv2.dnn.blobFromImages(faces, 1.0, (model.input_shape[0], model.input_shape[1]), (0, 0, 0),
+                                          swapRB=True, crop=False)
+            net = self._sface_batch_net()
+            with self._sface_net_lock:
+                net.setInput(blob)
+                return net.forward().reshape(len(batch), -1).copy()
+        if model_name == "Dlib":
+            # dlib's descriptor takes a list of aligned RGB uint8 chips
+            faces = [np.ascontiguousarray(np.clip(face[:, :, ::-1] * 255, 0, 255).astype(np.uint8)) for face in batch]
+            return np.array(model.model.model.compute_face_descriptor(faces))
+        return np.concatenate([np.atleast_2d(model.forward(batch[i:i + 1])) for i in range(len(batch))])
+
+    def face_embeddings(self, faces: List[np.ndarray], model_name: str = "SFace", batch_size: int = 32) -> np.ndarray:
+        """L2-normalized (N, D) embeddings of BGR face crops computed in batched forward passes.
+
+        Preprocessed faces are stacked into one (N, H, W, 3) array and each batch goes through a
+        single call: Keras backed models directly, SFace as an NCHW blob through cv2.dnn and Dlib
+        as a list of chips. A backend that rejects the batch is run row by row from then on.
+        Rows of crops that could not be embedded are NaN.
+        """
+        model = self.get_model(model_name)
+        width, height = model.input_shape
+        batch = np.zeros((len(faces), height, width, 3), dtype=np.float32)
+        valid = np.zeros(len(faces), dtype=bool)
+        for i, face in enumerate(faces):
+            try:
+                batch[i] = self._preprocess_face(face, (height, width))
+                valid[i] = True
+            except Exception as e:
+                print(f"Error preprocessing face for {model_name}; face shape: {face.shape}, exception: {e}")
+
+        embeddings = np.full((len(faces), model.output_shape), np.nan, dtype=np.float32)
+        rows = np.flatnonzero(valid)
+        try:
+            if model_name not in self._row_by_row:
+                try:
+                    for start in range(0, len(rows), batch_size):
+                        chunk = rows[start:start + batch_size]
+                        embeddings[chunk] = self._forward_batch(model, model_name, batch[chunk])
+                except Exception as e:
+                    if hasattr(model.model, 'layers'):
+                        raise
+                    # e.g. weights not where DeepFace keeps them, or an ONNX graph fixed to batch 1
+                    print(f"[DEBUG] {model_name} batched forward failed, embedding row by row: {e}")
+                    self._row_by_row.add(model_name)
+            if model_name in self._row_by_row:
+                for row in rows:
+                    embeddings[row] = model.forward(batch[row:row + 1])
+        except Exception as e:
+            print(f"Error computing {model_name} embeddings for {len(rows)} faces; exception: {e}")
+            return np.full((len(faces), model.output_shape), np.nan, dtype=np.float32)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings[(norms == 0).ravel()] = np.nan
+        return embeddings / np.where(norms == 0, 1.0, norms)
+
+    def embedding_matching(self, embedding_1: np.ndarray, embedding_2: np.ndarray,
+                           model_name: str = "SFace") -> Tuple[bool, float]:
+        """Compare two normalized embeddings with the cosine distance used by DeepFace.verify."""
+        distance = float(1.0 - np.dot(embedding_1, embedding_2))
+        return distance <= self.thresholds[model_name], distance
+
+    def distance_threshold(self, model_name: str = "SFace", distance_metric: str = "cosine") -> float:
+        """Threshold for a metric; the euclidean one is derived from cosine since embeddings are normalized."""
+        threshold = self.thresholds[model_name]
+        if distance_metric == "euclidean":
+            return float(np.sqrt(2.0 * threshold))
+        return threshold
+
+    def embedding_distances(self, probe: np.ndarray, gallery: np.ndarray, distance_metric: str = "cosine") -> np.ndarray:
+        """Distances from one normalized probe to every row of an (N, D) gallery with a single matmul."""
+        similarities = gallery @ probe
+        if distance_metric == "cosine":
+            return 1.0 - similarities
+        elif distance_metric == "euclidean":
+            squared = np.einsum('ij,ij->i', gallery, gallery) + np.dot(probe, probe) - 2.0 * similarities
+            return np.sqrt(np.maximum(squared, 0.0))
+        raise ValueError(f"Unsupported distance metric: {distance_metric}")
+
+    def rank_candidates(self, indices: np.ndarray, distances: np.ndarray, names: List[str], model_name: str = "SFace",
+                        distance_metric: str = "cosine") -> IdentificationResult:
+        """Build an IdentificationResult from candidate gallery rows and their distances, closest first."""
+        if len(indices) == 0:
+            return IdentificationResult(False, 'Rostro no conocido', float('inf'), float('inf'))
+
+        # sort by distance and then by gallery row so ties never depend on load order
+        order = np.lexsort((indices, distances))
+        indices, distances = indices[order], distances[order]
+        candidates = [(names[i], float(d)) for i, d in zip(indices, distances)]
+
+        best_name, best_distance = candidates[0]
+        margin = candidates[1][1] - best_distance if len(candidates) > 1 else float('inf')
+        matching = best_distance <= self.distance_threshold(model_name, distance_metric)
+        user_name = best_name if matching else 'Rostro no conocido'
+        return IdentificationResult(matching, user_name, best_distance, margin, candidates)
+
+    def identify(self, probe: np.ndarray, gallery: np.ndarray, names: List[str], top_k: int = 5,
+                 model_name: str = "SFace", distance_metric: str = "cosine", index: Any = None) -> IdentificationResult:
+        """1:N identification of a probe embedding against an (N, D) gallery, returning the top-k closest.
+
+        When an approximate index (anything with ``search(probe, top_k)`` returning gallery rows and
+        cosine distances) is given, it is searched instead of scanning the whole gallery.
+        """
+        if len(names) == 0:
+            return self.rank_candidates(np.empty(0, dtype=np.int64), np.empty(0), names, model_name, distance_metric)
+
+        # keep the runner-up even for top_k=1 so the margin can be reported
+        k = min(max(top_k, 2), len(names))
+        if index is not None:
+            indices, distances = index.search(probe, top_k=k)
+            if distance_metric == "euclidean":
+                distances = np.sqrt(np.maximum(2.0 * distances, 0.0))
+            result = self.rank_candidates(indices, distances, names, model_name, distance_metric)
+            result.candidates = result.candidates[:max(top_k, 1)]
+            return result
+
+        distances = self.embedding_distances(probe, gallery, distance_metric)
+        if k < len(names):
+            indices = np.argpartition(distances, k - 1)[:k]
+        else:
+            indices = np.arange(len(names))
+        result = self.rank_candidates(indices, distances[indices], names, model_name, distance_metric)
+        result.candidates = result.candidates[:max(top_k, 1)]
+        return result
+
     def face_matching_face_recognition_model(self, face_1: np.ndarray, face_2: np.ndarray) -> Tuple[bool, float]:
         print("Attempting face matching with face_recognition_model...")
         face_1 = cv2.cvtColor(face_1, cv2.COLOR_BGR2RGB)
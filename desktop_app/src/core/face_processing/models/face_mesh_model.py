@@ -1,21 +1,76 @@
 import numpy as np
-import mediapipe as mp
 import cv2
-from typing import Any, List, Tuple
+from typing import Any, List, Optional, Tuple
+
+from core.startup import startup_timer
+
+
+# pairs of mesh landmarks averaged into each FaceDetection key point, in FaceDetection order:
+# right eye, left eye, nose tip, mouth center, right ear tragion, left ear tragion
+MESH_KEY_POINTS = np.array([(33, 133), (362, 263), (1, 1), (13, 14), (234, 234), (454, 454)])
+MESH_LANDMARKS = 468
+
+
+class MeshBoxCalibration:
+    """Maps the box around the mesh onto the box FaceDetection gives for the same face.
+
+    The landmark hull runs from the forehead to the chin and from cheek to cheek, while the
+    detector box, which face crops and enrollments are cut with, has other margins. Every frame
+    where both ran gives the detector edges relative to the hull, in hull widths and heights; the
+    running mean of those offsets is applied to the hull of frames localized by the mesh alone.
+    Detector boxes clipped by the image border are not used as samples.
+    """
+    def __init__(self, momentum: float = 0.1):
+        self.momentum = momentum
+        # (xi, yi, xf, yf) detector edge minus hull edge, over (w, h, w, h) of the hull
+        self.offsets: Optional[np.ndarray] = None
+        self.samples = 0
+
+    @staticmethod
+    def _scale(hull: np.ndarray) -> np.ndarray:
+        w, h = max(hull[2] - hull[0], 1), max(hull[3] - hull[1], 1)
+        return np.array([w, h, w, h], dtype=np.float64)
+
+    def update(self, hull: List[int], detector_bbox: List[int], width_img: int, height_img: int):
+        if not detector_bbox:
+            return
+        xi, yi, xf, yf = detector_bbox
+        if xi <= 0 or yi <= 0 or xf >= width_img or yf >= height_img:
+            return
+        hull = np.asarray(hull, dtype=np.float64)
+        offsets = (np.asarray(detector_bbox, dtype=np.float64) - hull) / self._scale(hull)
+        self.samples += 1
+        # plain mean for the first samples, then a running mean that follows the current face
+        rate = max(self.momentum, 1.0 / self.samples)
+        self.offsets = offsets if self.offsets is None else self.offsets + rate * (offsets - self.offsets)
+
+    def apply(self, hull: List[int], width_img: int, height_img: int) -> List[int]:
+        """Detector-like [xi, yi, xf, yf] box for the hull, clipped to the image; the hull before any sample."""
+        box = np.asarray(hull, dtype=np.float64)
+        if self.offsets is not None:
+            box = box + self.offsets * self._scale(box)
+        xi, yi, xf, yf = box.astype(int).tolist()
+        return [max(0, xi), max(0, yi), min(width_img, xf), min(height_img, yf)]
 
 
 class FaceMeshMediapipe:
-    def __init__(self):
-        # mediapipe
+    def __init__(self, static_image_mode: bool = False):
+        """``static_image_mode`` detects the face on every image instead of tracking it across frames."""
+        # mediapipe is imported here so importing this module stays cheap
+        with startup_timer.measure("import mediapipe"):
+            import mediapipe as mp
         self.mp_draw = mp.solutions.drawing_utils
         self.config_draw = self.mp_draw.DrawingSpec(color=(255, 0, 0), thickness=1, circle_radius=1)
 
         self.face_mesh_object = mp.solutions.face_mesh
-        self.face_mesh_mp = self.face_mesh_object.FaceMesh(static_image_mode=False, max_num_faces=1,
-                                                           refine_landmarks=False, min_detection_confidence=0.6,
-                                                           min_tracking_confidence=0.6)
+        with startup_timer.measure("load mediapipe FaceMesh"):
+            self.face_mesh_mp = self.face_mesh_object.FaceMesh(static_image_mode=static_image_mode, max_num_faces=1,
+                                                               refine_landmarks=False, min_detection_confidence=0.6,
+                                                               min_tracking_confidence=0.6)
 
         self.mesh_points = None
+        self.bbox = []
+        self.face_points = []
         # face points
         # right parietal
         self.rp_x: int = 0
@@ -33,20 +88,25 @@ class FaceMeshMediapipe:
     def face_mesh_mediapipe(self, face_image: np.ndarray) -> Tuple[bool, Any]:
         rgb_image = face_image.copy()
         rgb_image = cv2.cvtColor(rgb_image, cv2.COLOR_BGR2RGB)
+        return self.face_mesh_mediapipe_input(rgb_image)
 
-        face_mesh = self.face_mesh_mp.process(rgb_image)
+    def face_mesh_mediapipe_input(self, input_image: np.ndarray) -> Tuple[bool, Any]:
+        """Mesh of an image already in the channel order fed to the graph; it is read, never copied."""
+        face_mesh = self.face_mesh_mp.process(input_image)
         if face_mesh.multi_face_landmarks is None:
             return False, face_mesh
         else:
             return True, face_mesh
 
-    def extract_face_mesh_points(self, face_image: np.ndarray, face_mesh_info: Any, viz: bool) -> List[List[int]]:
+    def extract_face_mesh_points(self, face_image: np.ndarray, face_mesh_info: Any, viz: bool) -> np.ndarray:
+        """(468, 2) int32 array of landmark pixel coordinates, row i is landmark i."""
         height, width, _ = face_image.shape
-        self.mesh_points = []
         for face_mesh in face_mesh_info.multi_face_landmarks:
-            for i, points in enumerate(face_mesh.landmark):
-                x, y = int(points.x * width), int(points.y * height)
-                self.mesh_points.append([i, x, y])
+            landmarks = face_mesh.landmark
+            relative = np.fromiter((value for points in landmarks for value in (points.x, points.y)),
+                                   dtype=np.float64, count=2 * len(landmarks)).reshape(-1, 2)
+            # truncated like int(), one array operation for every landmark
+            self.mesh_points = (relative * np.array([width, height])).astype(np.int32)
 
             if viz:
                 self.mp_draw.draw_landmarks(face_image, face_mesh, self.face_mesh_object.FACEMESH_TESSELATION,
@@ -54,12 +114,44 @@ class FaceMeshMediapipe:
 
         return self.mesh_points
 
-    def check_face_center(self, face_points: List[List[int]]) -> bool:
-        if len(face_points) == 468:
-            self.rp_x, self.rp_y = face_points[139][1:]
-            self.lp_x, self.lp_y = face_points[368][1:]
-            self.re_x, self.re_y = face_points[70][1:]
-            self.le_x, self.le_y = face_points[300][1:]
+    def draw_face_mesh(self, face_image: np.ndarray, face_mesh_info: Any):
+        for face_mesh in face_mesh_info.multi_face_landmarks:
+            self.mp_draw.draw_landmarks(face_image, face_mesh, self.face_mesh_object.FACEMESH_TESSELATION,
+                                        self.config_draw, self.config_draw)
+
+    def draw_face_mesh_points(self, face_image: np.ndarray, face_points: np.ndarray):
+        for x, y in face_points.tolist():
+            cv2.circle(face_image, (x, y), self.config_draw.circle_radius, self.config_draw.color, -1)
+
+    @staticmethod
+    def mesh_hull(face_points: np.ndarray) -> List[int]:
+        """[xi, yi, xf, yf] box around the landmarks, not clipped."""
+        (xi, yi), (xf, yf) = face_points.min(axis=0).tolist(), face_points.max(axis=0).tolist()
+        return [xi, yi, xf, yf]
+
+    def extract_face_bbox_mesh(self, width_img: int, height_img: int, face_points: np.ndarray,
+                               calibration: Optional[MeshBoxCalibration] = None) -> List[int]:
+        """[xi, yi, xf, yf] box of the face from the mesh, clipped to the image like the detector bbox.
+
+        With a ``calibration`` the hull is mapped onto the detector box, otherwise it is the hull itself.
+        """
+        hull = self.mesh_hull(face_points)
+        if calibration is None:
+            calibration = MeshBoxCalibration()
+        self.bbox = calibration.apply(hull, width_img, height_img)
+        return self.bbox
+
+    def extract_face_points_mesh(self, face_points: np.ndarray) -> List[List[int]]:
+        """The six FaceDetection key points (eyes, nose tip, mouth, ear tragions) taken from the mesh."""
+        self.face_points = (face_points[MESH_KEY_POINTS].sum(axis=1) // 2).tolist()
+        return self.face_points
+
+    def check_face_center(self, face_points: np.ndarray) -> bool:
+        if len(face_points) == MESH_LANDMARKS:
+            self.rp_x, self.rp_y = face_points[139].tolist()
+            self.lp_x, self.lp_y = face_points[368].tolist()
+            self.re_x, self.re_y = face_points[70].tolist()
+            self.le_x, self.le_y = face_points[300].tolist()
 
             if self.re_x > self.rp_x and self.le_x < self.lp_x:
                 return True
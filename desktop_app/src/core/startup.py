@@ -0,0 +1,62 @@
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, List, Optional, Tuple
+
+
+class StartupTimer:
+    """Collects how long each import and model load takes during a cold start."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.entries: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, label: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(label, time.perf_counter() - start)
+
+    def record(self, label: str, seconds: float):
+        with self._lock:
+            self.entries.append((label, seconds))
+
+    def report(self) -> str:
+        """Breakdown of the recorded steps, slowest first, plus the wall time since process start."""
+        with self._lock:
+            entries = sorted(self.entries, key=lambda entry: entry[1], reverse=True)
+        lines = [f"Startup timing report (wall time {time.perf_counter() - self.start:.2f}s):"]
+        lines += [f"  {seconds:8.3f}s  {label}" for label, seconds in entries]
+        return "\n".join(lines)
+
+
+# process-wide timer shared by main.py, the UI and the model loaders
+startup_timer = StartupTimer()
+
+
+class LazyModule:
+    """Stand-in for a heavy module (or one of its attributes) that is imported on first attribute access."""
+    def __init__(self, module_name: str, attribute: Optional[str] = None):
+        self._module_name = module_name
+        self._attribute = attribute
+        self._target: Any = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Any:
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    with startup_timer.measure(f"import {self._module_name}"):
+                        target = importlib.import_module(self._module_name)
+                    self._target = getattr(target, self._attribute) if self._attribute else target
+        return self._target
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._target is not None
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._load(), item)
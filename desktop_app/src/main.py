@@ -10,20 +10,25 @@ try:
     # Suppress TensorFlow INFO and WARNING messages
     os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
     print("Set TensorFlow log level...")
-    
-    import tkinter as tk
+
+    from core.startup import startup_timer
+
+    with startup_timer.measure("import tkinter"):
+        import tkinter as tk
     print("Imported tkinter successfully...")
     
     import logging as log
     print("Imported logging successfully...")
     
-    import tensorflow as tf
-    print("Imported tensorflow successfully...")
+    # TensorFlow is no longer imported here: deepface loads it on a background thread
+    # once the window is up, see FaceMatcherModels.warm_up
     
     # Conditional imports for application components
     try:
-        from ui.main_window import MainWindow
-        from api.api_client import ApiClient
+        with startup_timer.measure("import ui.main_window"):
+            from ui.main_window import MainWindow
+        with startup_timer.measure("import api.api_client"):
+            from api.api_client import ApiClient
         print("Imported MainWindow successfully...")
     except ImportError as e:
         print(f"UI or API component import error: {e}")
@@ -35,7 +40,8 @@ try:
         root = tk.Tk()
         
         # Create a single ApiClient instance
-        api_client = ApiClient()
+        with startup_timer.measure("ApiClient connection test"):
+            api_client = ApiClient()
         
         # Pass the api_client to the MainWindow
         app = MainWindow(root, api_client)
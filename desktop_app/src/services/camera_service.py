@@ -0,0 +1,112 @@
+import threading
+import time
+import cv2
+import numpy as np
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+
+class CameraService:
+    """Owns the ``cv2.VideoCapture`` and reads it on a dedicated thread.
+
+    Only the newest frames are kept in a small ring buffer; older frames are dropped so the UI
+    never processes stale images queued by the driver. ``read()`` mirrors ``VideoCapture.read``
+    but returns immediately with the latest frame and never returns the same frame twice.
+    """
+    def __init__(self, device: int = 0, width: int = 1280, height: int = 720, buffer_size: int = 2):
+        self.device = device
+        self.width = width
+        self.height = height
+        self.cap: Optional[cv2.VideoCapture] = None
+
+        self._frames: deque = deque(maxlen=buffer_size)
+        self._frame_id = 0
+        self._last_read_id = 0
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+        # stats
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.failed_reads = 0
+        self._fps_window: deque = deque(maxlen=60)
+
+    def start(self) -> bool:
+        """Open the camera and start the capture thread; returns False if the camera cannot be opened."""
+        if self.is_opened() and self._running:
+            return True
+        if self.cap is None or not self.cap.isOpened():
+            self.cap = cv2.VideoCapture(self.device)
+            self.cap.set(3, self.width)
+            self.cap.set(4, self.height)
+            # keep the driver queue as short as possible, the ring buffer does the rest
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        if not self.cap.isOpened():
+            print(f"[ERROR] Camera {self.device} could not be opened")
+            return False
+
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        return True
+
+    def _capture_loop(self):
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.failed_reads += 1
+                time.sleep(0.01)
+                continue
+
+            with self._condition:
+                self._frame_id += 1
+                # a frame still in the buffer when it is pushed out was never consumed
+                if len(self._frames) == self._frames.maxlen and self._frames[0][0] > self._last_read_id:
+                    self.dropped_frames += 1
+                self._frames.append((self._frame_id, frame))
+                self.captured_frames += 1
+                self._fps_window.append(time.perf_counter())
+                self._condition.notify_all()
+
+    def is_opened(self) -> bool:
+        return self.cap is not None and self.cap.isOpened()
+
+    def read(self, timeout: float = 0.0) -> Tuple[bool, Optional[np.ndarray]]:
+        """Newest frame not returned before, waiting up to ``timeout`` seconds for one to arrive."""
+        with self._condition:
+            if self._frame_id == self._last_read_id and timeout > 0:
+                self._condition.wait(timeout)
+            if not self._frames or self._frames[-1][0] == self._last_read_id:
+                return False, None
+            frame_id, frame = self._frames[-1]
+            # frames between the last one read and this one are skipped on purpose
+            self.dropped_frames += sum(1 for i, _ in self._frames if self._last_read_id < i < frame_id)
+            self._last_read_id = frame_id
+            self._frames.clear()
+            return True, frame
+
+    def stats(self) -> Dict[str, float]:
+        """Capture FPS over the last frames and dropped / failed counters."""
+        with self._condition:
+            timestamps = list(self._fps_window)
+        fps = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0]) if len(timestamps) > 1 else 0.0
+        return {
+            'capture_fps': fps,
+            'captured_frames': self.captured_frames,
+            'dropped_frames': self.dropped_frames,
+            'failed_reads': self.failed_reads,
+        }
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def release(self):
+        """Stop the capture thread and release the camera."""
+        self.stop()
+        if self.cap is not None and self.cap.isOpened():
+            self.cap.release()
+        self.cap = None
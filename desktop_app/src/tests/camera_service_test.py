@@ -0,0 +1,110 @@
+import unittest
+import queue
+import threading
+import time
+import numpy as np
+
+from services.camera_service import CameraService
+
+
+class FakeCapture:
+    """VideoCapture stand-in returning the frames the test pushes; read() waits a little for one."""
+    def __init__(self):
+        self.frames: queue.Queue = queue.Queue()
+        self.opened = True
+        self.failed = 0
+        self.count = 0
+
+    def push(self, frames: int = 1):
+        for _ in range(frames):
+            self.count += 1
+            self.frames.put(np.full((4, 4, 3), self.count, dtype=np.uint8))
+
+    def fail(self):
+        self.frames.put(None)
+
+    def read(self):
+        try:
+            frame = self.frames.get(timeout=0.05)
+        except queue.Empty:
+            frame = None
+        if frame is None:
+            self.failed += 1
+            return False, None
+        return True, frame
+
+    def isOpened(self):
+        return self.opened
+
+    def set(self, prop, value):
+        return True
+
+    def release(self):
+        self.opened = False
+
+
+class TestCameraService(unittest.TestCase):
+    def setUp(self):
+        self.cap = FakeCapture()
+        self.camera = CameraService(buffer_size=2)
+        # an opened capture is used as it is instead of opening the device
+        self.camera.cap = self.cap
+        self.assertTrue(self.camera.start())
+        self.addCleanup(self.camera.release)
+
+    def capture(self, frames: int):
+        """Push ``frames`` frames and wait until the capture thread took them all."""
+        expected = self.camera.captured_frames + frames
+        self.cap.push(frames)
+        deadline = time.perf_counter() + 5.0
+        while self.camera.captured_frames < expected and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(self.camera.captured_frames, expected)
+
+    def assert_frame(self, result, value: int):
+        ret, frame = result
+        self.assertTrue(ret)
+        self.assertEqual(frame[0, 0, 0], value)
+
+    def test_camera_service_keeps_newest_two_frames(self):
+        self.capture(3)
+        # frame 1 was pushed out of the ring unread
+        self.assertEqual([frame_id for frame_id, _ in self.camera._frames], [2, 3])
+        self.assertEqual(self.camera.stats()['dropped_frames'], 1)
+        # the newest frame is returned, frame 2 is skipped
+        self.assert_frame(self.camera.read(), 3)
+        self.assertEqual(self.camera.stats()['dropped_frames'], 2)
+        self.assertEqual(len(self.camera._frames), 0)
+
+        # frames consumed in time are not dropped
+        for value in (4, 5):
+            self.capture(1)
+            self.assert_frame(self.camera.read(), value)
+        self.assertEqual(self.camera.stats()['captured_frames'], 5)
+        self.assertEqual(self.camera.stats()['dropped_frames'], 2)
+
+    def test_camera_service_read_without_new_frame(self):
+        self.assertEqual(self.camera.read(), (False, None))
+        self.capture(1)
+        self.assert_frame(self.camera.read(), 1)
+        # the same frame is never returned twice, waiting or not
+        self.assertEqual(self.camera.read(), (False, None))
+        start = time.perf_counter()
+        self.assertEqual(self.camera.read(timeout=0.1), (False, None))
+        self.assertGreaterEqual(time.perf_counter() - start, 0.09)
+
+        # a frame arriving while read waits is returned at once
+        threading.Timer(0.05, self.cap.push).start()
+        start = time.perf_counter()
+        self.assert_frame(self.camera.read(timeout=2.0), 2)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_camera_service_counts_failed_reads(self):
+        self.cap.fail()
+        self.capture(1)
+        self.assert_frame(self.camera.read(), 1)
+        self.camera.release()
+        self.assertIsNone(self.camera.cap)
+        self.assertFalse(self.cap.isOpened())
+        self.assertGreaterEqual(self.cap.failed, 1)
+        self.assertEqual(self.camera.stats()['failed_reads'], self.cap.failed)
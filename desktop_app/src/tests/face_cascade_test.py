@@ -0,0 +1,88 @@
+import unittest
+import numpy as np
+
+from core.face_processing.models.face_matcher_model import FaceMatcherModels
+from core.face_processing.face_gallery import GallerySnapshot
+from core.face_processing.face_cascade import CascadeIdentifier
+
+
+NAMES = ('ana', 'luis', 'marta')
+
+
+class FakeGallery:
+    """Stands in for FaceGallery: a model name and a fixed snapshot."""
+    def __init__(self, model_name: str, embeddings: np.ndarray):
+        self.model_name = model_name
+        self.snapshot = GallerySnapshot(1, embeddings, NAMES)
+
+    def current(self) -> GallerySnapshot:
+        return self.snapshot
+
+
+class StrongEmbeddings(FaceMatcherModels):
+    """Returns the queued strong model embeddings instead of running a model."""
+    def __init__(self):
+        super().__init__()
+        self.strong_probes = []
+        self.strong_calls = 0
+
+    def face_embedding(self, face, model_name="SFace"):
+        self.strong_calls += 1
+        return self.strong_probes.pop(0)
+
+
+def probe_at(distance: float, row: int, other: int = 7, dim: int = 8) -> np.ndarray:
+    """Unit probe at cosine ``distance`` of the basis gallery row ``row``."""
+    probe = np.zeros(dim, dtype=np.float32)
+    cos = 1.0 - distance
+    probe[row], probe[other] = cos, np.sqrt(1.0 - cos ** 2)
+    return probe
+
+
+class TestFaceCascade(unittest.TestCase):
+    def setUp(self):
+        self.face_matcher = StrongEmbeddings()
+        basis = np.eye(8, dtype=np.float32)
+        self.cascade = CascadeIdentifier(self.face_matcher, FakeGallery('SFace', basis[:3]),
+                                         FakeGallery('ArcFace', basis[3:6]))
+        self.gallery = self.cascade.fast_gallery.current()
+        self.face = np.zeros((112, 112, 3), dtype=np.uint8)
+
+    def identify(self, probe: np.ndarray):
+        return self.cascade.identify(self.face, self.gallery, probe=probe)
+
+    def test_face_cascade_accept_and_reject_zones(self):
+        # SFace threshold 0.593: accepted below 0.445, rejected above 0.741
+        result = self.identify(probe_at(0.2, row=0))
+        self.assertTrue(result.matching)
+        self.assertEqual(result.user_name, 'ana')
+        result = self.identify(probe_at(1.0, row=0))
+        self.assertFalse(result.matching)
+        # neither zone needs the strong model
+        self.assertEqual(self.face_matcher.strong_calls, 0)
+
+    def test_face_cascade_escalates_uncertain_band(self):
+        # 0.55 from luis with SFace: inside the band, ArcFace decides
+        self.face_matcher.strong_probes = [probe_at(0.3, row=4)]
+        result = self.identify(probe_at(0.55, row=1))
+        self.assertTrue(result.matching)
+        self.assertEqual(result.user_name, 'luis')
+        self.assertAlmostEqual(result.distance, 0.3, places=5)
+
+        # ArcFace puts the same crop far from everyone: not luis after all
+        self.face_matcher.strong_probes = [probe_at(0.9, row=4)]
+        result = self.identify(probe_at(0.55, row=1))
+        self.assertFalse(result.matching)
+        self.assertEqual(self.face_matcher.strong_calls, 2)
+
+    def test_face_cascade_metrics(self):
+        self.face_matcher.strong_probes = [probe_at(0.3, row=3)]
+        for probe in (probe_at(0.2, row=0), probe_at(1.0, row=0), probe_at(0.6, row=0), probe_at(0.1, row=2)):
+            self.identify(probe)
+        metrics = self.cascade.metrics()
+        self.assertEqual((metrics['fast_model'], metrics['strong_model']), ('SFace', 'ArcFace'))
+        self.assertAlmostEqual(metrics['accept_distance'], 0.75 * 0.593)
+        self.assertAlmostEqual(metrics['reject_distance'], 1.25 * 0.593)
+        self.assertEqual((metrics['decisions'], metrics['accepted_fast'], metrics['rejected_fast'],
+                          metrics['escalations']), (4, 2, 1, 1))
+        self.assertAlmostEqual(metrics['escalation_rate'], 0.25)
@@ -0,0 +1,72 @@
+import unittest
+import types
+import numpy as np
+
+from core.face_processing.models.face_matcher_model import FaceMatcherModels
+
+
+class FakeNet:
+    """cv2.dnn network stand-in: records the blobs and embeds each face as its mean per channel."""
+    def __init__(self, fail: bool = False):
+        self.blobs = []
+        self.fail = fail
+
+    def setInput(self, blob):
+        self.blobs.append(blob)
+
+    def forward(self):
+        if self.fail:
+            raise RuntimeError("input batch fixed to 1")
+        return self.blobs[-1].mean(axis=(2, 3))
+
+
+class PreprocessedFaces(FaceMatcherModels):
+    """The crops are already preprocessed, in [0, 1], and the models are stand-ins."""
+    def __init__(self, model: types.SimpleNamespace, net: FakeNet):
+        super().__init__()
+        self.registry = {'SFace': model}
+        self._sface_net = net
+
+    @staticmethod
+    def _preprocess_face(face, target_size):
+        return face
+
+
+def sface_model() -> types.SimpleNamespace:
+    model = types.SimpleNamespace(input_shape=(112, 112), output_shape=3, model=object(), forward_calls=0)
+
+    def forward(batch):
+        model.forward_calls += 1
+        return (batch[0] * 255).mean(axis=(0, 1))[::-1]
+    model.forward = forward
+    return model
+
+
+class TestFaceEmbeddingBatch(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.faces = [rng.uniform(0, 1, (112, 112, 3)).astype(np.float32) for _ in range(5)]
+        # the embedding of each face: mean of its R, G, B channels, normalized
+        expected = np.array([(face * 255).astype(np.uint8).mean(axis=(0, 1))[::-1] for face in self.faces])
+        self.expected = expected / np.linalg.norm(expected, axis=1, keepdims=True)
+
+    def test_face_embedding_batch_sface_single_forward(self):
+        model, net = sface_model(), FakeNet()
+        face_matcher = PreprocessedFaces(model, net)
+        embeddings = face_matcher.face_embeddings(self.faces, model_name='SFace')
+        # every crop in one NCHW blob, swapped to RGB like FaceRecognizerSF.feature
+        self.assertEqual(len(net.blobs), 1)
+        self.assertEqual(net.blobs[0].shape, (5, 3, 112, 112))
+        self.assertEqual(model.forward_calls, 0)
+        np.testing.assert_allclose(embeddings, self.expected, atol=1e-5)
+
+    def test_face_embedding_batch_falls_back_row_by_row(self):
+        model, net = sface_model(), FakeNet(fail=True)
+        face_matcher = PreprocessedFaces(model, net)
+        embeddings = face_matcher.face_embeddings(self.faces, model_name='SFace')
+        self.assertEqual(model.forward_calls, 5)
+        np.testing.assert_allclose(embeddings, self.expected, atol=1e-2)
+        # the batch is not tried again
+        face_matcher.face_embeddings(self.faces[:2], model_name='SFace')
+        self.assertEqual(len(net.blobs), 1)
+        self.assertEqual(model.forward_calls, 7)
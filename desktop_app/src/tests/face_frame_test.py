@@ -0,0 +1,76 @@
+import unittest
+import os
+import time
+import cv2
+import numpy as np
+
+from core.face_processing.face_frame import Frame
+
+
+def write_summary_to_file(test_name: str, summary: dict, path: str):
+    with open(f'{path}/summary_{test_name}.txt', 'w') as f:
+        f.write(f'Test Results: {test_name}\n')
+        f.write(f'frame shape: {summary["frame shape"]}\n')
+        f.write(f'frames: {summary["frames"]}\n')
+        for name in ('copy per frame', 'frame object'):
+            f.write(f'{name}: allocated={summary[name]["bytes"] / 1024:.0f} KB/frame, '
+                    f'allocations={summary[name]["allocations"]}/frame, time={summary[name]["ms"]:.3f} ms/frame\n')
+
+
+def copy_per_frame(frame_bgr: np.ndarray):
+    """Image allocations of one login frame before Frame: every step converted or copied on its own."""
+    frame = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)                     # LoginWindow
+    face_save = frame.copy()                                               # FaceUtils.check_face
+    detect_input = cv2.cvtColor(frame.copy(), cv2.COLOR_BGR2RGB)           # face_detect_mediapipe
+    mesh_input = cv2.cvtColor(frame.copy(), cv2.COLOR_BGR2RGB)             # face_mesh_mediapipe
+    display = cv2.resize(frame, (1280, 720), interpolation=cv2.INTER_AREA)  # imutils.resize
+    return [frame, face_save, detect_input, mesh_input, display]
+
+
+def frame_object(frame_bgr: np.ndarray):
+    """The same steps reading one Frame: a single RGB conversion plus the copy the overlay is drawn on."""
+    camera_frame = Frame(frame_bgr)
+    display = camera_frame.rgb.copy()
+    face_save = camera_frame.rgb
+    detect_input = camera_frame.view('bgr')
+    mesh_input = camera_frame.view('bgr')
+    return camera_frame, [display], [face_save, detect_input, mesh_input]
+
+
+class TestFaceFrame(unittest.TestCase):
+    def test_face_frame_allocated_bytes_per_frame(self):
+        n_frames = 100
+        frame_bgr = np.random.default_rng(0).integers(0, 255, (720, 1280, 3), dtype=np.uint8)
+        summary = {'frame shape': frame_bgr.shape, 'frames': n_frames}
+
+        start_time = time.time()
+        for _ in range(n_frames):
+            allocated = copy_per_frame(frame_bgr)
+        summary['copy per frame'] = {'bytes': sum(image.nbytes for image in allocated),
+                                     'allocations': len(allocated),
+                                     'ms': 1000 * (time.time() - start_time) / n_frames}
+
+        start_time = time.time()
+        for _ in range(n_frames):
+            camera_frame, copies, views = frame_object(frame_bgr)
+        summary['frame object'] = {'bytes': camera_frame.allocated_bytes + sum(image.nbytes for image in copies),
+                                   'allocations': camera_frame.conversions + len(copies),
+                                   'ms': 1000 * (time.time() - start_time) / n_frames}
+
+        print(f'Results: {summary}')
+        os.makedirs('tests/face_frame', exist_ok=True)
+        write_summary_to_file('allocated_bytes_per_frame', summary, 'tests/face_frame')
+        self.assertLess(summary['frame object']['bytes'], summary['copy per frame']['bytes'])
+        # the views are the frame's own buffers, not copies
+        self.assertTrue(all(not image.flags.writeable for image in views))
+        self.assertTrue(np.shares_memory(views[1], frame_bgr))
+
+    def test_face_frame_views_are_cached(self):
+        frame_bgr = np.zeros((720, 1280, 3), dtype=np.uint8)
+        camera_frame = Frame(frame_bgr)
+        self.assertIs(camera_frame.rgb, camera_frame.rgb)
+        self.assertIs(camera_frame.view('bgr', 640), camera_frame.view('bgr', 640))
+        self.assertEqual(camera_frame.view('bgr', 640).shape, (360, 640, 3))
+        self.assertEqual(camera_frame.conversions, 2)
+        # the caller's array stays writable
+        self.assertTrue(frame_bgr.flags.writeable)
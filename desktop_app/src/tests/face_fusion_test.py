@@ -0,0 +1,83 @@
+import unittest
+import os
+import time
+import numpy as np
+
+from core.face_processing.models.face_matcher_model import FaceMatcherModels
+from core.face_processing.face_gallery import GallerySnapshot
+from core.face_processing.face_fusion import EmbeddingFusion, fuse_embeddings
+
+
+def write_summary_to_file(test_name: str, summary: dict, path: str):
+    with open(f'{path}/summary_{test_name}.txt', 'w') as f:
+        f.write(f'Test Results: {test_name}\n')
+        f.write(f'gallery size: {summary["gallery size"]}\n')
+        f.write(f'approaches: {summary["approaches"]}, crops per approach: {summary["crops"]}\n')
+        for name in ('single crop', 'mean', 'vote'):
+            f.write(f'{name}: false rejections={summary[name]["false rejections"]}, '
+                    f'false accepts={summary[name]["false accepts"]}, time={summary[name]["ms"]:.3f} ms/approach\n')
+
+
+def synthetic_approaches(n_identities: int, n_approaches: int, crops: int, dim: int = 128, noise: float = 2.0,
+                         seed: int = 0):
+    """Normalized random identities and, per approach, several noisy captures of one of them."""
+    rng = np.random.default_rng(seed)
+    gallery = rng.standard_normal((n_identities, dim)).astype(np.float32)
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    targets = rng.choice(n_identities, n_approaches)
+    probes = gallery[targets][:, None, :] + noise * rng.standard_normal((n_approaches, crops, dim)) / np.sqrt(dim)
+    probes = (probes / np.linalg.norm(probes, axis=2, keepdims=True)).astype(np.float32)
+    return gallery, targets, probes
+
+
+class TestFaceFusion(unittest.TestCase):
+    def setUp(self):
+        self.face_matcher = FaceMatcherModels()
+
+    def test_face_fusion_false_rejections(self):
+        n_identities, n_approaches, crops = 1000, 300, 3
+        gallery, targets, probes = synthetic_approaches(n_identities, n_approaches, crops)
+        snapshot = GallerySnapshot(1, gallery, tuple(str(i) for i in range(n_identities)))
+        summary = {'gallery size': n_identities, 'approaches': n_approaches, 'crops': crops}
+
+        identifiers = {
+            'single crop': lambda approach: self.face_matcher.identify(approach[0], snapshot.embeddings,
+                                                                       snapshot.names),
+            'mean': lambda approach: EmbeddingFusion(self.face_matcher, 'mean').identify(approach, snapshot),
+            'vote': lambda approach: EmbeddingFusion(self.face_matcher, 'vote').identify(approach, snapshot),
+        }
+        for name, identify in identifiers.items():
+            start_time = time.time()
+            results = [identify(approach) for approach in probes]
+            summary[name] = {
+                'false rejections': sum(not result.matching for result in results),
+                'false accepts': sum(result.matching and result.user_name != str(target)
+                                     for result, target in zip(results, targets)),
+                'ms': 1000 * (time.time() - start_time) / n_approaches,
+            }
+
+        print(f'Results: {summary}')
+        os.makedirs('tests/face_fusion', exist_ok=True)
+        write_summary_to_file('false_rejections', summary, 'tests/face_fusion')
+        self.assertLess(summary['mean']['false rejections'], summary['single crop']['false rejections'])
+        self.assertEqual(summary['mean']['false accepts'], 0)
+        self.assertEqual(summary['vote']['false accepts'], 0)
+
+    def test_face_fusion_ignores_crops_not_embedded(self):
+        gallery, _, probes = synthetic_approaches(10, 1, 3, noise=0.5)
+        approach = probes[0].copy()
+        approach[1] = np.nan
+        np.testing.assert_allclose(fuse_embeddings(approach), fuse_embeddings(approach[[0, 2]]), rtol=1e-6)
+        self.assertIsNone(fuse_embeddings(np.full((2, 128), np.nan, dtype=np.float32)))
+
+    def test_face_fusion_vote_needs_majority(self):
+        gallery, _, _ = synthetic_approaches(10, 1, 3)
+        snapshot = GallerySnapshot(1, gallery, tuple(str(i) for i in range(10)))
+        # two probes on different identities and one far from all of them: no majority
+        stranger = -gallery.mean(axis=0)
+        approach = np.stack([gallery[0], gallery[1], stranger / np.linalg.norm(stranger)])
+        self.assertFalse(EmbeddingFusion(self.face_matcher, 'vote').identify(approach, snapshot).matching)
+        approach = np.stack([gallery[0], gallery[0], gallery[1]])
+        result = EmbeddingFusion(self.face_matcher, 'vote').identify(approach, snapshot)
+        self.assertTrue(result.matching)
+        self.assertEqual(result.user_name, '0')
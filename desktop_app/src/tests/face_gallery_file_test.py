@@ -0,0 +1,90 @@
+import unittest
+import os
+import tempfile
+import cv2
+import numpy as np
+
+from core.face_processing.face_gallery import FaceGallery
+from core.face_processing.face_gallery_file import FaceGalleryFile
+from core.face_processing.models.face_matcher_model import FaceMatcherModels
+
+
+def normalized_rows(n: int, dim: int = 128, seed: int = 0) -> np.ndarray:
+    embeddings = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+class ColorEmbeddings(FaceMatcherModels):
+    """Embeds a crop as its normalized mean color and records the size of every batch."""
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def face_embeddings(self, faces, model_name="SFace", batch_size=32):
+        self.batches.append(len(faces))
+        embeddings = np.array([face.reshape(-1, 3).mean(axis=0) for face in faces], dtype=np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+class TestFaceGalleryFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'SFace.gallery')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_face_gallery_file_grow_replaces_file(self):
+        embeddings = normalized_rows(10)
+        gallery_file = FaceGalleryFile.open(self.path, 'SFace', dim=128, capacity=4)
+        for i in range(4):
+            gallery_file.upsert(str(i), embeddings[i])
+        view, names = gallery_file.read()
+
+        for i in range(4, 10):
+            gallery_file.upsert(str(i), embeddings[i])
+        self.assertEqual(gallery_file.capacity, 16)
+        self.assertFalse(os.path.exists(f'{self.path}.tmp'))
+        # a view handed out before the file grew still reads the rows it had
+        np.testing.assert_array_equal(view, embeddings[:4])
+        self.assertEqual(names, ['0', '1', '2', '3'])
+
+        reopened = FaceGalleryFile.open(self.path, 'SFace')
+        stored, names = reopened.read()
+        self.assertEqual((reopened.count, reopened.capacity), (10, 16))
+        self.assertEqual(names, [str(i) for i in range(10)])
+        np.testing.assert_array_equal(stored, embeddings)
+        self.assertTrue(reopened.verify())
+
+    def test_face_gallery_file_migrates_legacy_embeddings(self):
+        legacy_path = os.path.join(self.temp_dir.name, 'SFace')
+        os.makedirs(legacy_path)
+        embeddings = normalized_rows(3)
+        for i, embedding in enumerate(embeddings):
+            np.save(os.path.join(legacy_path, f'user{i}.npy'), embedding)
+
+        gallery = FaceGallery(FaceMatcherModels(), images_path=os.path.join(self.temp_dir.name, 'images'),
+                              embeddings_path=self.temp_dir.name)
+        snapshot = gallery.load()
+        self.assertEqual(snapshot.names, ('user0', 'user1', 'user2'))
+        np.testing.assert_array_equal(snapshot.embeddings, embeddings)
+        # the per-user files are gone once they are in the gallery file
+        self.assertFalse(os.path.exists(legacy_path))
+
+    def test_face_gallery_file_refresh_embeds_existing_images(self):
+        images_path = os.path.join(self.temp_dir.name, 'images')
+        os.makedirs(images_path)
+        for i in range(5):
+            cv2.imwrite(os.path.join(images_path, f'user{i}.png'), np.full((32, 32, 3), (10 + 40 * i, 100, 200), np.uint8))
+
+        face_matcher = ColorEmbeddings()
+        gallery = FaceGallery(face_matcher, images_path=images_path, embeddings_path=self.temp_dir.name)
+        gallery.batch_size = 2
+        # an install without a gallery file: load finds nothing, refresh embeds every image
+        self.assertEqual(len(gallery.load()), 0)
+        self.assertEqual(gallery.refresh(), (5, 0, 0))
+        self.assertEqual(face_matcher.batches, [2, 2, 1])
+        self.assertEqual(sorted(gallery.current().names), [f'user{i}' for i in range(5)])
+        # a version after each of the first two batches, the last one published with the manifest
+        self.assertEqual(gallery.current().version, 3)
+        self.assertEqual(gallery.refresh(), (0, 0, 0))
@@ -0,0 +1,73 @@
+import unittest
+import os
+import time
+import numpy as np
+
+from core.face_processing.face_index import FaceIndexIVF, benchmark_recall
+
+
+def write_summary_to_file(test_name: str, summary: dict, path: str):
+    with open(f'{path}/summary_{test_name}.txt', 'w') as f:
+        f.write(f'Test Results: {test_name}\n')
+        f.write(f'gallery size: {summary["gallery size"]}\n')
+        f.write(f'build time: {summary["build time"]} seconds\n')
+        f.write('Recall Results:\n')
+        for nprobe, recall, latency, brute_force in zip(summary['nprobe'], summary['recall@1'],
+                                                        summary['latency_ms'], summary['brute_force_ms']):
+            f.write(f'nprobe={nprobe}: recall@1={recall:.4f}, latency={latency:.3f} ms, '
+                    f'brute force={brute_force:.3f} ms\n')
+
+
+def synthetic_gallery(n_identities: int, dim: int = 128, n_queries: int = 500, noise: float = 0.35, seed: int = 0):
+    """Normalized random identities and noisy probes of some of them, imitating new captures."""
+    rng = np.random.default_rng(seed)
+    gallery = rng.standard_normal((n_identities, dim)).astype(np.float32)
+    gallery /= np.linalg.norm(gallery, axis=1, keepdims=True)
+    targets = rng.choice(n_identities, n_queries, replace=False)
+    queries = gallery[targets] + noise * rng.standard_normal((n_queries, dim)).astype(np.float32) / np.sqrt(dim)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return gallery, queries
+
+
+class TestFaceIndex(unittest.TestCase):
+    def run_recall_benchmark(self, n_identities: int):
+        gallery, queries = synthetic_gallery(n_identities)
+        names = [str(i) for i in range(n_identities)]
+
+        start_time = time.time()
+        index = FaceIndexIVF().build(gallery, names)
+        build_time = round(time.time() - start_time, 3)
+
+        summary = benchmark_recall(index, gallery, queries, nprobe_values=[1, 4, 8, 16, 32])
+        summary['gallery size'] = n_identities
+        summary['build time'] = build_time
+        print(f'Results: {summary}')
+        os.makedirs('tests/face_index', exist_ok=True)
+        write_summary_to_file(f'ivf_index_{n_identities}_identities', summary, 'tests/face_index')
+
+        # scanning more cells can only find more of the true neighbours
+        self.assertTrue(all(a <= b for a, b in zip(summary['recall@1'], summary['recall@1'][1:])))
+        self.assertGreaterEqual(summary['recall@1'][-1], 0.95)
+
+    def test_face_index_ivf_recall_10k_identities(self):
+        self.run_recall_benchmark(10000)
+
+    def test_face_index_ivf_recall_100k_identities(self):
+        self.run_recall_benchmark(100000)
+
+    def test_face_index_ivf_save_load(self):
+        gallery, queries = synthetic_gallery(5000, n_queries=20)
+        names = [str(i) for i in range(len(gallery))]
+        index = FaceIndexIVF(nprobe=4).build(gallery, names)
+        index.save('tests/face_index/ivf_index_test.npz')
+
+        loaded = FaceIndexIVF.load('tests/face_index/ivf_index_test.npz', gallery, names)
+        # a re-enrolled user: same size and user codes, another embedding
+        reenrolled = gallery.copy()
+        reenrolled[-1] = gallery[0]
+        stale = FaceIndexIVF.load('tests/face_index/ivf_index_test.npz', reenrolled, names)
+        os.remove('tests/face_index/ivf_index_test.npz')
+        self.assertEqual(loaded.names, names)
+        self.assertIsNone(stale)
+        for query in queries:
+            np.testing.assert_array_equal(index.search(query)[0], loaded.search(query)[0])
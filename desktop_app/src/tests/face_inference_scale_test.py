@@ -0,0 +1,154 @@
+import unittest
+import os
+import time
+import cv2
+import numpy as np
+
+from core.face_processing.models.face_detect_model import FaceDetectMediapipe
+from core.face_processing.models.face_mesh_model import FaceMeshMediapipe
+from core.face_processing.face_frame import resize_for_inference
+
+
+def write_summary_to_file(test_name: str, summary: dict, path: str):
+    with open(f'{path}/summary_{test_name}.txt', 'w') as f:
+        f.write(f'Test Results: {test_name}\n')
+        f.write(f'images: {summary["images"]} ({summary["source"]})\n')
+        f.write('Scale Results:\n')
+        for width, fps, detected, agreement, bbox_error, mesh_error in zip(
+                summary['width'], summary['fps'], summary['detected'], summary['center agreement'],
+                summary['bbox error px'], summary['mesh error px']):
+            f.write(f'width={width}: detection+mesh fps={fps:.1f}, detected={detected}, '
+                    f'center agreement={agreement:.3f}, bbox error={bbox_error:.2f} px, '
+                    f'mesh error={mesh_error:.2f} px\n')
+
+
+def image_extension(filename):
+    return filename.lower().endswith(('.jpg', '.jpeg', '.png'))
+
+
+def image_files(folder: str) -> list:
+    return sorted(os.path.join(root, f) for root, _, files in os.walk(folder) for f in files if image_extension(f))
+
+
+def drawn_face(size: int = 256) -> np.ndarray:
+    """A frontal face drawn with primitives, for machines without any face image."""
+    face = np.full((size, size, 3), 70, dtype=np.uint8)
+    c, s = size // 2, size / 256
+    cv2.ellipse(face, (c, c), (int(80 * s), int(105 * s)), 0, 0, 360, (150, 175, 215), -1)
+    for x in (c - int(32 * s), c + int(32 * s)):
+        cv2.ellipse(face, (x, c - int(20 * s)), (int(16 * s), int(8 * s)), 0, 0, 360, (250, 250, 250), -1)
+        cv2.circle(face, (x, c - int(20 * s)), int(6 * s), (40, 30, 20), -1)
+        cv2.line(face, (x - int(18 * s), c - int(42 * s)), (x + int(18 * s), c - int(42 * s)), (40, 40, 60), 4)
+    cv2.line(face, (c, c - int(10 * s)), (c - int(8 * s), c + int(25 * s)), (110, 130, 170), 3)
+    cv2.ellipse(face, (c, c + int(55 * s)), (int(28 * s), int(10 * s)), 0, 0, 180, (80, 80, 170), -1)
+    return face
+
+
+def synthetic_frames(faces: list, n_frames: int = 60, seed: int = 0) -> list:
+    """1280x720 frames with one face pasted at random sizes, positions and brightness, centered or not."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(40, 160, 1280, dtype=np.float32)[None, :, None]
+    frames = []
+    for i in range(n_frames):
+        frame = np.clip(gradient + rng.normal(0, 8, (720, 1280, 3)), 0, 255).astype(np.uint8)
+        face = faces[i % len(faces)]
+        height = int(rng.integers(180, 420))
+        width = int(height * face.shape[1] / face.shape[0])
+        face = cv2.resize(face, (width, height))
+        # half of the frames centered like a user in front of the kiosk, the others anywhere
+        if i % 2 == 0:
+            x, y = (1280 - width) // 2 + int(rng.integers(-40, 41)), (720 - height) // 2 + int(rng.integers(-30, 31))
+        else:
+            x, y = int(rng.integers(0, 1280 - width)), int(rng.integers(0, 720 - height))
+        frame[y:y + height, x:x + width] = np.clip(face * rng.uniform(0.7, 1.2), 0, 255).astype(np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def benchmark_frames() -> tuple:
+    """Captured kiosk frames when present, otherwise synthetic frames built from the face fixtures."""
+    input_folder = 'tests/face_inference_scale/images/'
+    if os.path.isdir(input_folder) and image_files(input_folder):
+        return [cv2.resize(cv2.imread(f), (1280, 720)) for f in image_files(input_folder)], 'captured frames'
+    faces = [cv2.imread(f) for f in image_files('tests/face_matcher/images/')]
+    faces = [face for face in faces if face is not None]
+    if faces:
+        return synthetic_frames(faces), f'synthetic frames from {len(faces)} face_matcher images'
+    return synthetic_frames([drawn_face()]), 'synthetic frames with a drawn face'
+
+
+def localize(face_detector: FaceDetectMediapipe, mesh_detector: FaceMeshMediapipe, face_image: np.ndarray,
+             width: int):
+    """Detection and mesh on the downscaled frame, coordinates mapped back to ``face_image`` like FaceUtils."""
+    h_img, w_img, _ = face_image.shape
+    inference_image = resize_for_inference(face_image, width)
+    check_face, face_info = face_detector.face_detect_mediapipe(inference_image)
+    if not check_face:
+        return None
+    bbox = face_detector.extract_face_bbox_mediapipe(w_img, h_img, face_info)
+    check_mesh, mesh_info = mesh_detector.face_mesh_mediapipe(inference_image)
+    if not check_mesh:
+        return bbox, None, False
+    mesh_points = mesh_detector.extract_face_mesh_points(face_image, mesh_info, viz=False)
+    return bbox, mesh_points, bool(mesh_detector.check_face_center(mesh_points))
+
+
+class TestFaceInferenceScale(unittest.TestCase):
+    def test_face_inference_scale_fps_and_center_accuracy(self):
+        # frames as captured by the kiosk camera
+        images, source = benchmark_frames()
+        widths = [1280, 640, 480]
+        summary = {'images': len(images), 'source': source, 'width': [], 'fps': [], 'detected': [], 'center agreement': [],
+                   'bbox error px': [], 'mesh error px': []}
+
+        results = {}
+        for width in widths:
+            # static image mode: the frames are unrelated, tracking would carry landmarks across them
+            face_detector, mesh_detector = FaceDetectMediapipe(), FaceMeshMediapipe(static_image_mode=True)
+            # graph setup and first inferences are not part of the per-frame cost
+            for image in images[:5]:
+                localize(face_detector, mesh_detector, image, width)
+            best_seconds = float('inf')
+            for _ in range(3):
+                start_time = time.perf_counter()
+                results[width] = [localize(face_detector, mesh_detector, image, width) for image in images]
+                best_seconds = min(best_seconds, time.perf_counter() - start_time)
+            summary['width'].append(width)
+            summary['fps'].append(len(images) / best_seconds)
+
+        # the full resolution run is the reference for the downscaled ones
+        reference = results[widths[0]]
+        for width in widths:
+            agreement, bbox_errors, mesh_errors, detected = [], [], [], 0
+            for full, scaled in zip(reference, results[width]):
+                detected += scaled is not None
+                if full is None or scaled is None:
+                    continue
+                bbox_errors.append(np.abs(np.array(full[0]) - np.array(scaled[0])).mean())
+                # centering and landmarks are compared where both resolutions found a mesh, missed
+                # detections are counted in ``detected``
+                if full[1] is not None and scaled[1] is not None:
+                    agreement.append(full[2] == scaled[2])
+                    mesh_errors.append(np.linalg.norm(full[1] - scaled[1], axis=1).mean())
+            summary['detected'].append(detected)
+            summary['center agreement'].append(float(np.mean(agreement)) if agreement else 0.0)
+            summary['bbox error px'].append(float(np.mean(bbox_errors)) if bbox_errors else 0.0)
+            summary['mesh error px'].append(float(np.mean(mesh_errors)) if mesh_errors else 0.0)
+
+        print(f'Results: {summary}')
+        os.makedirs('tests/face_inference_scale', exist_ok=True)
+        write_summary_to_file('inference_scale', summary, 'tests/face_inference_scale')
+        self.assertEqual(summary['center agreement'][0], 1.0)
+        for i in range(1, len(widths)):
+            self.assertGreater(summary['fps'][i], summary['fps'][0])
+            self.assertGreaterEqual(summary['detected'][i], 0.8 * summary['detected'][0])
+            self.assertGreaterEqual(summary['center agreement'][i], 0.9)
+            self.assertLessEqual(summary['mesh error px'][i], 3.0)
+
+    def test_face_inference_scale_resize(self):
+        face_image = np.zeros((720, 1280, 3), dtype=np.uint8)
+        self.assertEqual(resize_for_inference(face_image, 640).shape, (360, 640, 3))
+        self.assertEqual(resize_for_inference(face_image, 480).shape, (270, 480, 3))
+        # never upscaled
+        self.assertIs(resize_for_inference(face_image, None), face_image)
+        self.assertIs(resize_for_inference(face_image, 1920), face_image)
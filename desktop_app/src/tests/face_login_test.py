@@ -0,0 +1,150 @@
+import unittest
+import types
+from concurrent.futures import wait
+import numpy as np
+
+from core.face_processing.face_login import DecisionPolicy, FaceLogIn, LoginFrame
+from core.face_processing.face_frame import Frame
+from core.face_processing.face_quality import FaceQuality
+from core.face_processing.face_tracking import FaceTracker
+from core.face_processing.face_utils import FaceMatch
+
+
+FACE_BBOX = [100, 80, 300, 320]
+
+
+class StubFaceUtils:
+    """Stands in for FaceUtils: a fixed crop quality and the queued face_matching outcomes."""
+    def __init__(self, matches):
+        self.matches = list(matches)
+        self.matching_calls = 0
+        self.check_ins = []
+        self.denials = []
+        self.cascade = None
+        self.fusion = None
+        self.fusion_frames = 1
+        self.face_tracker = FaceTracker()
+        self.face_matcher = types.SimpleNamespace(thresholds={'SFace': 0.593})
+        self.face_gallery = types.SimpleNamespace(model_name='SFace')
+
+    def extract_face_bbox(self, face_image, face_info):
+        return FACE_BBOX
+
+    def extract_face_points(self, face_image, face_info):
+        return []
+
+    def face_crop(self, face_image, face_bbox):
+        xmin, ymin, xmax, ymax = face_bbox
+        return face_image[ymin:ymax, xmin:xmax]
+
+    def face_quality(self, face_crop, mesh_points=None):
+        return FaceQuality(0.9, 150.0, face_crop.shape[0], 120.0, 0.0, 0.0)
+
+    def read_face_gallery(self):
+        return np.eye(2, dtype=np.float32), ''
+
+    def face_matching(self, face_crop, gallery, extra_faces=None, track_id=None):
+        self.matching_calls += 1
+        match = self.matches.pop(0)
+        if isinstance(match, Exception):
+            raise match
+        return match
+
+    def user_check_in(self, user_name, access_granted=True):
+        self.check_ins.append(user_name)
+
+    def deny_check_in(self, probe, unknown=None):
+        self.denials.append(unknown)
+
+
+class TestFaceLogin(unittest.TestCase):
+    def setUp(self):
+        self.image = np.zeros((480, 640, 3), dtype=np.uint8)
+        # the same landmarks on every frame: no jitter
+        self.mesh_points = np.stack(np.meshgrid(np.arange(150, 250, 5), np.arange(100, 300, 10)), -1).reshape(-1, 2)
+        self.policy = DecisionPolicy(min_frames=3, stable_frames=3, max_frames=8, max_wait_seconds=60.0)
+
+    def login(self, *matches) -> FaceLogIn:
+        login = FaceLogIn(StubFaceUtils(matches), self.policy)
+        self.addCleanup(login.close)
+        return login
+
+    def step(self, login: FaceLogIn, centered: bool = True) -> LoginFrame:
+        """Decide on one frame with the face detected; an identification it starts is waited for."""
+        frame = LoginFrame(Frame(self.image, 'rgb'), face_detected=True, face_save=self.image, mesh_detected=True,
+                           mesh_points=self.mesh_points, face_centered=centered)
+        login.decide(frame)
+        if login.pending is not None:
+            wait([login.pending])
+        return frame
+
+    def test_face_login_early_confident_accept(self):
+        login = self.login(FaceMatch(True, 'ana', 0.1, 'gallery'))
+        for _ in range(2):
+            self.assertIsNone(self.step(login).state)
+        self.assertEqual(login.face_utilities.matching_calls, 0)
+        # third stable frame with a good crop: identified before max_frames
+        self.assertEqual(self.step(login).info, 'Comparando rostro...')
+        frame = self.step(login)
+        self.assertTrue(frame.state)
+        self.assertEqual(frame.info, 'ana')
+        self.assertEqual((login.last_decision['trigger'], login.last_decision['confident']), ('stable', True))
+        login.executor.shutdown(wait=True)
+        self.assertEqual(login.face_utilities.check_ins, ['ana'])
+
+    def test_face_login_not_confident_retries_at_fallback(self):
+        # 0.55 is a match for SFace but above 0.8 of its threshold
+        login = self.login(FaceMatch(True, 'ana', 0.55, 'gallery'), FaceMatch(True, 'ana', 0.55, 'gallery'))
+        for _ in range(3):
+            self.step(login)
+        frame = self.step(login)
+        self.assertIsNone(frame.state)
+        self.assertEqual(frame.info, 'Comparando rostro...')
+        self.assertTrue(login.retrying)
+        self.assertIsNone(login.matcher)
+
+        # no early attempt while retrying, the next one is at max_frames
+        while login.cont_frame < self.policy.max_frames:
+            self.assertEqual(login.face_utilities.matching_calls, 1)
+            self.step(login)
+        frame = self.step(login)
+        self.assertEqual(login.face_utilities.matching_calls, 2)
+        self.assertTrue(frame.state)
+        self.assertEqual((login.last_decision['trigger'], login.last_decision['attempt']), ('max_wait', 2))
+        self.assertFalse(login.last_decision['confident'])
+
+    def test_face_login_fallback_denies_unknown_face(self):
+        login = self.login(FaceMatch(False, 'Unknown', 0.9, None), FaceMatch(False, 'Unknown', 0.9, None, unknown=4))
+        while login.face_utilities.matching_calls < 2:
+            self.step(login)
+        frame = self.step(login)
+        self.assertFalse(frame.state)
+        self.assertEqual(frame.info, 'Rostro no conocido')
+        login.executor.shutdown(wait=True)
+        self.assertEqual(login.face_utilities.denials, [4])
+
+    def test_face_login_resets_when_face_leaves_center(self):
+        login = self.login(FaceMatch(True, 'ana', 0.55, 'gallery'))
+        for _ in range(5):
+            self.step(login)
+        self.assertTrue(login.retrying)
+        self.assertEqual(len(login.landmark_history), 3)
+
+        frame = self.step(login, centered=False)
+        self.assertEqual(frame.info, 'Cara no está centrada')
+        self.assertEqual((login.cont_frame, len(login.best_crops), len(login.landmark_history)), (0, 0, 0))
+        self.assertIsNone(login.jitter)
+        self.assertFalse(login.retrying)
+
+    def test_face_login_failed_identification_drops_crops(self):
+        login = self.login(RuntimeError("model failed"), FaceMatch(True, 'ana', 0.1, 'gallery'))
+        for _ in range(3):
+            self.step(login)
+        frame = self.step(login)
+        self.assertEqual(frame.info, 'Error al comparar el rostro')
+        # the crops that just failed are not used again
+        self.assertEqual((login.cont_frame, len(login.best_crops), len(login.landmark_history)), (0, 0, 0))
+        for _ in range(3):
+            self.step(login)
+        self.assertTrue(self.step(login).state)
+        self.assertEqual(login.face_utilities.matching_calls, 2)
@@ -0,0 +1,44 @@
+import unittest
+import numpy as np
+
+from core.face_processing.models.face_mesh_model import FaceMeshMediapipe, MeshBoxCalibration
+
+
+def detector_box(hull: np.ndarray) -> np.ndarray:
+    """A detector box with other margins than the hull: lower forehead, wider cheeks."""
+    w, h = hull[2] - hull[0], hull[3] - hull[1]
+    return (hull + np.array([-0.08 * w, 0.18 * h, 0.08 * w, 0.02 * h])).astype(int)
+
+
+class TestFaceMeshBox(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(0)
+        self.width, self.height = 1280, 720
+
+    def random_points(self, center_x: float, center_y: float, size: float) -> np.ndarray:
+        points = self.rng.uniform(-size / 2, size / 2, (468, 2)) + [center_x, center_y]
+        return points.astype(int)
+
+    def test_face_mesh_box_matches_detector(self):
+        calibration = MeshBoxCalibration()
+        for _ in range(20):
+            points = self.random_points(self.rng.uniform(400, 800), self.rng.uniform(300, 400), self.rng.uniform(150, 250))
+            hull = FaceMeshMediapipe.mesh_hull(points)
+            calibration.update(hull, detector_box(np.array(hull)).tolist(), self.width, self.height)
+        self.assertEqual(calibration.samples, 20)
+
+        points = self.random_points(640, 360, 200)
+        hull = np.array(FaceMeshMediapipe.mesh_hull(points))
+        expected = detector_box(hull)
+        calibrated = np.array(calibration.apply(hull.tolist(), self.width, self.height))
+        # within a couple of pixels of the detector box, while the bare hull is off by tens of pixels
+        self.assertLessEqual(np.abs(calibrated - expected).max(), 2)
+        self.assertGreater(np.abs(hull - expected).max(), 20)
+
+    def test_face_mesh_box_skips_clipped_detector_boxes(self):
+        calibration = MeshBoxCalibration()
+        calibration.update([0, 100, 200, 300], [0, 120, 210, 300], self.width, self.height)
+        calibration.update([1100, 500, 1280, 720], [1090, 520, 1280, 720], self.width, self.height)
+        self.assertEqual(calibration.samples, 0)
+        # no sample yet: the hull, clipped to the image
+        self.assertEqual(calibration.apply([-10, 100, 200, 800], self.width, self.height), [0, 100, 200, 720])
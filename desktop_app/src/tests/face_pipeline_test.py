@@ -0,0 +1,94 @@
+import unittest
+import threading
+import time
+
+from core.face_processing.face_pipeline import DropOldestQueue, FramePipeline
+
+
+class FakeCamera:
+    """CameraService stand-in: a new frame every ``interval`` seconds, the frame being its number."""
+    def __init__(self, frames: int, interval: float = 0.002):
+        self.frames = frames
+        self.interval = interval
+        self.count = 0
+
+    def read(self, timeout: float = 0.1):
+        time.sleep(self.interval)
+        if self.count >= self.frames:
+            return False, None
+        self.count += 1
+        return True, self.count
+
+
+class RecordingStage:
+    """Stage function recording the frames it saw, optionally slow or blocked until released."""
+    def __init__(self, delay: float = 0.0, release: threading.Event = None):
+        self.delay = delay
+        self.release = release
+        self.seen = []
+
+    def __call__(self, item):
+        if self.release is not None:
+            self.release.wait()
+        time.sleep(self.delay)
+        self.seen.append(item)
+        return item
+
+
+def pipeline_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith('pipeline-')]
+
+
+class TestFacePipeline(unittest.TestCase):
+    def wait_for(self, condition, timeout: float = 5.0):
+        deadline = time.perf_counter() + timeout
+        while not condition() and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_face_pipeline_drop_oldest_queue(self):
+        queue = DropOldestQueue(maxsize=2)
+        for item in range(5):
+            queue.put(item)
+        self.assertEqual((len(queue), queue.dropped), (2, 3))
+        self.assertEqual([queue.get(), queue.get()], [3, 4])
+        self.assertIsNone(queue.get(timeout=0.01))
+
+    def test_face_pipeline_order_drops_and_clean_stop(self):
+        camera = FakeCamera(frames=200)
+        fast, slow = RecordingStage(), RecordingStage(delay=0.02)
+        pipeline = FramePipeline(camera, lambda frame_id, frame: frame, [('fast', fast), ('slow', slow)])
+        pipeline.start()
+        # drop-oldest keeps the newest item, so the last frame always gets through every stage
+        self.wait_for(lambda: pipeline.latest_result() == camera.frames)
+        self.assertEqual(pipeline.stop(), [])
+        self.assertEqual(pipeline_threads(), [])
+
+        # every stage sees the frames in capture order, the slow one only a part of them
+        for stage in (fast, slow):
+            self.assertEqual(stage.seen, sorted(set(stage.seen)))
+        self.assertTrue(set(slow.seen) <= set(fast.seen))
+        self.assertEqual(pipeline.latest_frame(), (200, 200))
+        self.assertEqual(pipeline.latest_result(), slow.seen[-1])
+
+        # what a stage does not process was dropped from its queue or is still in it
+        stats = pipeline.stats()
+        self.assertEqual(stats['capture']['frames'], 200)
+        self.assertEqual(stats['fast']['processed'] + stats['fast']['dropped'] + stats['fast']['queue_depth'], 200)
+        self.assertEqual(stats['slow']['processed'] + stats['slow']['dropped'] + stats['slow']['queue_depth'],
+                         stats['fast']['processed'])
+        self.assertGreater(stats['slow']['dropped'], 0)
+        self.assertEqual(stats['slow']['processed'], len(slow.seen))
+
+    def test_face_pipeline_stop_reports_running_stage(self):
+        release = threading.Event()
+        stuck = RecordingStage(release=release)
+        pipeline = FramePipeline(FakeCamera(frames=10), lambda frame_id, frame: frame, [('stuck', stuck)])
+        pipeline.start()
+        self.wait_for(lambda: pipeline.stats()['capture']['frames'] > 0)
+        self.assertEqual(pipeline.stop(timeout=0.2), ['stuck'])
+        # the stage finishes its item and exits, nothing runs after stop returns empty
+        release.set()
+        self.assertEqual(pipeline.stop(), [])
+        self.assertEqual(pipeline_threads(), [])
+        self.assertEqual(len(stuck.seen), 1)
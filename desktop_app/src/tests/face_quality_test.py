@@ -0,0 +1,49 @@
+import unittest
+import cv2
+import numpy as np
+
+from core.face_processing.face_quality import BestCropBuffer, FaceQualityScorer
+
+
+def frontal_mesh(yaw_shift: int = 0) -> np.ndarray:
+    """(468, 2) landmarks with cheeks, nose, forehead and chin of a frontal face; the nose moved by ``yaw_shift``."""
+    mesh_points = np.zeros((468, 2), dtype=np.int32)
+    mesh_points[234], mesh_points[454] = (100, 200), (300, 200)
+    mesh_points[10], mesh_points[152] = (200, 100), (200, 300)
+    mesh_points[1] = (200 + yaw_shift, 200)
+    return mesh_points
+
+
+class TestFaceQuality(unittest.TestCase):
+    def setUp(self):
+        self.scorer = FaceQualityScorer()
+        rng = np.random.default_rng(0)
+        self.sharp_crop = rng.integers(0, 255, (240, 200, 3), dtype=np.uint8)
+        self.blurred_crop = cv2.GaussianBlur(self.sharp_crop, (15, 15), 5)
+
+    def test_face_quality_prefers_sharp_crops(self):
+        sharp = self.scorer.score(self.sharp_crop, frontal_mesh())
+        blurred = self.scorer.score(self.blurred_crop, frontal_mesh())
+        self.assertGreater(sharp.sharpness, blurred.sharpness)
+        self.assertGreater(sharp.score, blurred.score)
+
+    def test_face_quality_head_pose(self):
+        yaw, pitch = self.scorer.head_pose(frontal_mesh())
+        self.assertAlmostEqual(yaw, 0.0)
+        self.assertAlmostEqual(pitch, 0.0)
+        yaw, _ = self.scorer.head_pose(frontal_mesh(yaw_shift=50))
+        self.assertAlmostEqual(yaw, 30.0, places=3)
+        # turned faces score lower than frontal ones
+        self.assertLess(self.scorer.score(self.sharp_crop, frontal_mesh(50)).score,
+                        self.scorer.score(self.sharp_crop, frontal_mesh()).score)
+
+    def test_face_quality_best_crop_buffer(self):
+        buffer = BestCropBuffer(k=2)
+        qualities = [self.scorer.score(crop, frontal_mesh(shift))
+                     for crop, shift in [(self.blurred_crop, 0), (self.sharp_crop, 60), (self.sharp_crop, 0)]]
+        for quality in qualities:
+            buffer.add(self.sharp_crop, quality)
+        self.assertEqual(len(buffer), 2)
+        self.assertIs(buffer.best()[1], max(qualities, key=lambda quality: quality.score))
+        buffer.clear()
+        self.assertIsNone(buffer.best())
@@ -0,0 +1,115 @@
+import unittest
+import gc
+import os
+import sys
+import tempfile
+import numpy as np
+
+from core.face_processing.face_gallery_file import FaceGalleryFile
+from core.face_processing.face_index import FaceIndexIVF
+from core.face_processing.face_quantization import QuantizedGallery, quantization_report, release_pages
+from tests.face_index_test import synthetic_gallery
+
+
+def write_summary_to_file(test_name: str, report: list, path: str):
+    with open(f'{path}/summary_{test_name}.txt', 'w') as f:
+        f.write(f'Test Results: {test_name}\n')
+        f.write('Quantization Results:\n')
+        for row in report:
+            f.write(f'{row["dtype"]}: bytes per identity={row["bytes_per_identity"]:.1f}, '
+                    f'total bytes={row["total_bytes"]}, top1 agreement={row["top1_agreement"]:.4f}, '
+                    f'max distance error={row["max_distance_error"]:.5f}\n')
+
+
+def write_rss_summary_to_file(test_name: str, summary: dict, path: str):
+    with open(f'{path}/summary_{test_name}.txt', 'w') as f:
+        f.write(f'Test Results: {test_name}\n')
+        f.write(f'gallery size: {summary["gallery size"]}, mapped float32 gallery: '
+                f'{summary["gallery MB"]:.1f} MB\n')
+        f.write('Resident Memory Results:\n')
+        for name, rss in summary['rss MB'].items():
+            f.write(f'{name}: rss={rss:.1f} MB\n')
+        for dtype, index_mb in summary['ivf lists MB'].items():
+            f.write(f'IVF index {dtype}: {index_mb:.1f} MB\n')
+
+
+def rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def packed_gallery_file(path: str, gallery: np.ndarray) -> FaceGalleryFile:
+    """A gallery file holding ``gallery``, written in one go rather than one upsert per user."""
+    gallery_file = FaceGalleryFile.open(path, 'SFace', dim=gallery.shape[1], capacity=len(gallery))
+    gallery_file.embeddings[:] = gallery
+    gallery_file.records['id'] = [str(i).encode('utf-8') for i in range(len(gallery))]
+    gallery_file.count = len(gallery)
+    gallery_file.checksum = gallery_file.compute_checksum()
+    gallery_file.flush()
+    return gallery_file
+
+
+class TestFaceQuantization(unittest.TestCase):
+    def test_face_quantization_report_sface_gallery(self):
+        # SFace embeddings are 128-d
+        gallery, queries = synthetic_gallery(20000, dim=128)
+        names = [str(i) for i in range(len(gallery))]
+        report = quantization_report(gallery, names, queries)
+        print(f'Results: {report}')
+        os.makedirs('tests/face_quantization', exist_ok=True)
+        write_summary_to_file('sface_gallery_20000_identities', report, 'tests/face_quantization')
+
+        by_dtype = {row['dtype']: row for row in report}
+        self.assertLess(by_dtype['float16']['bytes_per_identity'], by_dtype['float32']['bytes_per_identity'])
+        self.assertLess(by_dtype['int8']['bytes_per_identity'], by_dtype['float16']['bytes_per_identity'])
+        self.assertGreaterEqual(by_dtype['int8']['top1_agreement'], 0.99)
+
+    def test_face_quantization_search_matches_float32(self):
+        gallery, queries = synthetic_gallery(2000, n_queries=50)
+        names = [str(i) for i in range(len(gallery))]
+        reference = QuantizedGallery(gallery, names, 'float32')
+        quantized = QuantizedGallery(gallery, names, 'int8', chunk_size=300)
+        for query in queries:
+            self.assertEqual(reference.search(query, top_k=1)[0][0], quantized.search(query, top_k=1)[0][0])
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), 'reads the resident set from /proc')
+    def test_face_quantization_resident_memory(self):
+        gallery, queries = synthetic_gallery(200000, dim=128, n_queries=20)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'SFace.gallery')
+            packed_gallery_file(path, gallery)
+            names = [str(i) for i in range(len(gallery))]
+            del gallery
+            gc.collect()
+            summary = {'gallery size': len(names), 'rss MB': {}, 'ivf lists MB': {}}
+
+            mapped, _ = FaceGalleryFile.open(path, 'SFace').read()
+            summary['gallery MB'] = mapped.nbytes / 2 ** 20
+            summary['rss MB']['mapped, not read'] = rss_mb()
+            reference = [np.argmax(mapped @ query) for query in queries]
+            summary['rss MB']['float32 brute force'] = rss_mb()
+
+            quantized = QuantizedGallery(mapped, names, 'int8')
+            self.assertTrue(release_pages(mapped))
+            found = [quantized.search(query, top_k=1)[0][0] for query in queries]
+            summary['rss MB']['int8 copy, float32 released'] = rss_mb()
+            del quantized
+
+            for dtype in ('float32', 'int8'):
+                index = FaceIndexIVF(nprobe=16, dtype=dtype).build(mapped, names)
+                summary['ivf lists MB'][dtype] = index.memory_report()['total_bytes'] / 2 ** 20
+            release_pages(mapped)
+            summary['rss MB']['int8 IVF index, float32 released'] = rss_mb()
+
+            del mapped
+            gc.collect()
+        print(f'Results: {summary}')
+        os.makedirs('tests/face_quantization', exist_ok=True)
+        write_rss_summary_to_file('resident_memory_200000_identities', summary, 'tests/face_quantization')
+
+        rss = summary['rss MB']
+        self.assertEqual(found, reference)
+        # the float32 pages are resident after a scan and gone once released
+        self.assertGreater(rss['float32 brute force'] - rss['mapped, not read'], 0.8 * summary['gallery MB'])
+        self.assertLess(rss['int8 copy, float32 released'], rss['float32 brute force'] - 0.5 * summary['gallery MB'])
+        self.assertLess(summary['ivf lists MB']['int8'], 0.4 * summary['ivf lists MB']['float32'])
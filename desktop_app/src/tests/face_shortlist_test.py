@@ -0,0 +1,90 @@
+import unittest
+import os
+import time
+import numpy as np
+
+from core.face_processing.models.face_matcher_model import FaceMatcherModels
+from core.face_processing.face_gallery import GallerySnapshot
+from core.face_processing.face_shortlist import IdentityShortlist
+
+
+def write_summary_to_file(test_name: str, summary: dict, path: str):
+    with open(f'{path}/summary_{test_name}.txt', 'w') as f:
+        f.write(f'Test Results: {test_name}\n')
+        f.write(f'gallery size: {summary["gallery size"]}, shortlist capacity: {summary["capacity"]}\n')
+        f.write(f'accesses: {summary["accesses"]}\n')
+        f.write(f'hit rate: {summary["hit rate"]:.3f}\n')
+        f.write(f'full search: {summary["gallery ms"]:.3f} ms, with shortlist: {summary["shortlist ms"]:.3f} ms '
+                f'per access\n')
+        f.write(f'same identity as full search: {summary["agreement"]:.3f}\n')
+
+
+def synthetic_gallery(n_identities: int, dim: int = 128, seed: int = 0) -> GallerySnapshot:
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((n_identities, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return GallerySnapshot(1, embeddings, tuple(str(i) for i in range(n_identities)))
+
+
+def skewed_accesses(gallery: GallerySnapshot, n_accesses: int, noise: float = 1.0, seed: int = 1):
+    """Noisy probes of a Zipf distributed population: a few hundred people make most accesses."""
+    rng = np.random.default_rng(seed)
+    targets = (rng.zipf(1.3, n_accesses) - 1) % len(gallery)
+    dim = gallery.embeddings.shape[1]
+    probes = gallery.embeddings[targets] + noise * rng.standard_normal((n_accesses, dim)) / np.sqrt(dim)
+    return targets, (probes / np.linalg.norm(probes, axis=1, keepdims=True)).astype(np.float32)
+
+
+class TestFaceShortlist(unittest.TestCase):
+    def setUp(self):
+        self.face_matcher = FaceMatcherModels()
+        self.max_distance = 0.8 * self.face_matcher.thresholds['SFace']
+
+    def test_face_shortlist_hit_rate_skewed_accesses(self):
+        gallery = synthetic_gallery(50000)
+        targets, probes = skewed_accesses(gallery, 2000)
+        shortlist = IdentityShortlist(self.face_matcher, capacity=300)
+        summary = {'gallery size': len(gallery), 'capacity': shortlist.capacity, 'accesses': len(probes)}
+
+        start_time = time.time()
+        full = [self.face_matcher.identify(probe, gallery.embeddings, gallery.names) for probe in probes]
+        summary['gallery ms'] = 1000 * (time.time() - start_time) / len(probes)
+
+        start_time = time.time()
+        results = []
+        for probe in probes:
+            result = shortlist.identify(probe, gallery, self.max_distance)
+            if result is None:
+                result = self.face_matcher.identify(probe, gallery.embeddings, gallery.names)
+            if result.matching:
+                shortlist.record(result.user_name)
+            results.append(result)
+        summary['shortlist ms'] = 1000 * (time.time() - start_time) / len(probes)
+        summary['hit rate'] = shortlist.metrics()['hit_rate']
+        summary['agreement'] = float(np.mean([a.user_name == b.user_name for a, b in zip(full, results)]))
+
+        print(f'Results: {summary}')
+        os.makedirs('tests/face_shortlist', exist_ok=True)
+        write_summary_to_file('skewed_accesses', summary, 'tests/face_shortlist')
+        self.assertGreater(summary['hit rate'], 0.5)
+        self.assertLess(summary['shortlist ms'], summary['gallery ms'])
+        self.assertEqual(summary['agreement'], 1.0)
+
+    def test_face_shortlist_eviction_and_seed(self):
+        shortlist = IdentityShortlist(self.face_matcher, capacity=2)
+        # backend logs, newest first
+        shortlist.seed([
+            {'user_id': 2, 'event_type': 'login_success'},
+            {'user_id': None, 'event_type': 'login_failure'},
+            {'user_id': 1, 'event_type': 'login_success'},
+            {'user_id': 1, 'event_type': 'login_success'},
+        ])
+        self.assertEqual(len(shortlist), 2)
+        # '2' has a single grant, so it leaves for the newcomer
+        shortlist.record('3')
+        gallery = synthetic_gallery(5)
+        for name, present in [('1', True), ('2', False), ('3', True)]:
+            result = shortlist.identify(gallery.embeddings[int(name)], gallery, self.max_distance)
+            self.assertEqual(result is not None, present)
+            if present:
+                self.assertEqual(result.user_name, name)
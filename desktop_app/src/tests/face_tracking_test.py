@@ -0,0 +1,92 @@
+import unittest
+import numpy as np
+
+from core.face_processing.face_tracking import FaceTracker, RecentIdentities, RecentUnknowns, bbox_iou
+
+
+def normalized(vector: np.ndarray) -> np.ndarray:
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+class TestFaceTracking(unittest.TestCase):
+    def test_face_tracking_bbox_iou(self):
+        self.assertAlmostEqual(bbox_iou([0, 0, 10, 10], [0, 0, 10, 10]), 1.0)
+        self.assertAlmostEqual(bbox_iou([0, 0, 10, 10], [5, 0, 15, 10]), 50 / 150)
+        self.assertEqual(bbox_iou([0, 0, 10, 10], [20, 20, 30, 30]), 0.0)
+
+    def test_face_tracking_track_ids(self):
+        tracker = FaceTracker(iou_threshold=0.3, max_missed_seconds=1.0)
+        track_id = tracker.update([100, 100, 300, 300], now=0.0)
+        # the face moving a little keeps its track
+        self.assertEqual(tracker.update([110, 105, 310, 305], now=0.1), track_id)
+        # a face elsewhere starts another one
+        self.assertNotEqual(tracker.update([800, 100, 1000, 300], now=0.2), track_id)
+        # back after the track expired: a new track
+        self.assertNotEqual(tracker.update([110, 105, 310, 305], now=2.0), track_id)
+        self.assertIsNone(tracker.update([], now=2.1))
+
+    def test_face_tracking_recent_identities(self):
+        rng = np.random.default_rng(0)
+        ana, luis = normalized(rng.standard_normal(128)), normalized(rng.standard_normal(128))
+        recent = RecentIdentities(ttl_seconds=10.0, capacity=2)
+        recent.add('ana', ana, track_id=1, now=0.0)
+        recent.add('luis', luis, track_id=2, now=0.0)
+
+        probe = normalized(ana + 0.3 * rng.standard_normal(128) / np.sqrt(128))
+        user_name, distance = recent.match(probe, max_distance=0.3, track_id=1, now=1.0)
+        self.assertEqual(user_name, 'ana')
+        self.assertLess(distance, 0.3)
+        # another track: found among the recent identities all the same
+        self.assertEqual(recent.match(probe, max_distance=0.3, track_id=7, now=1.0)[0], 'ana')
+        # a stranger on ana's track is not ana
+        self.assertIsNone(recent.match(normalized(rng.standard_normal(128)), max_distance=0.3, track_id=1, now=1.0))
+        # luis stepping into ana's track is luis, the closest identity
+        probe = normalized(luis + 0.3 * rng.standard_normal(128) / np.sqrt(128))
+        self.assertEqual(recent.match(probe, max_distance=1.5, track_id=1, now=1.0)[0], 'luis')
+        self.assertEqual(recent.track_hits, 1)
+        self.assertEqual(recent.hits, 3)
+
+        # expired
+        self.assertIsNone(recent.match(probe, max_distance=0.3, now=11.0))
+        self.assertEqual(len(recent), 0)
+
+    def test_face_tracking_recent_identities_capacity(self):
+        recent = RecentIdentities(ttl_seconds=10.0, capacity=2)
+        embeddings = np.eye(3, dtype=np.float32)
+        for name, embedding in zip(['a', 'b', 'c'], embeddings):
+            recent.add(name, embedding, now=0.0)
+        # the oldest identity was replaced
+        self.assertEqual(len(recent), 2)
+        self.assertIsNone(recent.match(embeddings[0], max_distance=0.1, now=1.0))
+        self.assertEqual(recent.match(embeddings[2], max_distance=0.1, now=1.0)[0], 'c')
+
+    def test_face_tracking_recent_unknowns_log_once_per_window(self):
+        rng = np.random.default_rng(0)
+        stranger = normalized(rng.standard_normal(128))
+        unknowns = RecentUnknowns(ttl_seconds=30.0, log_window_seconds=10.0)
+        entry_id = unknowns.add(stranger, now=0.0)
+        self.assertEqual(unknowns.take_log(entry_id, now=0.0), 1)
+
+        # the visitor tries again: denied from the cache, the denials are not logged again in the window
+        for now in (1.0, 2.0, 3.0):
+            probe = normalized(stranger + 0.3 * rng.standard_normal(128) / np.sqrt(128))
+            self.assertEqual(unknowns.match(probe, max_distance=0.3, now=now)[0], entry_id)
+            self.assertIsNone(unknowns.take_log(entry_id, now=now))
+        # after the window the next denial is logged with the repeats
+        self.assertEqual(unknowns.match(stranger, max_distance=0.3, now=12.0)[0], entry_id)
+        self.assertEqual(unknowns.take_log(entry_id, now=12.0), 4)
+
+        # somebody else is not the cached face, and the entry expires
+        self.assertIsNone(unknowns.match(normalized(rng.standard_normal(128)), max_distance=0.3, now=13.0))
+        self.assertIsNone(unknowns.match(stranger, max_distance=0.3, now=31.0))
+        self.assertEqual(len(unknowns), 0)
+
+    def test_face_tracking_recent_unknowns_new_gallery_version(self):
+        stranger = normalized(np.random.default_rng(0).standard_normal(128))
+        unknowns = RecentUnknowns()
+        self.assertIsNone(unknowns.match(stranger, max_distance=0.3, version=1, now=0.0))
+        unknowns.add(stranger, now=0.0)
+        self.assertIsNotNone(unknowns.match(stranger, max_distance=0.3, version=1, now=1.0))
+        # somebody enrolled meanwhile, maybe this face
+        self.assertIsNone(unknowns.match(stranger, max_distance=0.3, version=2, now=2.0))
+        self.assertEqual(len(unknowns), 0)
@@ -0,0 +1,39 @@
+import unittest
+from concurrent.futures import TimeoutError
+import numpy as np
+
+from core.face_processing.face_workers import InferenceWorkerPool, SharedFrameRing
+
+
+class TestFaceWorkers(unittest.TestCase):
+    def test_face_workers_ring_checks_shape(self):
+        ring = SharedFrameRing(2, (72, 128, 3))
+        try:
+            face = np.full((40, 30, 3), 7, dtype=np.uint8)
+            shape = ring.write(1, face)
+            np.testing.assert_array_equal(ring.read(1, shape), face)
+            for image in (np.zeros((80, 128, 3), np.uint8), np.zeros((72, 130, 3), np.uint8),
+                          np.zeros((72, 128), np.uint8), np.zeros((72, 128, 3), np.float32)):
+                self.assertFalse(ring.fits(image))
+                with self.assertRaises(ValueError):
+                    ring.write(0, image)
+        finally:
+            ring.close()
+
+    def test_face_workers_timeout_restarts_and_frees_slots(self):
+        # no worker processes: nothing ever answers, like a hung worker
+        pool = InferenceWorkerPool((72, 128, 3), workers=0, slots=2, timeout=0.2)
+        try:
+            with self.assertRaises(ValueError):
+                pool.analyze(np.zeros((720, 1280, 3), np.uint8))
+            futures = [pool.embed(np.zeros((40, 30, 3), np.uint8)) for _ in range(2)]
+            self.assertIsNone(pool.analyze(np.zeros((72, 128, 3), np.uint8)))
+            with self.assertRaises(TimeoutError):
+                pool.result(futures[0])
+            # the other pending task failed with it and both slots are free again
+            with self.assertRaises(TimeoutError):
+                futures[1].result(timeout=0)
+            self.assertEqual(pool.stats()['restarts'], 1)
+            self.assertEqual(pool.stats()['busy_slots'], 0)
+        finally:
+            pool.close()
@@ -0,0 +1,42 @@
+import unittest
+import importlib.util
+import os
+import sys
+import tempfile
+
+from core.startup import LazyModule
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        # a package laid out like deepface 0.0.91: __init__.py only defines __version__ and the
+        # DeepFace submodule is not imported by it
+        self.temp_dir = tempfile.TemporaryDirectory()
+        package = os.path.join(self.temp_dir.name, 'lazy_deepface_layout')
+        os.makedirs(package)
+        with open(os.path.join(package, '__init__.py'), 'w') as f:
+            f.write('__version__ = "0.0.91"\n')
+        with open(os.path.join(package, 'DeepFace.py'), 'w') as f:
+            f.write('def represent(img_path):\n    return [img_path]\n')
+        sys.path.insert(0, self.temp_dir.name)
+
+    def tearDown(self):
+        sys.path.remove(self.temp_dir.name)
+        for name in [name for name in sys.modules if name.startswith('lazy_deepface_layout')]:
+            del sys.modules[name]
+        self.temp_dir.cleanup()
+
+    def test_startup_lazy_submodule(self):
+        # the submodule is not an attribute of the package until something imports it
+        with self.assertRaises(AttributeError):
+            LazyModule('lazy_deepface_layout', 'DeepFace').represent
+        deep_face = LazyModule('lazy_deepface_layout.DeepFace')
+        self.assertFalse(deep_face.is_loaded)
+        self.assertEqual(deep_face.represent('face.png'), ['face.png'])
+        self.assertTrue(deep_face.is_loaded)
+
+    @unittest.skipIf(importlib.util.find_spec('deepface') is None, 'deepface is not installed')
+    def test_startup_lazy_deepface(self):
+        from core.face_processing.models.face_matcher_model import DeepFace
+        self.assertTrue(callable(DeepFace.represent))
+        self.assertTrue(callable(DeepFace.extract_faces))
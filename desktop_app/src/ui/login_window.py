@@ -1,7 +1,8 @@
 import datetime
+import time
 import traceback
+from collections import deque
 from tkinter import Toplevel, Label
-import cv2
 import imutils
 from PIL import Image, ImageTk
 from typing import Optional
@@ -9,10 +10,14 @@ from typing import Optional
 from api.api_client import ApiClient
 from communication.serial_com import SerialCommunication
 from core.face_processing.face_login import FaceLogIn
+from core.face_processing.face_pipeline import FramePipeline
+from core.face_processing.face_frame import Frame
 from core.face_processing.face_utils import FaceUtils
+from services.camera_service import CameraService
 
 class LoginWindow:
-    def __init__(self, master, face_utils: FaceUtils, api_client: ApiClient, cap):
+    def __init__(self, master, face_utils: FaceUtils, api_client: ApiClient, camera: CameraService,
+                 use_pipeline: bool = True, display_fps: int = 30):
         self.master = master
         self.face_login_window: Optional[Toplevel] = None
         self.login_video: Optional[Label] = None
@@ -31,7 +36,17 @@ class LoginWindow:
         self.face_login = FaceLogIn(face_utils)
         self.api_client = api_client
         self.com = SerialCommunication()
-        self.cap = cap
+        self.camera = camera
+
+        # detection, mesh and matching run on pipeline threads; this window only renders
+        self.use_pipeline = use_pipeline
+        self.pipeline: Optional[FramePipeline] = None
+        self.render_interval_ms = int(1000 / display_fps) if use_pipeline else 10
+        self._rendered_frame_id = 0
+        # time spent on the Tk thread per rendered frame, reported apart from the time-to-decision
+        self._ui_frame_seconds: deque = deque(maxlen=60)
+        # image bytes allocated per displayed frame: colour conversions, resizes and the overlay copy
+        self._frame_bytes: deque = deque(maxlen=60)
 
         self.show()
 
@@ -57,7 +72,11 @@ class LoginWindow:
             self.login_video.place(x=0, y=0)
             
             self.face_login_window.protocol("WM_DELETE_WINDOW", self.close_login)
-            
+
+            if self.use_pipeline:
+                self.pipeline = self.face_login.pipeline(self.camera)
+                self.pipeline.start()
+
             self.facial_login()
         except Exception as e:
             print(f"[ERROR {timestamp}] gui_login: Exception: {e}")
@@ -66,38 +85,66 @@ class LoginWindow:
     def facial_login(self):
         now = datetime.datetime.now()
         if (now - self._last_log) >= self._log_interval:
-            print(f"[DEBUG {now}] facial_login: ENTRY stop_login={self.stop_login}, end_state_active={self.end_state_display_active}")
+            print(f"[DEBUG {now}] facial_login: ENTRY stop_login={self.stop_login}, end_state_active={self.end_state_display_active}, camera={self.camera.stats()}")
+            if self.pipeline is not None:
+                print(f"[DEBUG {now}] facial_login: pipeline={self.pipeline.stats()}")
+            if self._ui_frame_seconds:
+                ui_frame_ms = 1000 * sum(self._ui_frame_seconds) / len(self._ui_frame_seconds)
+                frame_kb = sum(self._frame_bytes) / len(self._frame_bytes) / 1024
+                print(f"[DEBUG {now}] facial_login: ui_frame_ms={ui_frame_ms:.1f}, allocated_kb_per_frame={frame_kb:.0f}, "
+                      f"last_decision={self.face_login.last_decision}")
             self._last_log = now
         
         if self.stop_login:
             return
         
-        if not (self.cap and self.cap.isOpened() and self.login_video and self.login_video.winfo_exists()):
+        if not (self.camera.is_opened() and self.login_video and self.login_video.winfo_exists()):
             self.close_login()
             return
             
-        ret, frame_bgr = self.cap.read()
+        if self.pipeline is not None:
+            # newest captured frame, rendered even while the inference stages are still busy
+            frame_id, camera_frame = self.pipeline.latest_frame()
+            ret = camera_frame is not None and frame_id != self._rendered_frame_id
+            self._rendered_frame_id = frame_id
+        else:
+            # latest frame from the capture thread; False when no new frame arrived since the last call
+            ret, frame_bgr = self.camera.read()
+            camera_frame = Frame(frame_bgr) if ret else None
         
         if not ret:
             self.failed_reads += 1
             if self.failed_reads > 100:  # Stop after 100 failed reads
-                print(f"[ERROR] Failed to read frame from camera after {self.failed_reads} attempts. Closing login window.")
+                print(f"[ERROR] No new frame from camera after {self.failed_reads} attempts ({self.camera.stats()}). Closing login window.")
                 self.close_login()
                 return
 
             if self.login_video.winfo_exists():
-                self.login_video.after(10, self.facial_login)
+                self.login_video.after(self.render_interval_ms, self.facial_login)
             return
 
         self.failed_reads = 0  # Reset counter on a successful read
-        frame = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-        processed_frame, user_access, info = self.face_login.process(frame)
-        
+        frame_start = time.perf_counter()
+        # the only full frame copy of the UI: the overlay is drawn on it, the RGB view is shared
+        frame = camera_frame.rgb.copy()
+        if self.pipeline is not None:
+            # overlay the newest inference result on the newest frame
+            result = self.pipeline.latest_result()
+            self.face_login.draw(frame, result)
+            processed_frame = frame
+            user_access, info = (result.matcher, result.info) if result is not None else (None, '')
+        else:
+            processed_frame, user_access, info = self.face_login.process(frame, camera_frame)
+        self._frame_bytes.append(camera_frame.allocated_bytes + frame.nbytes)
+
         if self.login_video.winfo_exists():
-            display_frame = imutils.resize(processed_frame, width=1280) 
+            display_frame = processed_frame
+            if display_frame.shape[1] != 1280:
+                display_frame = imutils.resize(processed_frame, width=1280)
             im = Image.fromarray(display_frame)
             self.current_video_img = ImageTk.PhotoImage(image=im)
             self.login_video.configure(image=self.current_video_img)
+        self._ui_frame_seconds.append(time.perf_counter() - frame_start)
 
         if user_access and not self.login_sent:
             if not self.end_state_display_active:
@@ -109,9 +156,7 @@ class LoginWindow:
                 print("Sending ON signal to device control server...")
                 self.api_client.send_on_signal()
 
-                # Then, call user_check_in to log the event to the main server
-                self.face_login.face_utilities.user_check_in(info, access_granted=True)
-                
+                # The check-in was already logged by FaceLogIn when it decided
                 self.com.sending_data("A")
                 if self.close_timer_id and self.login_video.winfo_exists():
                     self.login_video.after_cancel(self.close_timer_id)
@@ -122,9 +167,7 @@ class LoginWindow:
             if not self.end_state_display_active:
                 print(f"[DEBUG {now}] facial_login: DENIED ('{info}'). Activating 1s display timer.")
                 self.end_state_display_active = True
-                
-                # Call user_check_in with access denied
-                self.face_login.face_utilities.user_check_in(info, access_granted=False)
+                # The denial was already logged by FaceLogIn, once per window for a repeated face
                 
                 if self.close_timer_id and self.login_video.winfo_exists():
                      self.login_video.after_cancel(self.close_timer_id)
@@ -132,7 +175,7 @@ class LoginWindow:
                     self.close_timer_id = self.login_video.after(1000, self.trigger_delayed_close)
         
         if self.login_video.winfo_exists() and not self.stop_login:
-            self.login_video.after(10, self.facial_login)
+            self.login_video.after(self.render_interval_ms, self.facial_login)
 
     def trigger_delayed_close(self):
         print(f"[DEBUG {datetime.datetime.now()}] trigger_delayed_close: Timer expired, proceeding to close login.")
@@ -148,8 +191,16 @@ class LoginWindow:
                 self.login_video.after_cancel(self.close_timer_id)
                 self.close_timer_id = None
             
-            # Re-initialize the processor state, but not the models
-            self.face_login.__init__(self.face_login.face_utilities)
+            if self.pipeline is not None:
+                print(f"[DEBUG {datetime.datetime.now()}] close_login: pipeline={self.pipeline.stats()}")
+                if self.pipeline.stop(timeout=2.0):
+                    # a stage is still inside a login step: wait for it before its state is reset
+                    self.pipeline.stop()
+                self.pipeline = None
+
+            # Re-initialize the processor state, but not the models, once no stage uses it
+            self.face_login.reset()
+            self.face_login.close()
             
             if self.face_login_window and self.face_login_window.winfo_exists():
                 self.face_login_window.destroy()
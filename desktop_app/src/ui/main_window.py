@@ -1,23 +1,37 @@
 from tkinter import Frame, Label, Button, PhotoImage
 from PIL import Image, ImageTk
 import cv2
+import threading
 from typing import Optional
 
 from api.api_client import ApiClient
 from communication.serial_com import SerialCommunication
+from core.startup import startup_timer
+from services.camera_service import CameraService
 from core.face_processing.face_utils import FaceUtils
 from ui.image_paths import ImagePaths
 from ui.login_window import LoginWindow
 from ui.signup_window import SignUpWindow
 
 class MainWindow:
-    def __init__(self, window, api_client: ApiClient):
+    def __init__(self, window, api_client: ApiClient, inference_workers: int = 0, fusion: Optional[str] = None,
+                 cascade: Optional[str] = None):
         self.window = window
         self.com = SerialCommunication()
         self.api_client = api_client
-        self.face_utils = FaceUtils(api_client=self.api_client)
+        # Face processing models are loaded in the background, see load_models
+        self.face_utils: Optional[FaceUtils] = None
+        self.models_ready = threading.Event()
+        self.models_error: Optional[str] = None
+        # > 0 runs login inference in that many worker processes instead of this one
+        self.inference_workers = inference_workers
+        # 'mean' or 'vote' identifies the best crops of an approach together instead of only the best one
+        self.fusion = fusion
+        # a stronger model, e.g. 'ArcFace', re-scores the borderline matches of the gallery model
+        self.cascade = cascade
 
-        self.cap = None
+        # The camera is read on its own thread, windows take the latest frame from it
+        self.camera = CameraService(device=0, width=1280, height=720)
         self._is_camera_active = False
         self.main_window = window
         self.main_window.title("faces access control")
@@ -37,20 +51,71 @@ class MainWindow:
         self.background_label: Optional[Label] = None
         self.background_img_original: Optional[Image.Image] = None
         self.current_background_img: Optional[ImageTk.PhotoImage] = None
-        
-        # Pre-load models on startup
-        print("Pre-loading face processing models...")
-        self.face_utils = FaceUtils(api_client=self.api_client)
-        print("Models loaded successfully.")
-        
-        # Pre-initialize camera
-        print("Initializing camera...")
-        self.cap = cv2.VideoCapture(0)
-        self.cap.set(3, 1280)
-        self.cap.set(4, 720)
-        print("Camera initialized.")
-        
-        self.setup_ui()
+        self.login_button: Optional[Button] = None
+        self.signup_button: Optional[Button] = None
+        self.status_label: Optional[Label] = None
+
+        # Show the window first, then load the detectors, matcher and camera off the Tk thread
+        with startup_timer.measure("main window UI"):
+            self.setup_ui()
+        print("Pre-loading face processing models in the background...")
+        threading.Thread(target=self.load_models, daemon=True).start()
+        self.main_window.after(200, self.check_models_ready)
+
+    def load_models(self):
+        """Build FaceUtils once, warm up the gallery model and open the camera (background thread)."""
+        try:
+            with startup_timer.measure("FaceUtils (MediaPipe detection, FaceMesh, gallery)"):
+                face_utils = FaceUtils(api_client=self.api_client)
+
+            print("Initializing camera...")
+            with startup_timer.measure("open camera"):
+                self.camera.start()
+            print("Camera initialized.")
+
+            if self.inference_workers > 0:
+                with startup_timer.measure("start inference workers"):
+                    face_utils.enable_inference_workers((self.camera.height, self.camera.width, 3),
+                                                        workers=self.inference_workers)
+
+            if self.fusion is not None:
+                face_utils.enable_fusion(self.fusion)
+
+            if self.cascade is not None:
+                with startup_timer.measure(f"cascade gallery ({self.cascade})"):
+                    face_utils.enable_cascade(self.cascade)
+
+            # waits for the warm-up FaceUtils started, so the first login is as fast as the next ones
+            face_utils.face_matcher.warm_up([face_utils.face_gallery.model_name], background=False)
+
+            # Embed enrollments the gallery file does not hold yet before logins are enabled, then
+            # keep the in-memory gallery in sync with new, changed and removed enrollments
+            with startup_timer.measure("refresh face gallery"):
+                face_utils.refresh_galleries()
+            face_utils.start_gallery_watchers()
+            # The people who came in most often lately are searched before the whole gallery
+            with startup_timer.measure("seed identity shortlist"):
+                face_utils.seed_shortlist()
+            self.face_utils = face_utils
+            print("Models loaded successfully.")
+        except Exception as e:
+            print(f"Error loading face processing models: {e}")
+            self.models_error = str(e)
+        self.models_ready.set()
+
+    def check_models_ready(self):
+        """Poll the background loader from the Tk thread and update the readiness indicator."""
+        if not self.models_ready.is_set():
+            self.main_window.after(200, self.check_models_ready)
+            return
+
+        if self.models_error:
+            self.status_label.configure(text=f"Error cargando modelos: {self.models_error}", fg="#FF0000")
+            return
+        self.status_label.configure(text="Sistema listo", fg="#00AA00")
+        self.login_button.configure(state="normal")
+        self.signup_button.configure(state="normal")
+        print(startup_timer.report())
 
     def setup_ui(self):
         self.background_img_original = Image.open(self.images.init_img)
@@ -61,19 +126,23 @@ class MainWindow:
         self.background_label.place(x=0, y=0, relwidth=1, relheight=1)
         self.main_window.bind("<Configure>", self.resize_background)
 
+        # Face login and signup stay disabled until the models are loaded
         self.login_button_img = PhotoImage(file=self.images.login_img)
-        login_button = Button(
+        self.login_button = Button(
             self.frame, image=self.login_button_img, height="40", width="200",
-            command=self.open_login_window
+            command=self.open_login_window, state="disabled"
         )
-        login_button.place(x=980, y=325)
+        self.login_button.place(x=980, y=325)
 
         self.signup_button_img = PhotoImage(file=self.images.signup_img)
-        signup_button = Button(
+        self.signup_button = Button(
             self.frame, image=self.signup_button_img, height="40", width="200",
-            command=self.open_signup_window
+            command=self.open_signup_window, state="disabled"
         )
-        signup_button.place(x=980, y=478)
+        self.signup_button.place(x=980, y=478)
+
+        self.status_label = Label(self.frame, text="Cargando modelos...", fg="#FF8C00", bg="#000000")
+        self.status_label.place(x=980, y=690)
         
         self.admin_button_img = PhotoImage(file=self.images.admin_img)
         admin_button = Button(
@@ -83,22 +152,22 @@ class MainWindow:
         admin_button.place(x=980, y=628)
 
     def open_login_window(self):
+        if self.face_utils is None:
+            return
         # Check if camera is still available
-        if not self.cap or not self.cap.isOpened():
+        if not self.camera.is_opened():
             print("Reinitializing camera...")
-            self.cap = cv2.VideoCapture(0)
-            self.cap.set(3, 1280)
-            self.cap.set(4, 720)
-        LoginWindow(self.main_window, self.face_utils, self.api_client, self.cap)
+            self.camera.start()
+        LoginWindow(self.main_window, self.face_utils, self.api_client, self.camera)
 
     def open_signup_window(self):
+        if self.face_utils is None:
+            return
         # Check if camera is still available
-        if not self.cap or not self.cap.isOpened():
+        if not self.camera.is_opened():
             print("Reinitializing camera...")
-            self.cap = cv2.VideoCapture(0)
-            self.cap.set(3, 1280)
-            self.cap.set(4, 720)
-        SignUpWindow(self.main_window, self.face_utils, self.api_client, self.cap)
+            self.camera.start()
+        SignUpWindow(self.main_window, self.face_utils, self.api_client, self.camera)
 
     def open_admin_login_window(self):
         # Open the admin login window
@@ -108,8 +177,11 @@ class MainWindow:
     def on_closing(self):
         """Handle application closing."""
         print("Releasing camera and closing application...")
-        if self.cap and self.cap.isOpened():
-            self.cap.release()
+        if self.face_utils is not None:
+            self.face_utils.stop_gallery_watchers()
+            self.face_utils.stop_inference_workers()
+        print(f"Camera stats: {self.camera.stats()}")
+        self.camera.release()
         cv2.destroyAllWindows()
         self.main_window.destroy()
 
@@ -9,14 +9,16 @@ import numpy as np
 from api.api_client import ApiClient
 from core.face_processing.face_signup import FaceSignUp
 from core.face_processing.face_utils import FaceUtils
+from core.face_processing.face_gallery import FACE_IMAGES_PATH
+from services.camera_service import CameraService
 
 class SignUpWindow:
-    def __init__(self, master, face_utils: FaceUtils, api_client: ApiClient, cap):
+    def __init__(self, master, face_utils: FaceUtils, api_client: ApiClient, camera: CameraService):
         self.master = master
         self.api_client = api_client
         self.face_utils = face_utils
-        self.cap = cap
-        self.face_images_path = "data/face_images"
+        self.camera = camera
+        self.face_images_path = FACE_IMAGES_PATH
         self.face_signup = FaceSignUp(self.face_utils)
 
         self.signup_window = Toplevel(self.master)
@@ -90,10 +92,11 @@ class SignUpWindow:
         self.video_capture_signup()
 
     def video_capture_signup(self):
-        if not (self.cap and self.cap.isOpened() and self.signup_video and self.signup_video.winfo_exists()):
+        if not (self.camera.is_opened() and self.signup_video and self.signup_video.winfo_exists()):
             return
 
-        ret, frame_bgr = self.cap.read()
+        # latest frame from the capture thread; False when no new frame arrived since the last call
+        ret, frame_bgr = self.camera.read()
         if not ret:
             self.signup_video.after(10, self.video_capture_signup)
             return
@@ -134,6 +137,9 @@ class SignUpWindow:
             
             if self.face_utils.save_face(self.captured_face_crop, str(user_id), self.face_images_path):
                 print(f"Imagen del rostro guardada como '{user_id}.png'")
+                # Embed the face once now so logins only need to embed the probe
+                if not self.face_utils.save_face_embedding(self.captured_face_crop, str(user_id)):
+                    print(f"Embedding del rostro pendiente para el ID: {user_id}, se calculará al iniciar sesión")
                 messagebox.showinfo("Registro Exitoso", f"Usuario '{name}' registrado correctamente.")
             else:
                 print(f"Error al guardar la imagen del rostro para el ID: {user_id}")